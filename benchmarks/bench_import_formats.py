@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput benchmark of the SO line import reader, per file format.
+
+Generates a file with N rows (code, qty, price) for every supported format and
+measures how fast tools/so_lines_reader.py reads and normalises it. The reader
+does not depend on Odoo, so this script runs with a plain Python interpreter:
+
+    python benchmarks/bench_import_formats.py --rows 100000
+    python benchmarks/bench_import_formats.py --addon "odoo v16" --json result.json
+
+Formats whose writer library (openpyxl, xlwt) is not installed are skipped.
+The .xls format is capped at 65,535 data rows.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(addon, name, relative_path):
+    path = os.path.join(REPO_DIR, addon, relative_path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_reader(addon):
+    return load_module(addon, 'so_lines_reader', os.path.join('tools', 'so_lines_reader.py'))
+
+
+def load_generators(addon):
+    """The seeded file generators shared with the addon's benchmark test."""
+    return load_module(addon, 'file_generators', os.path.join('tests', 'file_generators.py'))
+
+
+def bench_format(reader, generators, file_format, row_count, directory, repeat):
+    if file_format == 'xls':
+        row_count = min(row_count, generators.XLS_MAX_ROWS)
+    path = os.path.join(directory, 'lines.%s' % file_format)
+    try:
+        generators.WRITERS[file_format](path, generators.generate_rows(row_count))
+    except ImportError as e:
+        return {'format': file_format, 'skipped': str(e)}
+
+    timings = []
+    for dummy in range(repeat):
+        with open(path, 'rb') as f:
+            start = time.perf_counter()
+            parsed = sum(1 for row in reader.normalize_rows(reader.iter_rows(f, path)) if not row.error)
+            timings.append(time.perf_counter() - start)
+    assert parsed == row_count, (file_format, parsed, row_count)
+
+    best = min(timings)
+    size = os.path.getsize(path)
+    return {
+        'format': file_format,
+        'rows': row_count,
+        'file_size_mb': round(size / 1024 / 1024, 2),
+        'seconds': round(best, 3),
+        'rows_per_second': round(row_count / best),
+        'mb_per_second': round(size / 1024 / 1024 / best, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help="Number of data rows per file.")
+    parser.add_argument('--addon', default='odoo v17', help="Addon directory whose reader is benchmarked.")
+    parser.add_argument('--formats', default='csv,tsv,xlsx,xls', help="Comma separated list of formats.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per format; the best run is kept.")
+    parser.add_argument('--json', help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    reader = load_reader(args.addon)
+    generators = load_generators(args.addon)
+    with tempfile.TemporaryDirectory() as directory:
+        results = [bench_format(reader, generators, file_format, args.rows, directory, args.repeat)
+                   for file_format in args.formats.split(',')]
+
+    print('%-6s %8s %9s %9s %12s %8s' % ('format', 'rows', 'size MB', 'seconds', 'rows/s', 'MB/s'))
+    for result in results:
+        if 'skipped' in result:
+            print('%-6s skipped: %s' % (result['format'], result['skipped']))
+            continue
+        print('%-6s %8d %9.2f %9.3f %12d %8.2f' % (
+            result['format'], result['rows'], result['file_size_mb'], result['seconds'],
+            result['rows_per_second'], result['mb_per_second']))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'addon': args.addon, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,3 +2,9 @@
 
 from . import models
 from . import wizard
+from . import controllers
+
+
+def uninstall_hook(cr, registry):
+    """Drop the materialized view of the SO/PO coverage report; the ORM does not manage it."""
+    cr.execute("DROP MATERIALIZED VIEW IF EXISTS %s" % registry['ancom_sales_orders.so.po.coverage.report']._table)
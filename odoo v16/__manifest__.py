@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Ancom Sales Orders',
-    'version': '16.0.1.0.0',
+    'version': '16.0.1.2.0',
     'summary': 'Custom module for linking Sales Orders with Purchase Orders and adding custom fields.',
     'description': """
 This module is a technical test submission. It enhances the Sales Order functionality by:
@@ -10,6 +10,11 @@ This module is a technical test submission. It enhances the Sales Order function
 - Allowing the creation of a Purchase Order directly from a Sales Order.
 - Validating the 'No Kontrak' field to ensure it is unique.
 - Providing a wizard to import Sales Order lines from an Excel file.
+- Downloading an import template and exporting SO lines in the same layout.
+- Merging imported rows into the existing SO lines instead of appending them (optional).
+- Processing large imports as background jobs, chunk by chunk.
+- Accepting bulk SO lines from integrations over HTTP (NDJSON or CSV).
+- Reporting SO to PO coverage (quantities and prices) per order, vendor and contract.
     """,
     'author': 'Anjas Amar Pradana',
     'website': 'https://www.linkedin.com/in/anjas-amar-pradana/',
@@ -21,9 +26,14 @@ This module is a technical test submission. It enhances the Sales Order function
     ],
     'data': [
         'security/ir.model.access.csv',
+        'security/security.xml',
+        'data/ir_cron_data.xml',
         'wizard/import_so_lines_wizard_view.xml',
         'views/sale_order_view.xml',
+        'views/so_line_import_job_views.xml',
+        'views/so_po_coverage_report_views.xml',
     ],
+    'uninstall_hook': 'uninstall_hook',
     'installable': True,
     'application': True,
     'auto_install': False,
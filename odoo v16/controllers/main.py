@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import tempfile
+import threading
+
+from werkzeug.exceptions import NotFound
+from werkzeug.wsgi import wrap_file
+
+from odoo import http
+from odoo.exceptions import ValidationError
+from odoo.http import content_disposition, request
+from odoo.tools import split_every
+
+from ..tools import phase_timer, so_lines_reader, so_lines_writer
+from ..wizard.import_so_lines_wizard import IMPORT_CHUNK_SIZE
+
+_logger = logging.getLogger(__name__)
+
+# Upper bound of the batch size that can be requested with the 'chunk_size' parameter.
+MAX_CHUNK_SIZE = 10000
+
+# Body Content-Types accepted by the ingest endpoint, with the format they are read as.
+# These types and the required INGEST_REQUIRED_HEADER cannot be sent by a form or page of
+# another site without a CORS preflight, so this endpoint without CSRF token cannot be
+# triggered cross-site with the user's session cookie.
+INGEST_CONTENT_TYPES = {
+    'application/x-ndjson': 'ndjson',
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+}
+INGEST_REQUIRED_HEADER = 'X-Requested-With'
+
+
+class SoLineIngestController(http.Controller):
+    """
+    HTTP endpoint for integrations pushing Sales Order lines in bulk, without building
+    an Excel file, without base64 and without wizard records.
+
+    The request body holds {order, default_code, qty, price} records, either as NDJSON
+    (one JSON object per line, Content-Type application/x-ndjson) or as CSV with a header
+    (text/csv). The body is streamed and processed in batches through the same path as
+    the multi-order import wizard: SO numbers and product codes are resolved once per
+    batch and the lines are created with one create(). Every batch is committed, and the
+    NDJSON response holds one acknowledgement per stored batch, then a summary line.
+
+    Like the wizard, the import is strict: the first invalid row stops it. The batches
+    acknowledged before it stay stored; the failing batch is rolled back.
+
+    As the endpoint does not use a CSRF token, requests must carry the X-Requested-With
+    header and one of the Content-Types of INGEST_CONTENT_TYPES; other requests are
+    refused before the body is read.
+    """
+
+    @http.route('/ancom_sales_orders/so_lines/ingest', type='http', auth='user', methods=['POST'], csrf=False)
+    def ingest_so_lines(self, chunk_size=None, **kwargs):
+        if not request.httprequest.headers.get(INGEST_REQUIRED_HEADER):
+            return self._ndjson_response(
+                [{'error': "The '%s' header is required." % INGEST_REQUIRED_HEADER}], status=403)
+        data_format = INGEST_CONTENT_TYPES.get(request.httprequest.mimetype)
+        if not data_format:
+            return self._ndjson_response([{
+                'error': "The Content-Type must be one of: %s." % ', '.join(INGEST_CONTENT_TYPES),
+            }], status=415)
+        try:
+            chunk_size = min(max(int(chunk_size or IMPORT_CHUNK_SIZE), 1), MAX_CHUNK_SIZE)
+        except ValueError:
+            return self._ndjson_response([{'error': "The 'chunk_size' parameter must be a number."}], status=400)
+
+        wizard = request.env['ancom_sales_orders.import.so.lines.wizard']
+        # Do not commit when running from a test.
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        acks = []
+        orders, products, line_defaults = {}, {}, {}
+        status = 200
+        with phase_timer.PhaseTimer('so_line_ingest', request.env.cr) as timer:
+            rows = so_lines_reader.normalize_order_rows(
+                so_lines_reader.iter_record_rows(request.httprequest.stream, data_format))
+            try:
+                chunks = timer.iterate('parse', split_every(chunk_size, rows))
+                for index, chunk in enumerate(chunks, start=1):
+                    # The savepoint rolls back the lines of a batch that fails validation.
+                    with request.env.cr.savepoint():
+                        with timer.phase('create_lines') as stats:
+                            lines = wizard._create_multi_order_lines(chunk, orders, products, line_defaults)
+                            stats['rows'] += len(lines)
+                        with timer.phase('recompute'):
+                            wizard._flush_bulk_lines()
+                    with timer.phase('commit'):
+                        if auto_commit:
+                            request.env.cr.commit()
+                    acks.append({'chunk': index, 'rows': len(chunk), 'imported': len(lines)})
+            except (so_lines_reader.ImportFileError, ValidationError) as e:
+                status = 400
+                acks.append({'error': str(e)})
+        timer.log(_logger, uid=request.env.uid, chunks=len(acks))
+
+        acks.append({
+            'done': status == 200,
+            'imported': sum(ack.get('imported', 0) for ack in acks),
+        })
+        return self._ndjson_response(acks, status=status)
+
+    def _ndjson_response(self, records, status=200):
+        body = ''.join(json.dumps(record) + '\n' for record in records)
+        return request.make_response(body, headers=[('Content-Type', 'application/x-ndjson')], status=status)
+
+
+class SoLineExportController(http.Controller):
+    """
+    Download of the import template and export of Sales Order lines in the import layout.
+
+    The workbook is written to a temporary file on disk (xlsxwriter constant_memory mode)
+    and sent to the browser straight from that file, so orders with tens of thousands of
+    lines are exported without holding the file content in the worker memory.
+    """
+
+    @http.route('/ancom_sales_orders/so_lines/template', type='http', auth='user')
+    def download_template(self, **kwargs):
+        return self._xlsx_response([], 'so_lines_import_template.xlsx')
+
+    @http.route('/ancom_sales_orders/so_lines/export', type='http', auth='user')
+    def export_so_lines(self, order_ids='', **kwargs):
+        try:
+            ids = [int(order_id) for order_id in order_ids.split(',') if order_id]
+        except ValueError:
+            raise NotFound()
+        sale_orders = request.env['sale.order'].browse(ids).exists()
+        if not sale_orders:
+            raise NotFound()
+        wizard = request.env['ancom_sales_orders.import.so.lines.wizard']
+        sheets = ((order.name, wizard._iter_export_rows(order)) for order in sale_orders)
+        file_name = '%s.xlsx' % (sale_orders.name if len(sale_orders) == 1 else 'so_lines')
+        return self._xlsx_response(sheets, file_name)
+
+    def _xlsx_response(self, sheets, file_name):
+        output = tempfile.TemporaryFile()
+        so_lines_writer.write_xlsx(output, sheets)
+        size = output.tell()
+        output.seek(0)
+        return request.make_response(wrap_file(request.httprequest.environ, output), headers=[
+            ('Content-Type', so_lines_writer.XLSX_MIMETYPE),
+            ('Content-Disposition', content_disposition(file_name)),
+            ('Content-Length', size),
+        ])
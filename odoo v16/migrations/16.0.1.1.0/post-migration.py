@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    Backfill the new 'x_sale_order_id' link of existing Purchase Orders.
+    Before this version the link was computed by matching 'origin' with the Sales Order name.
+    """
+    cr.execute("""
+        UPDATE purchase_order po
+           SET x_sale_order_id = so.id
+          FROM sale_order so
+         WHERE po.x_sale_order_id IS NULL
+           AND po.origin = so.name
+    """)
+    _logger.info("Linked %s existing purchase orders to their sales order", cr.rowcount)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    Flag the existing Purchase Order lines created by the SO -> PO sync ('x_from_sale_line'), then
+    link the lines of draft Purchase Orders created before the per-line link existed to their SO lines.
+    Lines whose SO line was already deleted cannot be told apart any more and are kept as manual lines.
+    """
+    cr.execute("""
+        UPDATE purchase_order_line
+           SET x_from_sale_line = TRUE
+         WHERE x_sale_line_id IS NOT NULL
+    """)
+    _logger.info("Flagged %s existing purchase order lines as synced from their sales order", cr.rowcount)
+
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    linked = env['purchase.order']._link_legacy_sale_lines()
+    _logger.info("Linked %s lines of existing draft purchase orders to their sales order lines", linked)
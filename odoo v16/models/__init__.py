@@ -1,3 +1,5 @@
 # -*- coding: utf-8 -*-
 
 from . import sale_order
+from . import so_line_import_job
+from . import so_po_coverage_report
@@ -1,5 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import logging
+# Counter digunakan untuk mendeteksi 'No Kontrak' ganda di dalam satu batch konfirmasi.
+from collections import Counter
+# timedelta digunakan untuk menambahkan lead time vendor ke tanggal rencana PO.
+from datetime import timedelta
+
 # Mengimpor modul yang diperlukan dari Odoo.
 # 'models' digunakan untuk mendefinisikan model Odoo.
 # 'fields' digunakan untuk mendefinisikan tipe field dalam model.
@@ -7,6 +13,16 @@
 from odoo import models, fields, api
 # Mengimpor ValidationError untuk menangani kesalahan validasi kustom.
 from odoo.exceptions import ValidationError
+# float_compare digunakan untuk membandingkan kuantitas dan harga sesuai presisinya.
+from odoo.tools import float_compare
+
+# Instrumentasi per fase (waktu, query SQL, baris) untuk jalur panas.
+from ..tools import phase_timer
+
+_logger = logging.getLogger(__name__)
+
+# Field baris PO yang dibandingkan dan ditulis ulang saat sinkronisasi SO -> PO.
+PO_LINE_SYNC_FIELDS = ('product_id', 'name', 'product_qty', 'product_uom', 'price_unit', 'x_expected_price_unit')
 
 
 class SaleOrder(models.Model):
@@ -31,6 +47,7 @@ class SaleOrder(models.Model):
     x_no_kontrak = fields.Char(
         string='No Kontrak', # Label field untuk nomor kontrak.
         copy=False,  # Field ini tidak boleh disalin saat menduplikasi Sales Order.
+        index=True, # Diindeks agar validasi keunikan tidak memindai seluruh tabel.
         help="Nomor kontrak unik untuk transaksi penjualan ini."
     )
 
@@ -41,11 +58,13 @@ class SaleOrder(models.Model):
     )
 
     # Field One2many ini menghubungkan ke Purchase Order yang dibuat dari Sales Order ini.
-    # Metode komputasi kustom '_compute_related_pos' digunakan untuk menemukan PO-PO ini.
+    # Relasi memakai field 'x_sale_order_id' yang diindeks pada Purchase Order, sehingga ORM
+    # memuat PO untuk seluruh recordset dalam satu query, bukan satu pencarian 'origin' per SO.
     x_po_line_ids = fields.One2many(
         'purchase.order', # Model target untuk hubungan One2many.
-        compute='_compute_related_pos', # Metode yang akan menghitung nilai field ini.
+        'x_sale_order_id', # Field Many2one di Purchase Order yang menunjuk ke Sales Order ini.
         string='Purchase Orders', # Label field untuk daftar Purchase Order.
+        readonly=True, # PO ditautkan oleh sistem, bukan diedit langsung dari SO.
         help="Menampilkan Purchase Order yang dibuat dari Sales Order ini."
     )
 
@@ -57,76 +76,371 @@ class SaleOrder(models.Model):
         help="Jumlah Purchase Order yang terhubung ke Sales Order ini."
     )
 
+    # Constraint database: 'No Kontrak' unik di antara Sales Order yang sudah dikonfirmasi.
+    # Ini menjamin keunikan walaupun dua pengguna mengonfirmasi pada saat yang bersamaan.
+    _sql_constraints = [
+        ('x_no_kontrak_confirmed_uniq',
+         "EXCLUDE (x_no_kontrak WITH =) WHERE (state IN ('sale', 'done') AND x_no_kontrak IS NOT NULL)",
+         'No Kontrak sudah pernah diinputkan sebelumnya...!'),
+    ]
+
     # ===================================================
     # METODE KOMPUTASI
     # ===================================================
 
     @api.depends('x_po_line_ids') # Metode ini akan dijalankan setiap kali 'x_po_line_ids' berubah.
     def _compute_purchase_order_count(self):
-        # Mengiterasi setiap Sales Order dalam recordset.
-        for order in self:
-            # Menghitung jumlah Purchase Order terkait dan menetapkannya ke field.
-            order.purchase_order_count = len(order.x_po_line_ids)
-
-    @api.depends('name') # Metode ini akan dijalankan setiap kali field 'name' berubah.
-    def _compute_related_pos(self):
         """
-        Metode komputasi ini menemukan semua Purchase Order yang dibuat dari Sales Order ini.
-        Ini mencari Purchase Order di mana field 'origin' cocok dengan nama Sales Order ini.
-        Ini adalah praktik standar Odoo untuk menghubungkan dokumen.
+        Metode komputasi ini menghitung jumlah Purchase Order untuk seluruh recordset
+        dengan satu query agregat (GROUP BY), tanpa memuat record PO-nya.
         """
+        # Menghitung jumlah PO per Sales Order dalam satu query grouped.
+        groups = self.env['purchase.order'].read_group(
+            [('x_sale_order_id', 'in', self.ids)], ['x_sale_order_id'], ['x_sale_order_id']
+        )
+        counts = {group['x_sale_order_id'][0]: group['x_sale_order_id_count'] for group in groups}
         # Mengiterasi setiap Sales Order dalam recordset.
         for order in self:
-            # Mencari Purchase Order yang memiliki nama Sales Order ini di field 'origin' mereka.
-            related_pos = self.env['purchase.order'].search([('origin', '=', order.name)])
-            # Menetapkan Purchase Order yang ditemukan ke field 'x_po_line_ids'.
-            order.x_po_line_ids = related_pos
+            # Menetapkan jumlah Purchase Order terkait ke field.
+            order.purchase_order_count = counts.get(order.id, 0)
 
     # ===================================================
     # METODE AKSI (Persyaratan 2)
     # ===================================================
 
-    def action_create_po(self):
+    def _get_seller_index(self):
+        """
+        Metode ini memuat harga vendor (product.supplierinfo) untuk semua baris Sales Order
+        di recordset ini dengan satu query, sebagai indeks di memori:
+        {'sellers': {(id_vendor, id_template_produk): [supplierinfo]}, 'rates': {}}.
+        Harga milik vendor dan perusahaan induknya digabung dengan urutan bawaan supplierinfo
+        (sequence, min_qty menurun, harga). Harga tetap dalam mata uang supplierinfo dan baru
+        dikonversi ke mata uang PO saat dipilih (_select_vendor_price).
+        """
+        vendors = self.x_request_vendor_id
+        # Satu query untuk semua vendor (beserta induknya) dan semua produk.
+        sellers = self.env['product.supplierinfo'].search([
+            ('partner_id', 'in', (vendors | vendors.parent_id).ids),
+            ('product_tmpl_id', 'in', self.order_line.product_id.product_tmpl_id.ids),
+            ('company_id', 'in', self.company_id.ids + [False]),
+        ])
+        index = {}
+        for vendor in vendors:
+            partner_ids = (vendor.id, vendor.parent_id.id)
+            for seller in sellers:
+                if seller.partner_id.id in partner_ids:
+                    index.setdefault((vendor.id, seller.product_tmpl_id.id), []).append(seller)
+        # Kurs yang sudah dicari disimpan di 'rates' (lihat _convert_purchase_price).
+        return {'sellers': index, 'rates': {}}
+
+    def _get_purchase_currency(self):
+        """
+        Metode ini menentukan mata uang PO untuk Sales Order ini: mata uang pembelian
+        'Request Vendor' di perusahaan SO, atau mata uang perusahaan SO jika vendor tidak memilikinya.
+        """
+        self.ensure_one()  # Memastikan metode ini dipanggil pada satu record saja.
+        vendor = self.x_request_vendor_id.with_company(self.company_id)
+        return vendor.property_purchase_currency_id or self.company_id.currency_id
+
+    def _convert_purchase_price(self, price, from_currency, currency, date, rates):
+        """
+        Metode ini mengonversi harga ke mata uang PO 'currency' dengan kurs perusahaan SO pada 'date'.
+        Kurs disimpan di 'rates' sehingga dicari sekali per pasangan mata uang, bukan per baris.
+        """
+        if not from_currency or from_currency == currency:
+            return price
+        key = (from_currency.id, currency.id, self.company_id.id, date)
+        if key not in rates:
+            rates[key] = self.env['res.currency']._get_conversion_rate(from_currency, currency, self.company_id, date)
+        return price * rates[key]
+
+    def _select_vendor_price(self, so_line, seller_index, date, currency):
+        """
+        Metode ini memilih harga vendor untuk satu baris Sales Order dari indeks, dengan aturan
+        yang sama seperti product.product._select_seller (periode berlaku, varian, perusahaan,
+        kuantitas minimum, lalu harga termurah), tanpa query per baris.
+        Mengembalikan (supplierinfo, harga dalam mata uang 'currency'), atau (None, None)
+        jika tidak ada harga vendor.
+        """
+        precision = self.env['decimal.precision'].precision_get('Product Unit of Measure')
+        matches = []
+        key = (self.x_request_vendor_id.id, so_line.product_id.product_tmpl_id.id)
+        for seller in seller_index['sellers'].get(key, ()):
+            # Harga untuk perusahaan lain.
+            if seller.company_id and seller.company_id != self.company_id:
+                continue
+            # Harga di luar periode berlakunya.
+            if (seller.date_start and seller.date_start > date) or (seller.date_end and seller.date_end < date):
+                continue
+            # Harga untuk varian produk lain.
+            if seller.product_id and seller.product_id != so_line.product_id:
+                continue
+            # Kuantitas (dalam UoM harga vendor) di bawah kuantitas minimum.
+            quantity = so_line.product_uom._compute_quantity(so_line.product_uom_qty, seller.product_uom, raise_if_failure=False)
+            if float_compare(quantity, seller.min_qty, precision_digits=precision) < 0:
+                continue
+            # Seperti _select_seller: hanya harga dari partner yang sama dengan kandidat pertama.
+            if not matches or matches[0][0].partner_id == seller.partner_id:
+                # Harga dibandingkan dalam mata uang PO.
+                price = self._convert_purchase_price(seller.price, seller.currency_id, currency, date, seller_index['rates'])
+                matches.append((seller, price))
+        if not matches:
+            return None, None
+        # Harga termurah di antara kandidat.
+        return min(matches, key=lambda match: match[1])
+
+    def _prepare_purchase_order_line_vals(self, so_line, date_planned, seller_index, currency):
+        """
+        Metode ini menyiapkan nilai-nilai baris Purchase Order untuk satu baris Sales Order.
+        Jika vendor memiliki harga untuk produk ini, harga beli, kode/nama produk vendor, dan
+        lead time diambil dari harga vendor tersebut; jika tidak, harga baris SO yang dipakai.
+        Harga selalu dalam mata uang PO 'currency'.
+        """
+        date = fields.Date.to_date(date_planned)
+        vals = {
+            'product_id': so_line.product_id.id, # ID produk dari baris SO.
+            'name': so_line.name, # Nama produk dari baris SO.
+            'product_qty': so_line.product_uom_qty, # Kuantitas produk dari baris SO.
+            'product_uom': so_line.product_uom.id, # Unit pengukuran produk dari baris SO.
+            # Harga satuan produk dari baris SO, dikonversi ke mata uang PO.
+            'price_unit': self._convert_purchase_price(so_line.price_unit, self.currency_id, currency, date,
+                                                       seller_index['rates']),
+            'date_planned': date_planned, # Tanggal yang direncanakan untuk PO.
+            'x_sale_line_id': so_line.id, # Relasi ke baris SO, dipakai untuk sinkronisasi.
+            'x_from_sale_line': True, # Menandai baris PO yang dikelola oleh sinkronisasi.
+        }
+        seller, price = self._select_vendor_price(so_line, seller_index, date, currency)
+        if seller:
+            name = seller.product_name or so_line.name
+            vals.update({
+                # Harga vendor dikonversi dari UoM harga vendor ke UoM baris.
+                'price_unit': seller.product_uom._compute_price(price, so_line.product_uom),
+                # Kode dan nama produk vendor, seperti deskripsi bawaan baris PO.
+                'name': '[%s] %s' % (seller.product_code, name) if seller.product_code else name,
+                # Lead time vendor (hari) ditambahkan ke tanggal rencana.
+                'date_planned': date_planned + timedelta(days=seller.delay),
+            })
+        # Harga yang diharapkan disimpan agar laporan cakupan dapat menandai harga PO yang diubah.
+        vals['x_expected_price_unit'] = vals['price_unit']
+        return vals
+
+    def _prepare_purchase_order_vals(self, date_planned, seller_index=None):
         """
-        Aksi ini dipicu oleh tombol 'Buat PO'. Ini membuat Purchase Order baru
-        berdasarkan informasi dari Sales Order ini.
+        Metode ini menyiapkan nilai-nilai Purchase Order untuk Sales Order ini di memori,
+        tanpa membuat record apa pun.
         """
         self.ensure_one()  # Memastikan metode ini dipanggil pada satu record saja.
+        # Harga vendor dimuat untuk SO ini saja jika indeks tidak diberikan oleh pemanggil.
+        if seller_index is None:
+            seller_index = self._get_seller_index()
 
-        # Memeriksa apakah vendor telah dipilih.
-        if not self.x_request_vendor_id:
-            raise ValidationError("Mohon pilih 'Request Vendor' sebelum membuat Purchase Order.")
+        # Mata uang PO diisi eksplisit: tanpa onchange, create() memakai mata uang perusahaan.
+        currency = self._get_purchase_currency()
 
         # Menyiapkan nilai-nilai untuk Purchase Order baru.
         po_vals = {
             'partner_id': self.x_request_vendor_id.id, # Mengambil ID partner dari Request Vendor.
             'origin': self.name,  # Menghubungkan PO kembali ke SO.
+            'x_sale_order_id': self.id, # Relasi ke SO ini.
             'partner_ref': self.name,  # Menetapkan Referensi Vendor dari nomor SO.
+            'company_id': self.company_id.id, # Perusahaan PO sama dengan perusahaan SO.
+            'currency_id': currency.id, # Mata uang pembelian vendor.
             'order_line': [], # Inisialisasi daftar baris order.
         }
 
         # Menyiapkan baris-baris untuk Purchase Order.
         for so_line in self.order_line:
-            po_line_vals = {
-                'product_id': so_line.product_id.id, # ID produk dari baris SO.
-                'name': so_line.name, # Nama produk dari baris SO.
-                'product_qty': so_line.product_uom_qty, # Kuantitas produk dari baris SO.
-                'product_uom': so_line.product_uom.id, # Unit pengukuran produk dari baris SO.
-                'price_unit': so_line.price_unit, # Harga satuan produk dari baris SO.
-                'date_planned': fields.Datetime.now(), # Tanggal yang direncanakan untuk PO.
-            }
+            po_line_vals = self._prepare_purchase_order_line_vals(so_line, date_planned, seller_index, currency)
             po_vals['order_line'].append((0, 0, po_line_vals)) # Menambahkan baris PO.
 
-        # Membuat Purchase Order.
-        purchase_order = self.env['purchase.order'].create(po_vals)
+        return po_vals
+
+    def _sync_purchase_order(self, purchase_order, date_planned, seller_index=None):
+        """
+        Metode ini menyinkronkan draft Purchase Order yang sudah ada dengan baris Sales Order ini
+        secara inkremental. Hanya baris yang ditambah, dihapus, atau berubah (produk, deskripsi,
+        kuantitas, UoM, harga) yang ditulis, dalam satu write() dengan perintah One2many.
+        Baris PO yang ditambahkan manual tidak diubah maupun dihapus.
+        Mengembalikan jumlah baris PO yang berubah.
+        """
+        self.ensure_one()  # Memastikan metode ini dipanggil pada satu record saja.
+        if seller_index is None:
+            seller_index = self._get_seller_index()
+
+        # Presisi desimal untuk membandingkan kuantitas dan harga.
+        precision = {
+            'product_qty': self.env['decimal.precision'].precision_get('Product Unit of Measure'),
+            'price_unit': self.env['decimal.precision'].precision_get('Product Price'),
+            'x_expected_price_unit': self.env['decimal.precision'].precision_get('Product Price'),
+        }
+        commands = [] # Daftar perintah One2many untuk field 'order_line' PO.
+
+        # Memetakan baris PO yang ada ke baris SO sumbernya.
+        po_lines = {}
+        for po_line in purchase_order.order_line:
+            # Baris PO yang ditambahkan manual tidak disentuh oleh sinkronisasi.
+            if not po_line.x_from_sale_line:
+                continue
+            so_line = po_line.x_sale_line_id
+            if not so_line or so_line.id in po_lines:
+                # Baris SO sumbernya sudah dihapus (atau baris PO ganda): hapus baris PO.
+                commands.append((2, po_line.id))
+            elif so_line.order_id == self:
+                po_lines[so_line.id] = po_line
+
+        # Membandingkan setiap baris SO dengan baris PO yang terhubung.
+        for so_line in self.order_line:
+            # Harga dikonversi ke mata uang PO yang sudah ada.
+            vals = self._prepare_purchase_order_line_vals(so_line, date_planned, seller_index, purchase_order.currency_id)
+            po_line = po_lines.get(so_line.id)
+            if not po_line:
+                # Baris SO baru: tambahkan baris PO.
+                commands.append((0, 0, vals))
+                continue
+            for field in PO_LINE_SYNC_FIELDS:
+                value = po_line[field]
+                if isinstance(value, models.BaseModel):
+                    changed = value.id != vals[field]
+                elif field in precision:
+                    changed = float_compare(value, vals[field], precision_digits=precision[field]) != 0
+                else:
+                    changed = value != vals[field]
+                if changed:
+                    # Baris berubah: tulis semua field sinkron sekaligus agar harga tidak dihitung
+                    # ulang oleh compute bawaan PO saat hanya kuantitas/UoM yang berubah.
+                    commands.append((1, po_line.id, {name: vals[name] for name in PO_LINE_SYNC_FIELDS}))
+                    break
+
+        # Menulis semua perubahan dalam satu write().
+        if commands:
+            purchase_order.write({'order_line': commands})
+        return len(commands)
+
+    def action_export_so_lines(self):
+        """
+        Aksi ini dipicu oleh tombol 'Export SO Lines' atau oleh server action di tampilan daftar.
+        Mengunduh baris pesanan terpilih sebagai file .xlsx dengan tata letak file impor
+        (satu sheet per pesanan), untuk diubah lalu diimpor kembali.
+        """
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/ancom_sales_orders/so_lines/export?order_ids=%s' % ','.join(str(order_id) for order_id in self.ids),
+            'target': 'self',
+        }
+
+    def action_create_po(self):
+        """
+        Aksi ini dipicu oleh tombol 'Create PO' atau oleh server action di tampilan daftar.
+        Ini membuat Purchase Order untuk setiap Sales Order terpilih yang mencentang 'Dengan PO',
+        dikelompokkan per 'Request Vendor', dengan satu panggilan create() untuk semua PO.
+        Jika Sales Order sudah memiliki draft PO untuk vendor yang sama, PO tersebut disinkronkan
+        secara inkremental alih-alih membuat PO duplikat.
+        """
+        # Hanya Sales Order yang mencentang 'Dengan PO' yang diproses.
+        orders = self.filtered('x_with_po')
+        if not orders:
+            raise ValidationError("Tidak ada Sales Order terpilih yang mencentang 'Dengan PO'.")
+
+        # Memeriksa apakah vendor telah dipilih di semua Sales Order.
+        missing_vendor = orders.filtered(lambda order: not order.x_request_vendor_id)
+        if missing_vendor:
+            raise ValidationError(
+                "Mohon pilih 'Request Vendor' sebelum membuat Purchase Order. (%s)"
+                % ', '.join(missing_vendor.mapped('name'))
+            )
+
+        # Setiap fase diukur (waktu, query SQL, baris); dump cProfile hanya jika diminta lewat context.
+        profile = self.env.context.get(phase_timer.PROFILE_CONTEXT_KEY)
+        with phase_timer.PhaseTimer('create_po', self.env.cr, profile=profile) as timer:
+            # Mencari draft PO yang sudah ada per (Sales Order, vendor) dalam satu query.
+            # Jika ada lebih dari satu, yang terbaru yang disinkronkan.
+            draft_pos = {}
+            with timer.phase('draft_po_lookup'):
+                existing_pos = self.env['purchase.order'].search([
+                    ('x_sale_order_id', 'in', orders.ids),
+                    ('state', 'in', ['draft', 'sent']),
+                ], order='id desc')
+                for po in existing_pos:
+                    draft_pos.setdefault((po.x_sale_order_id.id, po.partner_id.id), po)
 
-        # Mengembalikan aksi untuk membuka Purchase Order yang baru dibuat dalam tampilan formulir.
+            # Memuat harga vendor untuk semua baris semua Sales Order dalam satu query.
+            date_planned = fields.Datetime.now()
+            with timer.phase('seller_lookup'):
+                seller_index = orders._get_seller_index()
+
+            # Mengelompokkan Sales Order per vendor dan menyiapkan semua nilai PO baru di memori.
+            orders_by_vendor = {}
+            for order in orders:
+                orders_by_vendor.setdefault(order.x_request_vendor_id, []).append(order)
+            po_vals_list = []
+            synced_pos = self.env['purchase.order']
+            changed_lines = 0
+            for vendor, vendor_orders in orders_by_vendor.items():
+                for order in vendor_orders:
+                    draft_po = draft_pos.get((order.id, vendor.id))
+                    if draft_po:
+                        # Draft PO sudah ada: sinkronkan hanya baris yang berubah.
+                        with timer.phase('sync') as stats:
+                            changed = order._sync_purchase_order(draft_po, date_planned, seller_index)
+                            stats['rows'] += changed
+                        changed_lines += changed
+                        synced_pos |= draft_po
+                    else:
+                        with timer.phase('prepare') as stats:
+                            po_vals_list.append(order._prepare_purchase_order_vals(date_planned, seller_index))
+                            stats['rows'] += len(order.order_line)
+
+            # Membuat semua Purchase Order baru dalam satu panggilan create() batch.
+            with timer.phase('create') as stats:
+                created_pos = self.env['purchase.order'].create(po_vals_list)
+                stats['rows'] += len(created_pos)
+            # Compute yang tertunda (subtotal, total PO, dll.) dijalankan saat flush.
+            with timer.phase('recompute'):
+                self.env.flush_all()
+
+        # Menulis hasil pengukuran ke log dan melampirkan dump cProfile ke Sales Order pertama jika diminta.
+        timer.log(_logger, sale_orders=len(orders), created=len(created_pos), synced=len(synced_pos))
+        timer.save_profile(orders[:1])
+        purchase_orders = created_pos | synced_pos
+
+        # Jika hanya satu Sales Order, buka Purchase Order yang baru dibuat dalam tampilan formulir.
+        if len(self) == 1:
+            return {
+                'type': 'ir.actions.act_window', # Tipe aksi adalah membuka jendela.
+                'res_model': 'purchase.order', # Model yang akan dibuka.
+                'res_id': purchase_orders.id, # ID record yang akan dibuka.
+                'view_mode': 'form', # Mode tampilan adalah formulir.
+                'target': 'current', # Membuka di jendela saat ini.
+            }
+
+        # Jika banyak Sales Order, tampilkan ringkasan lalu buka daftar Purchase Order yang dibuat.
+        summary = ', '.join(
+            '%s (%s)' % (vendor.display_name, len(vendor_orders))
+            for vendor, vendor_orders in orders_by_vendor.items()
+        )
+        skipped = len(self) - len(orders)
+        message = "%s Purchase Order dibuat dan %s disinkronkan (%s baris diperbarui) untuk %s vendor: %s." % (
+            len(created_pos), len(synced_pos), changed_lines, len(orders_by_vendor), summary
+        )
+        if skipped:
+            message += " %s Sales Order dilewati karena tidak mencentang 'Dengan PO'." % skipped
         return {
-            'type': 'ir.actions.act_window', # Tipe aksi adalah membuka jendela.
-            'res_model': 'purchase.order', # Model yang akan dibuka.
-            'res_id': purchase_order.id, # ID record yang akan dibuka.
-            'view_mode': 'form', # Mode tampilan adalah formulir.
-            'target': 'current', # Membuka di jendela saat ini.
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': "Create PO",
+                'message': message,
+                'type': 'success',
+                'sticky': True,
+                'next': {
+                    'type': 'ir.actions.act_window',
+                    'name': "Purchase Orders",
+                    'res_model': 'purchase.order',
+                    'view_mode': 'tree,form',
+                    'views': [(False, 'tree'), (False, 'form')],
+                    'domain': [('id', 'in', purchase_orders.ids)],
+                },
+            },
         }
 
     # ===================================================
@@ -138,22 +452,156 @@ class SaleOrder(models.Model):
         Metode ini menimpa (override) 'action_confirm' asli untuk menambahkan pemeriksaan validasi
         pada field 'No Kontrak'.
         """
-        # Mengiterasi setiap Sales Order dalam recordset.
-        for order in self:
-            # Memeriksa hanya jika 'No Kontrak' telah diatur.
-            if order.x_no_kontrak:
-                # Mencari Sales Order lain dengan nomor 'No Kontrak' yang sama.
-                # Kita mengecualikan record saat ini dari pencarian.
-                domain = [
-                    ('x_no_kontrak', '=', order.x_no_kontrak), # Mencari 'No Kontrak' yang sama.
-                    ('id', '!=', order.id), # Mengecualikan ID record saat ini.
-                ]
-                existing_order = self.search(domain, limit=1) # Mencari satu record yang cocok.
-                if existing_order:
-                    # Jika ditemukan Sales Order dengan 'No Kontrak' yang sama, tampilkan pesan kesalahan.
-                    raise ValidationError(
-                        "No Kontrak sudah pernah diinputkan sebelumnya...!"
-                    )
+        # Memvalidasi 'No Kontrak' untuk seluruh recordset sekaligus.
+        self._check_no_kontrak_unique()
 
         # Jika validasi berhasil, panggil aksi konfirmasi asli.
         return super(SaleOrder, self).action_confirm()
+
+    def _check_no_kontrak_unique(self):
+        """
+        Metode ini memvalidasi 'No Kontrak' untuk seluruh recordset dengan satu query grouped,
+        bukan satu pencarian per Sales Order.
+        """
+        # Mengambil semua 'No Kontrak' yang telah diatur.
+        contracts = [contract for contract in self.mapped('x_no_kontrak') if contract]
+        if not contracts:
+            return
+
+        # Mencari 'No Kontrak' yang muncul lebih dari sekali di dalam batch ini sendiri.
+        duplicates = {contract for contract, count in Counter(contracts).items() if count > 1}
+
+        # Mencari Sales Order lain dengan 'No Kontrak' yang sama dalam satu query grouped.
+        # Kita mengecualikan record-record saat ini dari pencarian.
+        domain = [
+            ('x_no_kontrak', 'in', list(set(contracts))), # Mencari 'No Kontrak' yang sama.
+            ('id', 'not in', self.ids), # Mengecualikan ID record-record saat ini.
+        ]
+        groups = self.read_group(domain, ['x_no_kontrak'], ['x_no_kontrak'])
+        duplicates.update(group['x_no_kontrak'] for group in groups)
+
+        if duplicates:
+            # Jika ditemukan 'No Kontrak' yang sama, tampilkan pesan kesalahan beserta nomornya.
+            raise ValidationError(
+                "No Kontrak sudah pernah diinputkan sebelumnya...! (%s)" % ', '.join(sorted(duplicates))
+            )
+
+
+class PurchaseOrder(models.Model):
+    """
+    Kelas ini mewarisi model 'purchase.order' untuk menambahkan relasi Many2one kembali ke 'sale.order'.
+    Relasi ini dipakai oleh field One2many 'x_po_line_ids' di Sales Order.
+    """
+    _inherit = 'purchase.order'
+
+    x_sale_order_id = fields.Many2one(
+        'sale.order',
+        string='Sales Order Terkait', # Label field untuk Sales Order sumber.
+        index=True, # Diindeks agar pencarian PO per Sales Order tetap cepat.
+        copy=False, # Field ini tidak boleh disalin saat menduplikasi Purchase Order.
+        readonly=True,
+        help="Sales Order yang menjadi sumber Purchase Order ini."
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """
+        Metode ini menautkan PO yang dibuat di luar tombol 'Create PO' (misalnya oleh procurement),
+        yang field 'origin'-nya sama dengan nomor sebuah Sales Order, seperti perilaku sebelumnya.
+        Semua 'origin' dicari sekaligus dalam satu query.
+        """
+        # Mengumpulkan 'origin' dari PO yang belum memiliki relasi ke Sales Order.
+        origins = {vals['origin'] for vals in vals_list if vals.get('origin') and not vals.get('x_sale_order_id')}
+        if origins:
+            # Mencari semua Sales Order yang namanya cocok dalam satu query. sudo() karena
+            # PO dapat dibuat oleh pengguna Purchase yang tidak memiliki akses baca ke Sales Order.
+            orders = self.env['sale.order'].sudo().search_read([('name', 'in', list(origins))], ['name'])
+            order_ids = {order['name']: order['id'] for order in orders}
+            for vals in vals_list:
+                if not vals.get('x_sale_order_id') and vals.get('origin') in order_ids:
+                    vals['x_sale_order_id'] = order_ids[vals['origin']]
+        return super(PurchaseOrder, self).create(vals_list)
+
+    @api.model
+    def _link_legacy_sale_lines(self):
+        """
+        Metode ini (dipanggil oleh migrasi 16.0.1.2.0) menautkan baris draft PO yang dibuat sebelum
+        ada relasi per baris ('x_sale_line_id') ke baris SO sumbernya, agar sinkronisasi memperbaruinya
+        alih-alih menambahkan salinan baru. Baris dicocokkan per produk dalam Sales Order PO,
+        berurutan menurut urutan baris. Hanya PO yang belum memiliki baris tertaut yang diproses;
+        baris yang tidak menemukan pasangan tetap dianggap baris manual.
+        Mengembalikan jumlah baris PO yang ditautkan.
+        """
+        self.env.flush_all()
+        self.env.cr.execute("""
+            WITH po_lines AS (
+                SELECT line.id, po.x_sale_order_id AS sale_order_id, line.product_id,
+                       ROW_NUMBER() OVER (PARTITION BY line.order_id, line.product_id
+                                          ORDER BY line.sequence, line.id) AS rank
+                  FROM purchase_order_line line
+                  JOIN purchase_order po ON po.id = line.order_id
+                 WHERE po.state IN ('draft', 'sent')
+                   AND po.x_sale_order_id IS NOT NULL
+                   AND line.display_type IS NULL
+                   AND line.x_sale_line_id IS NULL
+                   AND NOT EXISTS (
+                       SELECT 1 FROM purchase_order_line synced
+                        WHERE synced.order_id = line.order_id AND synced.x_sale_line_id IS NOT NULL
+                   )
+            ), so_lines AS (
+                SELECT sol.id, sol.order_id, sol.product_id,
+                       ROW_NUMBER() OVER (PARTITION BY sol.order_id, sol.product_id
+                                          ORDER BY sol.sequence, sol.id) AS rank
+                  FROM sale_order_line sol
+                 WHERE sol.display_type IS NULL
+                   AND sol.order_id IN (SELECT sale_order_id FROM po_lines)
+            )
+            UPDATE purchase_order_line line
+               SET x_sale_line_id = so_lines.id,
+                   x_from_sale_line = TRUE
+              FROM po_lines
+              JOIN so_lines ON so_lines.order_id = po_lines.sale_order_id
+                           AND so_lines.product_id = po_lines.product_id
+                           AND so_lines.rank = po_lines.rank
+             WHERE line.id = po_lines.id
+        """)
+        linked = self.env.cr.rowcount
+        self.env['purchase.order.line'].invalidate_model(['x_sale_line_id', 'x_from_sale_line'])
+        return linked
+
+
+class PurchaseOrderLine(models.Model):
+    """
+    Kelas ini mewarisi model 'purchase.order.line' untuk menyimpan relasi per baris ke 'sale.order.line'.
+    Relasi ini dipakai untuk sinkronisasi inkremental Sales Order -> Purchase Order.
+    """
+    _inherit = 'purchase.order.line'
+
+    x_sale_line_id = fields.Many2one(
+        'sale.order.line',
+        string='Baris Sales Order', # Label field untuk baris Sales Order sumber.
+        index=True, # Diindeks agar pencocokan baris saat sinkronisasi tetap cepat.
+        copy=False, # Field ini tidak boleh disalin saat menduplikasi baris PO.
+        readonly=True,
+        ondelete='set null', # Jika baris SO dihapus, baris PO akan dihapus saat sinkronisasi berikutnya.
+        help="Baris Sales Order yang menjadi sumber baris Purchase Order ini."
+    )
+
+    x_from_sale_line = fields.Boolean(
+        string='Dari Sales Order', # Label field penanda baris hasil sinkronisasi.
+        copy=False, # Salinan baris PO adalah baris manual.
+        readonly=True,
+        help="Baris ini dibuat oleh sinkronisasi Sales Order -> Purchase Order. Tanda ini tetap ada "
+             "setelah baris SO-nya dihapus, sehingga hanya baris ini yang dihapus oleh sinkronisasi; "
+             "baris yang ditambahkan manual tidak disentuh."
+    )
+
+    x_expected_price_unit = fields.Float(
+        string='Expected Vendor Price', # Label field harga beli yang ditetapkan sinkronisasi.
+        digits='Product Price',
+        copy=False, # Salinan baris PO adalah baris manual.
+        readonly=True,
+        help="Harga beli yang ditetapkan sinkronisasi Sales Order -> Purchase Order (harga vendor, "
+             "atau harga SO jika vendor tidak memiliki harga). Laporan cakupan SO -> PO menandai "
+             "baris PO yang harganya berbeda dari harga ini."
+    )
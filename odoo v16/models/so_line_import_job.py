@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+
+# Mengimpor modul yang diperlukan dari Odoo.
+from odoo import models, fields, api
+from odoo.tools import split_every
+
+# Pembaca file impor secara streaming (lihat tools/so_lines_reader.py).
+from ..tools import phase_timer, so_lines_reader
+
+_logger = logging.getLogger(__name__)
+
+
+class SoLineImportJob(models.Model):
+    """
+    Model ini menyimpan job impor Baris Sales Order yang diproses di latar belakang oleh cron.
+    File diproses per batch dan setiap batch di-commit, sehingga file besar tidak terkena
+    batas waktu request dan job yang terhenti dapat dilanjutkan dari baris terakhir
+    yang sudah diproses (row_cursor).
+    Impor langsung dari wizard juga dicatat di sini sebagai job yang selesai, beserta hash
+    isi filenya (checksum), agar unggahan ulang file yang sama ke SO yang sama dapat dikenali.
+    """
+    _name = 'ancom_sales_orders.so.line.import.job'
+    _description = 'SO Line Import Job'
+    _order = 'id desc'
+
+    # ===================================================
+    # DEFINISI FIELD
+    # ===================================================
+
+    sale_order_id = fields.Many2one(
+        'sale.order',
+        string='Sales Order', # Sales Order tujuan impor.
+        required=True,
+        ondelete='cascade', # Job ikut terhapus jika Sales Order dihapus.
+        index=True,
+        readonly=True,
+    )
+
+    file_upload = fields.Binary(
+        string='File', # File Excel yang diunggah dari wizard.
+        attachment=True, # Disimpan sebagai lampiran (filestore), bukan di tabel job.
+        required=True,
+        readonly=True,
+    )
+
+    file_name = fields.Char(
+        string='File Name', # Nama file yang diunggah.
+        readonly=True,
+    )
+
+    checksum = fields.Char(
+        string='File Hash', # Hash SHA-1 isi file.
+        index=True, # Diindeks karena dicari setiap kali wizard impor dijalankan.
+        readonly=True,
+        help="Hash SHA-1 isi file, untuk mengenali unggahan ulang file yang sama."
+    )
+
+    state = fields.Selection(
+        [
+            ('queued', 'Queued'), # Menunggu diproses oleh cron.
+            ('running', 'Running'), # Sedang diproses (atau terhenti di tengah jalan).
+            ('done', 'Done'), # Semua baris sudah diimpor.
+            ('failed', 'Failed'), # Berhenti karena error.
+        ],
+        string='Status',
+        default='queued',
+        required=True,
+        index=True,
+        readonly=True,
+    )
+
+    chunk_size = fields.Integer(
+        string='Chunk Size', # Jumlah baris per batch.
+        default=1000,
+        required=True,
+        help="Jumlah baris yang diproses dan di-commit dalam satu batch."
+    )
+
+    row_cursor = fields.Integer(
+        string='Last Row', # Nomor baris file terakhir yang sudah di-commit.
+        default=0,
+        readonly=True,
+        help="Nomor baris file terakhir yang sudah di-commit. Job yang terhenti dilanjutkan dari baris berikutnya."
+    )
+
+    rows_imported = fields.Integer(
+        string='Imported Rows', # Jumlah baris SO yang sudah dibuat.
+        default=0,
+        readonly=True,
+    )
+
+    error_log = fields.Text(
+        string='Error', # Pesan error jika job gagal.
+        readonly=True,
+    )
+
+    phase_summary = fields.Text(
+        string='Phase Timings', # Waktu, jumlah query SQL dan jumlah baris per fase.
+        readonly=True,
+        help="Waktu, jumlah query SQL dan jumlah baris per fase dari proses terakhir job ini."
+    )
+
+    # ===================================================
+    # METODE
+    # ===================================================
+
+    def name_get(self):
+        # Menampilkan job sebagai "<Nomor SO> - <Nama File>".
+        return [(job.id, '%s - %s' % (job.sale_order_id.name, job.file_name or 'Import')) for job in self]
+
+    def action_requeue(self):
+        """
+        Aksi ini memasukkan kembali job yang gagal ke antrian.
+        Proses dilanjutkan dari baris setelah 'row_cursor', bukan dari awal file.
+        """
+        self.filtered(lambda job: job.state == 'failed').write({'state': 'queued', 'error_log': False})
+        self._trigger_cron()
+
+    @api.model
+    def _find_import(self, sale_order, checksum):
+        # Impor terakhir file dengan hash yang sama ke Sales Order ini, termasuk yang gagal di tengah jalan.
+        return self.search([('sale_order_id', '=', sale_order.id), ('checksum', '=', checksum)], limit=1)
+
+    @api.model
+    def _trigger_cron(self):
+        # Menjalankan cron secepatnya, tanpa menunggu interval berikutnya.
+        self.env.ref('ancom_sales_orders.ir_cron_process_so_line_import_jobs')._trigger()
+
+    @api.model
+    def _cron_process_jobs(self):
+        """
+        Metode ini dipanggil oleh cron. Job berstatus 'running' ikut diproses karena
+        itu adalah job yang worker-nya terhenti di tengah jalan dan harus dilanjutkan.
+        """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            # Job yang gagal di luar pemrosesan batch ditandai gagal agar tidak menahan antrian.
+            try:
+                job._process()
+            except Exception as e:
+                _logger.exception("SO line import job %s could not be processed", job.id)
+                if auto_commit:
+                    self.env.cr.rollback()
+                job.write({'state': 'failed', 'error_log': str(e)})
+                if auto_commit:
+                    self.env.cr.commit()
+
+    def _process(self):
+        """
+        Metode ini mengimpor baris-baris file per batch dan melakukan commit setelah setiap batch.
+        """
+        self.ensure_one()
+        # Jangan melakukan commit saat dijalankan dari test.
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        wizard = self.env['ancom_sales_orders.import.so.lines.wizard']
+        sale_order = self.sale_order_id
+
+        # Memberi tahu di chatter Sales Order bahwa impor dimulai.
+        if self.state == 'queued':
+            sale_order.message_post(body="Impor baris dari file %s dimulai di latar belakang." % self.file_name)
+        self.state = 'running'
+        if auto_commit:
+            self.env.cr.commit()
+
+        # Setiap fase diukur (waktu, query SQL, baris); dump cProfile hanya jika diminta lewat context.
+        profile = self.env.context.get(phase_timer.PROFILE_CONTEXT_KEY)
+        with phase_timer.PhaseTimer('so_line_import_job', self.env.cr, profile=profile) as timer:
+            source = None
+            try:
+                # File yang rusak atau hilang dari filestore membuat job gagal, bukan menahan antrian.
+                with timer.phase('decode'):
+                    source, checksum = wizard._open_upload(self, 'file_upload')
+                    self.checksum = checksum
+                # Baris diambil dari cache jika file yang sama sudah pernah di-parse di proses ini.
+                rows = wizard._iter_normalized_rows(source, self.file_name, checksum)
+                # Melanjutkan dari baris setelah batch terakhir yang sudah di-commit.
+                rows = (row for row in rows if row.row_number > self.row_cursor)
+                products, line_defaults = {}, {}
+                for chunk in timer.iterate('parse', split_every(self.chunk_size, rows)):
+                    with timer.phase('product_lookup'):
+                        wizard._update_product_index(products, {row.product_code for row in chunk if not row.error})
+                    with timer.phase('create_lines') as stats:
+                        lines = wizard._create_order_lines(sale_order, chunk, products, line_defaults)
+                        stats['rows'] += len(lines)
+                    # Compute tertunda (subtotal, pajak, total SO) dijalankan sekali per batch.
+                    with timer.phase('recompute'):
+                        wizard._flush_bulk_lines()
+                    # Menyimpan progres: baris terakhir yang diproses dan jumlah baris yang diimpor.
+                    with timer.phase('commit'):
+                        self.write({
+                            'row_cursor': chunk[-1].row_number,
+                            'rows_imported': self.rows_imported + len(lines),
+                        })
+                        if auto_commit:
+                            self.env.cr.commit()
+            except Exception as e:
+                _logger.exception("SO line import job %s failed", self.id)
+                # Membatalkan batch yang gagal; batch sebelumnya sudah tersimpan.
+                if auto_commit:
+                    self.env.cr.rollback()
+                self.write({'state': 'failed', 'error_log': str(e)})
+                message = "Impor baris dari file %s gagal setelah baris %s: %s" % (self.file_name, self.row_cursor, e)
+            else:
+                self.state = 'done'
+                message = "Impor baris dari file %s selesai: %s baris diimpor." % (self.file_name, self.rows_imported)
+            finally:
+                if source:
+                    source.close()
+
+        # Menyimpan ringkasan fase di job, menulisnya ke log, dan melampirkan dump cProfile jika ada.
+        timer.log(_logger, job=self.id, sale_order=sale_order.id)
+        timer.save_profile(self)
+        self.phase_summary = '\n'.join(timer.summary())
+        sale_order.message_post(body=message)
+        if auto_commit:
+            self.env.cr.commit()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Seeded generators of SO line import files (Kode Produk, Kuantitas, Harga Satuan), one
+writer per supported format. Used by the benchmark test of this addon and by
+benchmarks/bench_import_formats.py; like tools/so_lines_reader.py this module does
+not depend on Odoo.
+
+Writers whose library (openpyxl, xlwt) is not installed raise ImportError.
+The .xls format is capped at XLS_MAX_ROWS data rows.
+"""
+import csv
+import random
+
+HEADER = ('Kode Produk', 'Kuantitas', 'Harga Satuan')
+XLS_MAX_ROWS = 65535
+
+
+def generate_rows(count, seed=42, product_count=5000):
+    """'count' rows (product code PRD-00000 .. PRD-<product_count-1>, quantity, price)."""
+    rng = random.Random(seed)
+    for dummy in range(count):
+        yield (
+            'PRD-%05d' % rng.randrange(product_count),
+            rng.randint(1, 500),
+            round(rng.uniform(1000, 5000000), 2),
+        )
+
+
+def write_csv(path, rows, delimiter):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def write_xlsx(path, rows):
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_xls(path, rows):
+    import xlwt
+    workbook = xlwt.Workbook()
+    sheet = workbook.add_sheet('Sheet1')
+    for col, value in enumerate(HEADER):
+        sheet.write(0, col, value)
+    for row_idx, row in enumerate(rows, start=1):
+        for col, value in enumerate(row):
+            sheet.write(row_idx, col, value)
+    workbook.save(path)
+
+
+WRITERS = {
+    'csv': lambda path, rows: write_csv(path, rows, ','),
+    'tsv': lambda path, rows: write_csv(path, rows, '\t'),
+    'xlsx': write_xlsx,
+    'xls': write_xls,
+}
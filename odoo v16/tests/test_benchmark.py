@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark of the addon's hot paths, run by the Odoo test runner.
+
+Seeded generators create products, vendors, Sales Orders with N lines and
+import files of configurable size; every scenario is timed and its SQL
+queries are counted. Each run is rolled back to a savepoint, and the test
+transaction itself is rolled back at the end, so the database is left untouched.
+
+The benchmark is not part of the standard test run; select it by tag:
+
+    odoo-bin -c odoo.conf -d bench -u ancom_sales_orders --stop-after-init \\
+        --test-tags /ancom_sales_orders:benchmark
+
+Parameters are read from SO_BENCHMARK_* environment variables (see PARAMETERS),
+e.g. SO_BENCHMARK_ROWS=50000 SO_BENCHMARK_FORMATS=csv,xlsx. The import files are
+written by the seeded generators of tests/file_generators.py.
+
+Scenarios (one test each):
+    import        the import wizard, cold and with the file's parsed rows already cached
+    import_scaling
+                  the import wizard with a CSV file of each line count of 'scale',
+                  reporting the time and queries per line
+    confirm       action_confirm on a bulk recordset of Sales Orders
+    create_po     action_create_po on a bulk recordset, then a re-run that
+                  syncs the draft POs after some lines changed
+    po_relations  the PO count and PO One2many of a bulk recordset
+
+The results are written to SO_BENCHMARK_JSON (default: ancom_sales_orders-benchmark.json
+in the temporary directory) with the Odoo version, addon, git revision, parameters
+and one entry per scenario, so results can be compared across releases.
+"""
+import base64
+import contextlib
+import json
+import logging
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+from odoo import release
+from odoo.tests.common import TransactionCase, tagged
+
+from ..tools import parsed_rows_cache
+from . import file_generators
+
+_logger = logging.getLogger(__name__)
+
+ADDON = 'ancom_sales_orders'
+
+# Benchmark parameters and their defaults; each one can be overridden by the
+# environment variable SO_BENCHMARK_<NAME>.
+PARAMETERS = {
+    'rows': 10000,  # Data rows per import file.
+    'formats': 'xlsx,csv',  # Import file formats (csv, tsv, xlsx, xls).
+    'scale': '100,1000,10000,50000',  # Line counts of the import_scaling scenario.
+    'orders': 200,  # Sales Orders per bulk recordset.
+    'lines': 20,  # Lines per generated Sales Order.
+    'products': 2000,  # Number of generated products.
+    'repeat': 3,  # Runs per scenario; the best run is kept.
+    'seed': 42,  # Seed of the data generators.
+}
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_parameters():
+    return {
+        name: type(default)(os.environ.get('SO_BENCHMARK_%s' % name.upper(), default))
+        for name, default in PARAMETERS.items()
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=ADDON_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result(scenario, runs, records, **params):
+    """Summarise the runs of a scenario; the fastest run is kept."""
+    seconds, queries = min(runs)
+    return dict(
+        scenario=scenario,
+        records=records,
+        seconds=round(seconds, 3),
+        queries=queries,
+        records_per_second=round(records / seconds) if seconds else None,
+        runs=[round(run[0], 3) for run in runs],
+        **params
+    )
+
+
+class _Rollback(Exception):
+    pass
+
+
+@tagged('-standard', 'benchmark', 'post_install', '-at_install')
+class TestBenchmark(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.params = get_parameters()
+        cls.results = []
+        seed = cls.params['seed']
+        cls.customer = cls.env['res.partner'].create({'name': 'Benchmark Customer', 'is_company': True})
+        cls.vendor = cls.env['res.partner'].create({
+            'name': 'Benchmark Vendor', 'is_company': True, 'supplier_rank': 1})
+        cls.products = cls._create_products(cls.params['products'], seed)
+        cls._create_vendor_prices(cls.products, cls.vendor, seed)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._write_results()
+        super().tearDownClass()
+
+    # ---------------------------------------------------------------------------
+    # Generators
+    # ---------------------------------------------------------------------------
+
+    @classmethod
+    def _create_products(cls, count, seed):
+        """Products PRD-00000 .. PRD-<count-1>, matching the codes of generate_rows()."""
+        rng = random.Random(seed)
+        return cls.env['product.product'].create([{
+            'name': 'Benchmark Product %05d' % i,
+            'default_code': 'PRD-%05d' % i,
+            'type': 'consu',
+            'list_price': round(rng.uniform(1000, 5000000), 2),
+        } for i in range(count)])
+
+    @classmethod
+    def _create_vendor_prices(cls, products, vendor, seed):
+        """Vendor prices for every other product, so PO creation resolves both priced and unpriced lines."""
+        rng = random.Random(seed)
+        return cls.env['product.supplierinfo'].create([{
+            'partner_id': vendor.id,
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_code': 'V-%s' % product.default_code,
+            'price': round(product.list_price * rng.uniform(0.5, 0.9), 2),
+            'min_qty': rng.choice([0, 0, 10, 100]),
+            'delay': rng.randint(1, 30),
+        } for product in products[::2]])
+
+    def _create_orders(self, count, line_count):
+        seed = self.params['seed']
+        rng = random.Random(seed)
+        return self.env['sale.order'].create([{
+            'partner_id': self.customer.id,
+            'x_request_vendor_id': self.vendor.id,
+            'x_with_po': True,
+            'x_no_kontrak': 'BENCH-%d-%06d' % (seed, i),
+            'order_line': [(0, 0, {
+                'product_id': product.id,
+                'product_uom_qty': rng.randint(1, 500),
+                'price_unit': product.list_price,
+            }) for product in rng.sample(list(self.products), min(line_count, len(self.products)))],
+        } for i in range(count)])
+
+    def _write_import_file(self, directory, file_format, row_count):
+        """Write a generated import file; returns (data, file name, row count)."""
+        if file_format == 'xls':
+            row_count = min(row_count, file_generators.XLS_MAX_ROWS)
+        path = os.path.join(directory, 'lines.%s' % file_format)
+        file_generators.WRITERS[file_format](
+            path, file_generators.generate_rows(row_count, self.params['seed'], self.params['products']))
+        with open(path, 'rb') as f:
+            return base64.b64encode(f.read()), os.path.basename(path), row_count
+
+    # ---------------------------------------------------------------------------
+    # Measurement
+    # ---------------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def _rolled_back(self):
+        """Run the block in a savepoint that is always rolled back."""
+        try:
+            with self.env.cr.savepoint():
+                yield
+                raise _Rollback()
+        except _Rollback:
+            pass
+        self.env.invalidate_all()
+
+    def _measure(self, func):
+        """Return (seconds, queries) of func(), including the final flush to the database."""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        func()
+        self.env.flush_all()
+        return time.perf_counter() - start, self.env.cr.sql_log_count - queries
+
+    def _run_import(self, file_data, file_name, row_count):
+        order = self._create_orders(1, 0)
+        wizard = self.env['ancom_sales_orders.import.so.lines.wizard'].with_context(active_id=order.id).create({
+            'file_upload': file_data,
+            'file_name': file_name,
+        })
+        run = self._measure(wizard.action_import_lines)
+        self.assertEqual(len(order.order_line), row_count, file_name)
+        return run
+
+    @classmethod
+    def _write_results(cls):
+        if not cls.results:
+            return
+        _logger.info('%-15s %-6s %8s %9s %9s %10s', 'scenario', 'format', 'records', 'seconds', 'queries', 'records/s')
+        for row in cls.results:
+            if 'skipped' in row:
+                _logger.info('%-15s %-6s skipped: %s', row['scenario'], row['format'], row['skipped'])
+                continue
+            _logger.info('%-15s %-6s %8d %9.3f %9d %10s', row['scenario'], row.get('format', ''), row['records'],
+                         row['seconds'], row['queries'], row['records_per_second'])
+
+        path = os.environ.get('SO_BENCHMARK_JSON') or os.path.join(tempfile.gettempdir(), '%s-benchmark.json' % ADDON)
+        with open(path, 'w') as f:
+            json.dump({
+                'odoo_version': release.version,
+                'addon': ADDON,
+                'git_revision': git_revision(),
+                'parameters': cls.params,
+                'results': cls.results,
+            }, f, indent=2)
+        _logger.info("Benchmark results written to %s", path)
+
+    # ---------------------------------------------------------------------------
+    # Scenarios
+    # ---------------------------------------------------------------------------
+
+    def test_import(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for file_format in self.params['formats'].split(','):
+                try:
+                    file_data, file_name, row_count = self._write_import_file(directory, file_format, self.params['rows'])
+                except ImportError as e:
+                    self.results.append({'scenario': 'import', 'format': file_format, 'skipped': str(e)})
+                    continue
+
+                runs, cached_runs = [], []
+                for dummy in range(self.params['repeat']):
+                    parsed_rows_cache.parsed_rows.clear()
+                    with self._rolled_back():
+                        runs.append(self._run_import(file_data, file_name, row_count))
+                        # Same file into another order: the rows now come from the parsed-rows cache.
+                        cached_runs.append(self._run_import(file_data, file_name, row_count))
+                self.results.append(result('import', runs, row_count, format=file_format))
+                self.results.append(result('import_cached', cached_runs, row_count, format=file_format))
+
+    def test_import_scaling(self):
+        """The same import with a growing number of lines: the cost per line should stay flat."""
+        with tempfile.TemporaryDirectory() as directory:
+            for line_count in map(int, self.params['scale'].split(',')):
+                file_data, file_name, row_count = self._write_import_file(directory, 'csv', line_count)
+                runs = []
+                for dummy in range(self.params['repeat']):
+                    parsed_rows_cache.parsed_rows.clear()
+                    with self._rolled_back():
+                        runs.append(self._run_import(file_data, file_name, row_count))
+                entry = result('import_scaling', runs, row_count, format='csv')
+                entry['ms_per_line'] = round(entry['seconds'] * 1000 / row_count, 3)
+                entry['queries_per_line'] = round(entry['queries'] / row_count, 3)
+                self.results.append(entry)
+
+    def test_confirm(self):
+        runs = []
+        for dummy in range(self.params['repeat']):
+            with self._rolled_back():
+                orders = self._create_orders(self.params['orders'], self.params['lines'])
+                runs.append(self._measure(orders.action_confirm))
+        self.results.append(result('confirm', runs, self.params['orders'], lines_per_order=self.params['lines']))
+
+    def test_create_po(self):
+        create_runs, sync_runs = [], []
+        rng = random.Random(self.params['seed'])
+        for dummy in range(self.params['repeat']):
+            with self._rolled_back():
+                orders = self._create_orders(self.params['orders'], self.params['lines'])
+                create_runs.append(self._measure(orders.action_create_po))
+                # Change a tenth of the lines, then measure the incremental sync of the draft POs.
+                lines = orders.order_line
+                for line in rng.sample(list(lines), len(lines) // 10):
+                    line.product_uom_qty += 1
+                sync_runs.append(self._measure(orders.action_create_po))
+        self.results.append(result('create_po', create_runs, self.params['orders'], lines_per_order=self.params['lines']))
+        self.results.append(result('create_po_sync', sync_runs, self.params['orders'], lines_per_order=self.params['lines']))
+
+    def test_po_relations(self):
+        runs = []
+        for dummy in range(self.params['repeat']):
+            with self._rolled_back():
+                orders = self._create_orders(self.params['orders'], self.params['lines'])
+                orders.action_create_po()
+                runs.append(self._measure(lambda: (
+                    orders.mapped('purchase_order_count'),
+                    orders.mapped('x_po_line_ids').mapped('name'),
+                )))
+        self.results.append(result('po_relations', runs, self.params['orders']))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import base64
+from unittest.mock import patch
+
+from odoo.tests.common import TransactionCase, tagged
+
+from ..tools import parsed_rows_cache
+from ..wizard import import_so_lines_wizard
+
+# The batch size is reduced during the test so the large import crosses several batch boundaries.
+CHUNK_SIZE = 100
+SMALL_ROW_COUNT = 20
+LARGE_ROW_COUNT = 500
+
+# Bound of the extra queries per row. Product lookup, line creation and recomputes run per
+# batch, but the standard SO line computes (e.g. analytic distribution and pricelist rule)
+# still search once per record on create(). A row-by-row import needs far more queries per
+# row than this bound.
+MAX_QUERIES_PER_ROW = 3
+
+
+@tagged('post_install', '-at_install')
+class TestImportSoLines(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env['res.partner'].create({'name': 'Import Customer'})
+        cls.product = cls.env['product.product'].create({
+            'name': 'Import Product',
+            'default_code': 'IMP-001',
+            'type': 'consu',
+            'list_price': 1000.0,
+        })
+
+    def _import_rows(self, row_count, price_unit):
+        """
+        Import 'row_count' rows into a new SO and return the number of SQL queries.
+        The price differs per import so every file has its own content (and hash), and the
+        parsed-rows cache is cleared so every import really parses its file.
+        """
+        sale_order = self.env['sale.order'].create({'partner_id': self.partner.id})
+        content = 'Kode Produk,Kuantitas,Harga Satuan\n' + 'IMP-001,2,%s\n' % price_unit * row_count
+        wizard = self.env['ancom_sales_orders.import.so.lines.wizard'].with_context(active_id=sale_order.id).create({
+            'file_upload': base64.b64encode(content.encode()),
+            'file_name': 'lines-%s.csv' % row_count,
+        })
+        parsed_rows_cache.parsed_rows.clear()
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.cr.sql_log_count
+        with patch.object(import_so_lines_wizard, 'IMPORT_CHUNK_SIZE', CHUNK_SIZE):
+            wizard.action_import_lines()
+        self.env.flush_all()
+        queries = self.cr.sql_log_count - queries
+        self.assertEqual(len(sale_order.order_line), row_count)
+        return queries
+
+    def test_import_query_count_per_row_is_bounded(self):
+        """The extra queries for 25x more rows stay below MAX_QUERIES_PER_ROW per row."""
+        # The first import warms up the ORM caches (fields, access rights, sequences).
+        self._import_rows(SMALL_ROW_COUNT, 1100)
+        small_queries = self._import_rows(SMALL_ROW_COUNT, 1200)
+        large_queries = self._import_rows(LARGE_ROW_COUNT, 1300)
+        per_row = (large_queries - small_queries) / (LARGE_ROW_COUNT - SMALL_ROW_COUNT)
+        self.assertLessEqual(
+            per_row, MAX_QUERIES_PER_ROW,
+            "Importing %s rows ran %s queries, importing %s rows %s queries (%.2f queries per row)" % (
+                SMALL_ROW_COUNT, small_queries, LARGE_ROW_COUNT, large_queries, per_row))
+
+    def test_upsert_counts_file_rows(self):
+        """A merge import records the number of file rows imported, not the number of SO lines created or updated."""
+        product = self.env['product.product'].create({
+            'name': 'Import Product 2', 'default_code': 'IMP-002', 'type': 'consu'})
+        sale_order = self.env['sale.order'].create({
+            'partner_id': self.partner.id,
+            'order_line': [(0, 0, {'product_id': self.product.id, 'product_uom_qty': 2, 'price_unit': 1000})],
+        })
+        # Two rows merge into the unchanged IMP-001 line, the third one creates the IMP-002 line.
+        rows = [('IMP-001', 1, 1000), ('IMP-001', 1, 1000), ('IMP-002', 1, 500)]
+        content = 'Product Code,Qty,Unit Price,SO Number\n' + ''.join(
+            '%s,%s,%s,%s\n' % (code, qty, price, sale_order.name) for code, qty, price in rows)
+        wizard = self.env['ancom_sales_orders.import.so.lines.wizard'].create({
+            'file_upload': base64.b64encode(content.encode()),
+            'file_name': 'merge.csv',
+            'multi_order': True,
+            'import_mode': 'upsert',
+        })
+        wizard.action_import_lines()
+        self.assertEqual(sale_order.order_line.product_id, self.product | product)
+        job = self.env['ancom_sales_orders.so.line.import.job'].search([('sale_order_id', '=', sale_order.id)])
+        self.assertEqual(job.rows_imported, 3)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestSyncPurchaseOrder(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.customer = cls.env['res.partner'].create({'name': 'Sync Customer'})
+        cls.vendor = cls.env['res.partner'].create({'name': 'Sync Vendor', 'supplier_rank': 1})
+        cls.product_a, cls.product_b, cls.product_manual = cls.env['product.product'].create([{
+            'name': 'Sync Product %s' % code,
+            'default_code': 'SYNC-%s' % code,
+            'type': 'consu',
+            'list_price': 1000.0,
+        } for code in ('A', 'B', 'M')])
+        cls.sale_order = cls.env['sale.order'].create({
+            'partner_id': cls.customer.id,
+            'x_request_vendor_id': cls.vendor.id,
+            'x_with_po': True,
+            'order_line': [(0, 0, {
+                'product_id': product.id,
+                'product_uom_qty': 5,
+                'price_unit': 1000.0,
+            }) for product in (cls.product_a, cls.product_b)],
+        })
+
+    def _manual_line_vals(self):
+        return {
+            'product_id': self.product_manual.id,
+            'name': self.product_manual.name,
+            'product_qty': 1,
+            'product_uom': self.product_manual.uom_id.id,
+            'price_unit': 500.0,
+            'date_planned': fields.Datetime.now(),
+        }
+
+    def _assert_synced(self, purchase_order, manual_line):
+        """One PO line per SO line, and the manual line is still there, unchanged."""
+        self.assertEqual(self.sale_order.x_po_line_ids, purchase_order)
+        synced = purchase_order.order_line.filtered('x_from_sale_line')
+        self.assertEqual(synced.x_sale_line_id, self.sale_order.order_line)
+        self.assertEqual(len(synced), len(self.sale_order.order_line))
+        self.assertTrue(manual_line.exists())
+        self.assertFalse(manual_line.x_from_sale_line)
+        self.assertEqual(manual_line.product_qty, 1)
+
+    def test_sync_keeps_manual_lines(self):
+        """Syncing a draft PO does not remove manually added lines."""
+        self.sale_order.action_create_po()
+        purchase_order = self.sale_order.x_po_line_ids
+        manual_line = self.env['purchase.order.line'].create(dict(self._manual_line_vals(), order_id=purchase_order.id))
+        self.sale_order.order_line[0].product_uom_qty = 7
+        self.sale_order.action_create_po()
+        self._assert_synced(purchase_order, manual_line)
+        self.assertEqual(purchase_order.order_line.filtered('x_from_sale_line').mapped('product_qty'), [7, 5])
+
+    def test_sync_legacy_purchase_order(self):
+        """An old draft PO (without per-line link) is updated once linked, not duplicated."""
+        purchase_order = self.env['purchase.order'].create({
+            'partner_id': self.vendor.id,
+            'origin': self.sale_order.name,
+            'x_sale_order_id': self.sale_order.id,
+            'order_line': [(0, 0, {
+                'product_id': line.product_id.id,
+                'name': line.name,
+                'product_qty': line.product_uom_qty,
+                'product_uom': line.product_uom.id,
+                'price_unit': line.price_unit,
+                'date_planned': fields.Datetime.now(),
+            }) for line in self.sale_order.order_line] + [(0, 0, self._manual_line_vals())],
+        })
+        manual_line = purchase_order.order_line.filtered(lambda line: line.product_id == self.product_manual)
+
+        linked = self.env['purchase.order']._link_legacy_sale_lines()
+        self.assertEqual(linked, 2)
+
+        self.sale_order.action_create_po()
+        self._assert_synced(purchase_order, manual_line)
+        self.assertEqual(len(purchase_order.order_line), 3)
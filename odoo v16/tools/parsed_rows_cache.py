@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of normalised import rows, keyed by the content hash of the file.
+
+Users often retry the import wizard after a timeout, or upload the same
+supplier sheet to several SOs. With this cache a re-upload of the same file
+is not parsed again: the ImportRow tuples produced by normalize_rows() are
+taken straight from memory.
+
+The cache lives in the process (every Odoo worker has its own) and is bounded:
+- by number of entries (LRU: the least recently used entry is evicted first),
+- by rows per entry and by file size: large files are not cached at all, and
+  collecting rows stops as soon as the bound is exceeded,
+- by total number of rows over all entries,
+- by entry age (TTL), so the worker's memory is not held for too long.
+
+The cache only targets small files that are uploaded again and again; large
+files belong in background imports and must not hold the worker's memory.
+"""
+import collections
+import threading
+import time
+
+# Default bounds; the row count drives the memory use (about 200 bytes per row).
+MAX_ENTRIES = 32
+MAX_ROWS = 100000
+MAX_ENTRY_ROWS = 20000
+# Files larger than this (bytes) are not cached; checked before any row is collected.
+MAX_FILE_SIZE = 2 * 1024 * 1024
+TTL_SECONDS = 3600
+
+
+class ParsedRowsCache(object):
+    """Thread-safe LRU + TTL cache holding a tuple of ImportRow per key."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_rows=MAX_ROWS, max_entry_rows=MAX_ENTRY_ROWS,
+                 max_file_size=MAX_FILE_SIZE, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.max_entry_rows = max_entry_rows
+        self.max_file_size = max_file_size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()  # key -> (expires_at, rows)
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Rows stored for 'key', or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, rows):
+        """Store a tuple of rows for 'key'; ignored when larger than max_entry_rows."""
+        rows = tuple(rows)
+        if len(rows) > self.max_entry_rows:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, rows)
+            self._rows += len(rows)
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                self._remove(next(iter(self._entries)))
+
+    def collect(self, key, rows, file_size=None):
+        """
+        Pass the rows of 'rows' through while collecting them, and store them in the
+        cache once the iteration completes. Files larger than max_file_size bytes are
+        not collected at all: 'rows' is returned as is.
+        """
+        if file_size is not None and file_size > self.max_file_size:
+            return rows
+        return self._collect(key, rows)
+
+    def _collect(self, key, rows):
+        """
+        Nothing is stored when the iteration stops half-way (e.g. on an error). As soon
+        as more than max_entry_rows rows are seen, the collected rows are released.
+        """
+        collected = []
+        for row in rows:
+            if collected is not None:
+                collected.append(row)
+                if len(collected) > self.max_entry_rows:
+                    collected = None
+            yield row
+        if collected is not None:
+            self.put(key, collected)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def _remove(self, key):
+        self._rows -= len(self._entries.pop(key)[1])
+
+
+# Cache shared by the import wizard and jobs of this process.
+parsed_rows = ParsedRowsCache()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight instrumentation of the hot paths (SO line import and PO creation).
+
+PhaseTimer records the wall time, SQL query count (cursor.sql_log_count) and
+rows processed for each phase of an operation, then emits them as structured
+(key=value) log lines and as a short summary for the chatter or job record.
+It only costs a few perf_counter() calls per phase.
+
+A full cProfile run is only captured when the context holds
+PROFILE_CONTEXT_KEY, and is stored as a .prof attachment (pstats format)
+for deep dives:
+
+    python -m pstats so_line_import-20250101-120000.prof
+"""
+import base64
+import cProfile
+import contextlib
+import marshal
+import time
+
+# Context key that enables the cProfile dump, e.g. with_context(phase_timer_profile=True).
+PROFILE_CONTEXT_KEY = 'phase_timer_profile'
+
+
+class PhaseTimer(object):
+    """
+    Per-phase meter of one operation. Used as a context manager around the
+    whole operation, and timer.phase(name) around each phase::
+
+        with PhaseTimer('so_line_import', env.cr) as timer:
+            with timer.phase('decode'):
+                ...
+            for chunk in timer.iterate('parse', chunks):
+                with timer.phase('create_lines') as stats:
+                    stats['rows'] += len(lines)
+
+    Phases with the same name are accumulated (e.g. one phase per batch).
+    """
+
+    def __init__(self, operation, cr, profile=False):
+        self.operation = operation
+        self.cr = cr
+        self.phases = {}
+        self.seconds = 0.0
+        self.queries = 0
+        self.profiler = cProfile.Profile() if profile else None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._start_queries = self.cr.sql_log_count
+        if self.profiler:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profiler:
+            self.profiler.disable()
+        self.seconds = time.perf_counter() - self._start
+        self.queries = self.cr.sql_log_count - self._start_queries
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Measure one phase; yields the phase's stats dict so the caller can add 'rows'."""
+        stats = self.phases.setdefault(name, {'seconds': 0.0, 'queries': 0, 'rows': 0, 'calls': 0})
+        start = time.perf_counter()
+        queries = self.cr.sql_log_count
+        try:
+            yield stats
+        finally:
+            stats['seconds'] += time.perf_counter() - start
+            stats['queries'] += self.cr.sql_log_count - queries
+            stats['calls'] += 1
+
+    def iterate(self, name, chunks):
+        """
+        Pass the batches of 'chunks' through while measuring the fetch of each batch
+        as phase 'name'. Meant for lazy generators (file reading), so their time is
+        not mixed up with the caller's processing of the batch.
+        """
+        iterator = iter(chunks)
+        while True:
+            with self.phase(name) as stats:
+                chunk = next(iterator, None)
+                if chunk is not None:
+                    stats['rows'] += len(chunk)
+            if chunk is None:
+                return
+            yield chunk
+
+    def log(self, logger, **extra):
+        """Emit one structured log line per phase and one for the total."""
+        context = ''.join(' %s=%r' % item for item in extra.items())
+        for name, stats in self.phases.items():
+            logger.info("phase_timer operation=%s phase=%s seconds=%.3f queries=%d rows=%d calls=%d%s",
+                        self.operation, name, stats['seconds'], stats['queries'], stats['rows'],
+                        stats['calls'], context)
+        logger.info("phase_timer operation=%s phase=total seconds=%.3f queries=%d%s",
+                    self.operation, self.seconds, self.queries, context)
+
+    def summary(self):
+        """Per-phase summary as a list of text lines, for the chatter or a job record."""
+        lines = ['%s: %.3f s / %d queries / %d rows' % (name, stats['seconds'], stats['queries'], stats['rows'])
+                 for name, stats in self.phases.items()]
+        lines.append('total: %.3f s / %d queries' % (self.seconds, self.queries))
+        return lines
+
+    def save_profile(self, record):
+        """
+        Store the cProfile result as an attachment of 'record' and return the attachment.
+        Does nothing when profiling is not enabled.
+        """
+        if not self.profiler:
+            return record.env['ir.attachment']
+        self.profiler.create_stats()
+        return record.env['ir.attachment'].create({
+            'name': '%s-%s.prof' % (self.operation, time.strftime('%Y%m%d-%H%M%S')),
+            'datas': base64.b64encode(marshal.dumps(self.profiler.stats)),
+            'mimetype': 'application/octet-stream',
+            'res_model': record._name,
+            'res_id': record.id,
+        })
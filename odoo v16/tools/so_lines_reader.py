@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming reader for Sales Order line import files.
+
+Rows are produced lazily (generator) so the worker memory stays bounded
+whatever the size of the uploaded file:
+- .xlsx files are read with openpyxl in read-only mode (iterparse over the sheet XML).
+- .xls files are read with xlrd in on_demand mode (only the used sheet is loaded).
+- .csv/.tsv files are read with the Python csv module (C parser), the fastest
+  path for flat files exported by other systems.
+
+Every format goes through the same normalisation stage (normalize_rows) so
+cells are converted to (code, quantity, price) identically for all formats.
+
+For multi-order imports, iter_workbook_rows reads every sheet and
+normalize_order_rows adds the SO reference of each row: the 4th column
+(ORDER_REF_COLUMN) or, when it is empty, the sheet name.
+
+Integrations pushing lines over HTTP go through iter_record_rows, which reads
+NDJSON/CSV records straight from the request stream and yields rows shaped
+like those of iter_workbook_rows.
+
+This module does not depend on Odoo so it can be reused outside of the wizard.
+"""
+import base64
+import codecs
+import collections
+import csv
+import io
+import json
+import os
+import tempfile
+
+# Both Excel reader libraries are optional.
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+
+# Size of the base64 slices decoded at once (must be a multiple of 4).
+B64_CHUNK_SIZE = 1024 * 1024
+# Decoded files bigger than this are spooled to disk instead of kept in memory.
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+XLSX_SIGNATURE = b'PK\x03\x04'
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0'
+# Number of leading bytes of a text file used to guess the format and the delimiter.
+SNIFF_SIZE = 64 * 1024
+CSV_DELIMITERS = ',;\t'
+# Column (0-based) holding the SO number in multi-order imports.
+ORDER_REF_COLUMN = 3
+
+# Field names of the NDJSON/CSV records sent by integrations, in the column order of import files.
+RECORD_FIELDS = ('default_code', 'qty', 'price', 'order')
+
+# Error codes of normalised rows; the caller builds the actual message.
+ERROR_MISSING_CODE = 'missing_code'
+ERROR_INVALID_NUMBER = 'invalid_number'
+ERROR_MISSING_ORDER = 'missing_order'
+
+# One normalised import row. 'error' holds an error code when the row is invalid.
+# 'sheet' and 'order_ref' are only set by multi-order imports.
+ImportRow = collections.namedtuple(
+    'ImportRow', ['row_number', 'product_code', 'quantity', 'price_unit', 'error', 'sheet', 'order_ref'],
+    defaults=(None, None))
+
+
+class ImportFileError(Exception):
+    """The import file is unsupported, corrupted, or its reader library is missing."""
+
+
+def b64decode_to_file(data, hasher=None):
+    """
+    Decode base64 data (the value of a Binary field) slice by slice into a temporary file.
+    This avoids a second full in-memory copy of the file content.
+    When a hashlib object is given as 'hasher', it is fed the decoded content,
+    so the file's content hash comes for free.
+    """
+    tmp = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for start in range(0, len(data), B64_CHUNK_SIZE):
+        chunk = base64.b64decode(data[start:start + B64_CHUNK_SIZE])
+        if hasher is not None:
+            hasher.update(chunk)
+        tmp.write(chunk)
+    tmp.seek(0)
+    return tmp
+
+
+def _read_text_sample(fileobj):
+    """Read the beginning of the file as UTF-8 text; None if the content is not text."""
+    sample = fileobj.read(SNIFF_SIZE)
+    fileobj.seek(0)
+    try:
+        # The incremental decoder does not fail on a multi-byte character cut at the end of the sample.
+        return codecs.getincrementaldecoder('utf-8-sig')().decode(sample)
+    except UnicodeDecodeError:
+        return None
+
+
+def detect_format(fileobj, file_name=None):
+    """
+    Detect the file format from its content signature, then from the file name
+    extension, then by sniffing the content: text files are treated as CSV.
+    """
+    head = fileobj.read(len(XLSX_SIGNATURE))
+    fileobj.seek(0)
+    if head.startswith(XLSX_SIGNATURE):
+        return 'xlsx'
+    if head.startswith(XLS_SIGNATURE):
+        return 'xls'
+    extension = os.path.splitext(file_name or '')[1].lower().lstrip('.')
+    if extension in ('xlsx', 'xls', 'csv', 'tsv'):
+        return extension
+    if extension == 'txt' or _read_text_sample(fileobj) is not None:
+        return 'csv'
+    raise ImportFileError("Unknown file format. Please use an .xls, .xlsx, .csv or .tsv file.")
+
+
+def _iter_xlsx_rows(fileobj, sheet_index):
+    if not openpyxl:
+        raise ImportFileError('The Python library "openpyxl" is not installed. Please install it to read .xlsx files.')
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[sheet_index]
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _open_xls_book(fileobj):
+    """
+    Open an .xls workbook. A file on disk (e.g. in the filestore) is opened by
+    name, so xlrd memory-maps it instead of copying its content; any other file
+    object is read whole, which is fine as the .xls format is capped at 65,536 rows.
+    """
+    name = getattr(fileobj, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return xlrd.open_workbook(name, on_demand=True)
+    return xlrd.open_workbook(file_contents=fileobj.read(), on_demand=True)
+
+
+def _iter_xls_rows(fileobj, sheet_index):
+    if not xlrd:
+        raise ImportFileError('The Python library "xlrd" is not installed. Please install it to read .xls files.')
+    # on_demand makes sure only the requested sheet gets parsed.
+    book = _open_xls_book(fileobj)
+    try:
+        sheet = book.sheet_by_index(sheet_index)
+        for row_idx in range(sheet.nrows):
+            yield sheet.row_values(row_idx)
+    finally:
+        book.release_resources()
+
+
+def _iter_xlsx_sheets(fileobj):
+    if not openpyxl:
+        raise ImportFileError('The Python library "openpyxl" is not installed. Please install it to read .xlsx files.')
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield sheet.title, sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_xls_sheets(fileobj):
+    if not xlrd:
+        raise ImportFileError('The Python library "xlrd" is not installed. Please install it to read .xls files.')
+    book = _open_xls_book(fileobj)
+    try:
+        for sheet_index in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_index)
+            yield sheet.name, (sheet.row_values(row_idx) for row_idx in range(sheet.nrows))
+            # Release every sheet once read so only one sheet is held in memory.
+            book.unload_sheet(sheet_index)
+    finally:
+        book.release_resources()
+
+
+def _iter_csv_rows(fileobj, delimiter=None):
+    if delimiter is None:
+        # Guess the delimiter (comma, semicolon or tab) from the beginning of the file.
+        try:
+            delimiter = csv.Sniffer().sniff(_read_text_sample(fileobj) or '', CSV_DELIMITERS).delimiter
+        except csv.Error:
+            delimiter = ','
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text, delimiter=delimiter)
+    finally:
+        # Detach the wrapper without closing the underlying file.
+        text.detach()
+
+
+def _numbered_rows(reader, skip_header):
+    """(row_number, cell_values) per row; numbers start at 1 and empty rows are skipped."""
+    for row_number, values in enumerate(reader, start=1):
+        if skip_header and row_number == 1:
+            continue
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield row_number, values
+
+
+def iter_rows(fileobj, file_name=None, sheet_index=0, skip_header=True):
+    """
+    Generator yielding (row_number, cell_values) for every row of the file.
+    Row numbers start at 1 like in Excel; fully empty rows are skipped.
+    Format errors raised by the reader libraries are wrapped into ImportFileError.
+    """
+    file_format = detect_format(fileobj, file_name)
+    if file_format == 'xlsx':
+        reader = _iter_xlsx_rows(fileobj, sheet_index)
+    elif file_format == 'xls':
+        reader = _iter_xls_rows(fileobj, sheet_index)
+    else:
+        reader = _iter_csv_rows(fileobj, '\t' if file_format == 'tsv' else None)
+    try:
+        yield from _numbered_rows(reader, skip_header)
+    except ImportFileError:
+        raise
+    except Exception as e:
+        raise ImportFileError("The file is corrupted or cannot be read: %s" % e) from e
+
+
+def iter_workbook_rows(fileobj, file_name=None, skip_header=True):
+    """
+    Like iter_rows, but reads every sheet in turn and yields
+    (sheet_name, row_number, cell_values). CSV/TSV files are a single unnamed sheet.
+    The header row of every sheet is skipped.
+    """
+    file_format = detect_format(fileobj, file_name)
+    if file_format == 'xlsx':
+        sheets = _iter_xlsx_sheets(fileobj)
+    elif file_format == 'xls':
+        sheets = _iter_xls_sheets(fileobj)
+    else:
+        sheets = [(None, _iter_csv_rows(fileobj, '\t' if file_format == 'tsv' else None))]
+    try:
+        for sheet_name, reader in sheets:
+            for row_number, values in _numbered_rows(reader, skip_header):
+                yield sheet_name, row_number, values
+    except ImportFileError:
+        raise
+    except Exception as e:
+        raise ImportFileError("The file is corrupted or cannot be read: %s" % e) from e
+
+
+def iter_record_rows(stream, data_format='ndjson'):
+    """
+    Read {order, default_code, qty, price} records from a binary stream incrementally
+    and yield (None, row_number, values) with the columns of RECORD_FIELDS, ready to
+    be normalised by normalize_order_rows.
+    - ndjson: one JSON object per line; blank lines are skipped.
+    - csv: the first row is a header holding the RECORD_FIELDS names.
+    """
+    text = codecs.getreader('utf-8-sig')(stream)
+    if data_format == 'csv':
+        reader = csv.reader(text)
+        header = [name.strip() for name in next(reader, [])]
+        missing = [name for name in RECORD_FIELDS if name not in header]
+        if missing:
+            raise ImportFileError("Missing CSV header columns: %s" % ', '.join(missing))
+        positions = [header.index(name) for name in RECORD_FIELDS]
+        for row_number, values in _numbered_rows(reader, skip_header=False):
+            yield None, row_number + 1, [values[i] if i < len(values) else None for i in positions]
+        return
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ImportFileError("Line %s is not valid JSON: %s" % (row_number, e)) from e
+        if not isinstance(record, dict):
+            raise ImportFileError("Line %s must be a JSON object." % row_number)
+        yield None, row_number, [record.get(name) for name in RECORD_FIELDS]
+
+def _to_code(value):
+    """Product code as text; integral numbers coming from Excel (1001.0) become '1001'."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() if value is not None else ''
+
+
+def _to_number(value):
+    """Number from a numeric or text cell; ValueError/TypeError when invalid."""
+    if isinstance(value, str):
+        value = value.strip()
+    return float(value)
+
+
+def _normalize_row(row_number, values, sheet=None, order_ref=None):
+    product_code = _to_code(values[0]) if values else ''
+    if not product_code:
+        return ImportRow(row_number, product_code, 0.0, 0.0, ERROR_MISSING_CODE, sheet, order_ref)
+    try:
+        quantity = _to_number(values[1])
+        price_unit = _to_number(values[2])
+    except (ValueError, TypeError, IndexError):
+        return ImportRow(row_number, product_code, 0.0, 0.0, ERROR_INVALID_NUMBER, sheet, order_ref)
+    return ImportRow(row_number, product_code, quantity, price_unit, None, sheet, order_ref)
+
+
+def normalize_rows(rows):
+    """
+    Normalisation stage shared by every format: turn (row_number, cell_values) into
+    ImportRow with a text code and float quantity and price. Invalid rows are still
+    yielded with an error code in 'error', so the caller decides whether the row
+    is skipped or the import is aborted.
+    """
+    for row_number, values in rows:
+        yield _normalize_row(row_number, values)
+
+
+def normalize_order_rows(rows):
+    """
+    Normalisation for multi-order imports: turn (sheet_name, row_number, cell_values)
+    from iter_workbook_rows into ImportRow that also carries the sheet and SO number.
+    The SO number is read from column ORDER_REF_COLUMN, or is the sheet name when empty.
+    """
+    for sheet, row_number, values in rows:
+        order_ref = _to_code(values[ORDER_REF_COLUMN]) if len(values) > ORDER_REF_COLUMN else ''
+        order_ref = order_ref or (sheet or '').strip()
+        row = _normalize_row(row_number, values, sheet, order_ref)
+        if not row.error and not order_ref:
+            row = row._replace(error=ERROR_MISSING_ORDER)
+        yield row
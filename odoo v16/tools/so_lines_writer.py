@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Writer for Sales Order line files (.xlsx) laid out like import files:
+Product Code, Qty, Unit Price, and the SO number in the 4th column
+(so_lines_reader.ORDER_REF_COLUMN).
+
+Workbooks are written with xlsxwriter in constant_memory mode: every row is
+flushed to the sheet's temporary file right away instead of being kept in
+memory, so exporting tens of thousands of lines uses a fixed amount of memory.
+Rows must therefore be written in order, one sheet after the other.
+
+Exported files can be imported again as they are, either with the single-order
+wizard (the 4th column is ignored) or with the multi-order import.
+
+Like so_lines_reader, this module does not depend on Odoo.
+"""
+import re
+
+import xlsxwriter
+
+from .so_lines_reader import ORDER_REF_COLUMN
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Column titles of the first row; readers skip it (skip_header).
+HEADER = ('Product Code', 'Qty', 'Unit Price', 'SO Number')
+
+# Maximum length of an Excel sheet name and the characters it may not contain.
+SHEET_NAME_MAX_LENGTH = 31
+SHEET_NAME_INVALID = re.compile(r'[\[\]:*?/\\]')
+
+
+def _sheet_name(name, used):
+    """Return a valid sheet name, unique within the workbook."""
+    base = SHEET_NAME_INVALID.sub('_', name or '').strip("'")[:SHEET_NAME_MAX_LENGTH] or 'Sheet'
+    candidate, counter = base, 1
+    while candidate.lower() in used:
+        counter += 1
+        suffix = ' (%s)' % counter
+        candidate = base[:SHEET_NAME_MAX_LENGTH - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+def write_xlsx(fileobj, sheets, header=HEADER):
+    """
+    Write an .xlsx workbook to 'fileobj' and return the number of data rows written.
+
+    'sheets' holds (sheet_name, rows) pairs where 'rows' is an iterable of
+    (product_code, quantity, price_unit, order_ref); both may be generators since
+    every row is read only once. Product codes are always written as text so codes
+    like '00123' do not turn into numbers.
+    """
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True})
+    bold = workbook.add_format({'bold': True})
+    used_names = set()
+    row_count = 0
+    try:
+        for name, rows in sheets:
+            sheet = workbook.add_worksheet(_sheet_name(name, used_names))
+            sheet.write_row(0, 0, header, bold)
+            sheet.set_column(0, 0, 20)
+            sheet.set_column(1, 2, 14)
+            sheet.set_column(ORDER_REF_COLUMN, ORDER_REF_COLUMN, 16)
+            for row_idx, (product_code, quantity, price_unit, order_ref) in enumerate(rows, start=1):
+                sheet.write_string(row_idx, 0, product_code)
+                sheet.write_number(row_idx, 1, quantity)
+                sheet.write_number(row_idx, 2, price_unit)
+                sheet.write_string(row_idx, ORDER_REF_COLUMN, order_ref or '')
+                row_count += 1
+        if not used_names:
+            # Excel cannot open a workbook without sheets: write an empty template.
+            workbook.add_worksheet().write_row(0, 0, header, bold)
+    finally:
+        workbook.close()
+    return row_count
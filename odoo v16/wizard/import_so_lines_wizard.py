@@ -1,35 +1,550 @@
 # -*- coding: utf-8 -*-
 
 import base64
-import xlrd
+import collections
+import csv
+import hashlib
+import io
+import logging
+import operator
+import os
+
+from markupsafe import Markup
 
 from odoo import models, fields, api
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import float_compare, float_round, split_every
+
+from ..tools import parsed_rows_cache, phase_timer, so_lines_reader
+
+_logger = logging.getLogger(__name__)
+
+# Number of rows processed (product lookup + SO line creation) per batch.
+IMPORT_CHUNK_SIZE = 1000
+# Number of SO lines read with one read() when exporting.
+EXPORT_CHUNK_SIZE = 5000
 
 class ImportSoLinesWizard(models.TransientModel):
     """
-    This transient model (wizard) is used to import Sales Order lines from an Excel file.
+    This transient model (wizard) is used to import Sales Order lines from an Excel or CSV file.
     """
     _name = 'ancom_sales_orders.import.so.lines.wizard'
     _description = 'Import SO Lines Wizard'
 
+    # Stored as an attachment (filestore) instead of in the wizard table: the import
+    # reads the file straight from the filestore, without base64 decoding it in memory.
     file_upload = fields.Binary(
         string='Upload File',
         required=True,
-        help="Upload the Excel file with SO lines to import."
+        attachment=True,
+        help="Upload the Excel (.xls, .xlsx) or CSV (.csv, .tsv) file with SO lines to import."
     )
     file_name = fields.Char(
         string='File Name',
         help="Name of the uploaded file."
     )
+    import_in_background = fields.Boolean(
+        string='Import in Background',
+        help="Store the file as an import job processed chunk by chunk by a scheduled action. "
+             "Recommended for large files."
+    )
+    multi_order = fields.Boolean(
+        string='Multiple Orders',
+        help="Every row names its Sales Order: the 4th column holds the SO number or, when it is "
+             "empty, the sheet name is used as SO number. All sheets of the workbook are read."
+    )
+    import_mode = fields.Selection(
+        [
+            ('append', 'Add New Lines'),
+            ('upsert', 'Merge into Existing Lines'),
+        ],
+        string='Import Mode',
+        default='append',
+        required=True,
+        help="Merge: rows of the file with the same product are summed up, then the existing SO line "
+             "of that product gets its quantity and price updated instead of a new line being added."
+    )
+    upsert_match_price = fields.Boolean(
+        string='Match Price',
+        help="The same product at different prices stays on separate lines. When unchecked, "
+             "the price of the existing line is replaced by the price of the file."
+    )
+    remove_missing_lines = fields.Boolean(
+        string='Remove Lines Missing from File',
+        help="Product lines of the order that are not in the file are removed."
+    )
+    previous_job_id = fields.Many2one(
+        'ancom_sales_orders.so.line.import.job',
+        string='Previous Import',
+        readonly=True,
+        help="Previous import of the same file (identical content hash) into this Sales Order."
+    )
+
+    dry_run_summary = fields.Text(
+        string='Validation Result',
+        readonly=True
+    )
+    error_report = fields.Binary(
+        string='Error Report',
+        readonly=True,
+        attachment=False
+    )
+    error_report_name = fields.Char(
+        string='Error Report Name',
+        readonly=True
+    )
+
+    @api.onchange('file_upload')
+    def _onchange_file_upload(self):
+        # A new file has not been checked against previous imports nor validated yet.
+        self.previous_job_id = False
+        self.dry_run_summary = False
+        self.error_report = False
+
+    @api.model
+    def _get_products_by_code(self, codes):
+        """
+        Resolve a set of product codes ('default_code') with a single query.
+        Returns a dict {code: product.product}; the UoM and name of the products
+        are loaded for the whole recordset at once through the ORM prefetch.
+        """
+        if not codes:
+            return {}
+        products = self.env['product.product'].search([('default_code', 'in', list(codes))])
+        index = {}
+        for product in products:
+            # Like search(limit=1): if a code is duplicated, keep the first match.
+            index.setdefault(product.default_code, product)
+        return index
+
+    @api.model
+    def _update_product_index(self, index, codes):
+        """
+        Complete the {code: product} index with the codes that were not looked up yet.
+        Codes that are not found are stored as False so they are not searched again.
+        """
+        missing_codes = set(codes) - index.keys()
+        if missing_codes:
+            index.update(dict.fromkeys(missing_codes, False))
+            index.update(self._get_products_by_code(missing_codes))
+        return index
+
+    @api.model
+    def _update_order_index(self, index, refs):
+        """
+        Complete the {SO number: sale.order} index with the SO numbers that were not
+        looked up yet, with a single query. Numbers that are not found are stored as an
+        empty recordset so they are not searched again.
+        """
+        missing_refs = set(refs) - index.keys()
+        if missing_refs:
+            index.update(dict.fromkeys(missing_refs, self.env['sale.order']))
+            orders = self.env['sale.order'].search([('name', 'in', list(missing_refs))])
+            index.update({order.name: order for order in orders})
+        return index
+
+    @api.model
+    def _get_order_error(self, ref, order):
+        """Error message when lines cannot be imported into the SO 'ref', otherwise None."""
+        if not order:
+            return f"Sales Order '{ref}' not found."
+        if order.state not in ('draft', 'sent'):
+            return f"Sales Order '{ref}' is not a quotation; lines can only be imported into quotations."
+        return None
+
+    @api.model
+    def _row_label(self, row):
+        """Position of a row in error messages: its number, or 'Sheet!number' in multi-order imports."""
+        return row.row_number if row.sheet is None else '%s!%s' % (row.sheet, row.row_number)
+
+    @api.model
+    def _decode_file(self, data):
+        """
+        Decode the value of a Binary field into a temporary file and compute the SHA-1
+        hash of its content (same as ir.attachment.checksum). Returns (file, checksum).
+        """
+        hasher = hashlib.sha1()
+        source = so_lines_reader.b64decode_to_file(data, hasher)
+        return source, hasher.hexdigest()
+
+    @api.model
+    def _get_upload_attachment(self, record, field_name):
+        """The attachment holding the content of the Binary field (attachment=True) 'field_name' of 'record'."""
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', record._name),
+            ('res_id', '=', record.id),
+            ('res_field', '=', field_name),
+        ], limit=1)
+
+    @api.model
+    def _open_upload(self, record, field_name):
+        """
+        Open the content of the Binary field 'field_name' of 'record' as a binary file and
+        return (file, checksum). A file in the filestore is opened straight from disk and
+        its SHA-1 hash is already stored on the attachment (ir.attachment.checksum), so
+        there is no base64 decoding and no copy of the content in memory.
+        """
+        attachment = self._get_upload_attachment(record, field_name)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb'), attachment.checksum
+        if attachment:
+            # Attachment stored in the database (ir_attachment.location = db).
+            return io.BytesIO(attachment.raw), attachment.checksum
+        return self._decode_file(record[field_name])
+
+    def _link_upload(self, records, field_name):
+        """
+        Attach the file uploaded in this wizard to the Binary field 'field_name' of
+        'records' (e.g. import jobs) without copying its content: the new attachments
+        point to the same filestore file, like Odoo's deduplicated identical attachments.
+        """
+        attachment = self._get_upload_attachment(self, 'file_upload')
+        if not attachment:
+            records.write({field_name: self.file_upload})
+            return
+        if attachment.store_fname:
+            content_vals = {
+                'store_fname': attachment.store_fname,
+                'file_size': attachment.file_size,
+                'checksum': attachment.checksum,
+                'mimetype': attachment.mimetype,
+            }
+        else:
+            content_vals = {'raw': attachment.raw}
+        self.env['ir.attachment'].sudo().create([dict(
+            content_vals,
+            name=field_name,
+            res_model=records._name,
+            res_id=record.id,
+            res_field=field_name,
+        ) for record in records])
+
+    @api.model
+    def _iter_normalized_rows(self, source, file_name, checksum, multi_order=False):
+        """
+        Normalised ImportRow rows of the file: taken from the cache when a file with the
+        same hash was already parsed in this process, otherwise read from the file and cached.
+        Multi-order imports read every sheet and every row carries its SO number.
+        """
+        # The extension is part of the key because it decides the format of text files (csv or tsv).
+        key = (checksum, os.path.splitext(file_name or '')[1].lower(), multi_order)
+        rows = parsed_rows_cache.parsed_rows.get(key)
+        if rows is not None:
+            return iter(rows)
+        # The file size is checked before any row is collected: large files are not cached.
+        file_size = source.seek(0, io.SEEK_END)
+        source.seek(0)
+        if multi_order:
+            rows = so_lines_reader.normalize_order_rows(so_lines_reader.iter_workbook_rows(source, file_name))
+        else:
+            rows = so_lines_reader.normalize_rows(so_lines_reader.iter_rows(source, file_name))
+        return parsed_rows_cache.parsed_rows.collect(key, rows, file_size)
+
+    @api.model
+    def _validate_rows(self, rows, multi_order=False):
+        """
+        Validate every normalised row without writing anything. All product codes (and
+        the SO numbers of a multi-order import) are checked with a single query each at
+        the end. Returns (row_count, errors) where errors is a list of (row, product_code,
+        message) in the order of the rows in the file.
+        """
+        row_count = 0
+        errors = []  # (position, row, product_code, message)
+        rows_by_code = collections.defaultdict(list)
+        rows_by_order = collections.defaultdict(list)
+        for position, row in enumerate(rows):
+            row_count += 1
+            label = self._row_label(row)
+            if row.error == so_lines_reader.ERROR_MISSING_CODE:
+                errors.append((position, label, row.product_code, "Missing 'Product Code'."))
+            elif row.error == so_lines_reader.ERROR_MISSING_ORDER:
+                errors.append((position, label, row.product_code, "Missing Sales Order number."))
+            elif row.error:
+                errors.append((position, label, row.product_code, "Invalid or missing 'Qty' / 'Unit Price'."))
+            else:
+                rows_by_code[row.product_code].append((position, label))
+                if multi_order:
+                    rows_by_order[row.order_ref].append((position, label, row.product_code))
+        products = self._get_products_by_code(rows_by_code)
+        for code in rows_by_code.keys() - products.keys():
+            message = f"Product with code '{code}' not found."
+            errors.extend((position, label, code, message) for position, label in rows_by_code[code])
+        for ref, order in self._update_order_index({}, rows_by_order).items():
+            message = self._get_order_error(ref, order)
+            if message:
+                errors.extend((position, label, code, message) for position, label, code in rows_by_order[ref])
+        errors.sort(key=operator.itemgetter(0))
+        return row_count, [error[1:] for error in errors]
+
+    @api.model
+    def _build_error_report(self, errors):
+        """Return the error report as a base64 CSV file that opens directly in Excel."""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['Row', 'Product Code', 'Error'])
+        writer.writerows(errors)
+        return base64.b64encode(output.getvalue().encode('utf-8-sig'))
+
+    @api.model
+    def _iter_export_rows(self, sale_order):
+        """
+        Yield the export rows (product_code, quantity, price_unit, order_ref) of one Sales
+        Order, laid out like import files so the file can be imported again.
+        Lines are read EXPORT_CHUNK_SIZE at a time with read() (one query per batch instead
+        of per-record field access) and the cache of a batch is released once written, so
+        memory stays bounded whatever the size of the order. Section/note lines and lines
+        whose product has no Internal Reference are skipped as they cannot be imported back.
+        """
+        line_ids = self.env['sale.order.line'].search(
+            [('order_id', '=', sale_order.id), ('display_type', '=', False)], order='sequence, id').ids
+        codes = {}
+        skipped = 0
+        for chunk_ids in split_every(EXPORT_CHUNK_SIZE, line_ids):
+            lines = self.env['sale.order.line'].browse(chunk_ids)
+            records = lines.read(['product_id', 'product_uom_qty', 'price_unit'], load=None)
+            # Product codes are read once per product for the whole export.
+            missing = {record['product_id'] for record in records if record['product_id']} - codes.keys()
+            if missing:
+                products = self.env['product.product'].browse(missing)
+                codes.update((product['id'], product['default_code']) for product in products.read(['default_code']))
+            for record in records:
+                product_code = codes.get(record['product_id'])
+                if not product_code:
+                    skipped += 1
+                    continue
+                yield product_code, record['product_uom_qty'], record['price_unit'], sale_order.name
+            lines.invalidate_recordset()
+        if skipped:
+            _logger.warning("Export of %s: %s lines without product code skipped", sale_order.name, skipped)
+
+    def _reopen(self):
+        """Open this wizard again, e.g. to show a warning or the validation result."""
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+            'context': self.env.context,
+        }
+
+    @api.model
+    def _create_order_lines(self, sale_order, rows, products, line_defaults=None):
+        """
+        Validate a batch of normalised rows (so_lines_reader.ImportRow) and create
+        their Sales Order Lines with a single batched create() call.
+        """
+        self._update_product_index(products, {row.product_code for row in rows if not row.error})
+        line_defaults = {} if line_defaults is None else line_defaults
+
+        so_lines_vals = []
+        for row in rows:
+            # --- Data Validation ---
+            if row.error == so_lines_reader.ERROR_MISSING_CODE:
+                raise ValidationError(f"Missing 'Product Code' in row {row.row_number}.")
+            if row.error:
+                raise ValidationError(f"Invalid or missing 'Qty' / 'Unit Price' in row {row.row_number}.")
+
+            # Find the product by its 'default_code' (Internal Reference).
+            product = products[row.product_code]
+            if not product:
+                raise ValidationError(f"Product with code '{row.product_code}' not found (row {row.row_number}).")
+
+            so_lines_vals.append(self._prepare_order_line_vals(sale_order, row, product, line_defaults))
+
+        return self._get_bulk_line_model().create(so_lines_vals)
+
+    @api.model
+    def _create_multi_order_lines(self, rows, orders, products, line_defaults=None):
+        """
+        Validate a batch of normalised rows that each name their Sales Order, and create
+        the lines of all these orders with a single batched create() call. Orders and
+        products come from the indexes (completed with one query each); the state of an
+        order is checked once, not for every row. The lines are grouped by order while
+        keeping the order of the rows in the file.
+        """
+        self._update_order_index(orders, {row.order_ref for row in rows if not row.error})
+        self._update_product_index(products, {row.product_code for row in rows if not row.error})
+        line_defaults = {} if line_defaults is None else line_defaults
+
+        checked_orders = set()
+        so_lines_vals = []
+        for row in rows:
+            # --- Data Validation ---
+            label = self._row_label(row)
+            if row.error == so_lines_reader.ERROR_MISSING_CODE:
+                raise ValidationError(f"Missing 'Product Code' in row {label}.")
+            if row.error == so_lines_reader.ERROR_MISSING_ORDER:
+                raise ValidationError(f"Missing Sales Order number in row {label}.")
+            if row.error:
+                raise ValidationError(f"Invalid or missing 'Qty' / 'Unit Price' in row {label}.")
+
+            order = orders[row.order_ref]
+            if row.order_ref not in checked_orders:
+                message = self._get_order_error(row.order_ref, order)
+                if message:
+                    raise ValidationError(f"{message} (row {label})")
+                checked_orders.add(row.order_ref)
+
+            product = products[row.product_code]
+            if not product:
+                raise ValidationError(f"Product with code '{row.product_code}' not found (row {label}).")
+
+            so_lines_vals.append(self._prepare_order_line_vals(order, row, product, line_defaults))
+
+        so_lines_vals.sort(key=operator.itemgetter('order_id'))
+        return self._get_bulk_line_model().create(so_lines_vals)
+
+    @api.model
+    def _check_rows(self, rows):
+        """Yield the normalised rows, raising a ValidationError on the first invalid row."""
+        for row in rows:
+            label = self._row_label(row)
+            if row.error == so_lines_reader.ERROR_MISSING_CODE:
+                raise ValidationError(f"Missing 'Product Code' in row {label}.")
+            if row.error == so_lines_reader.ERROR_MISSING_ORDER:
+                raise ValidationError(f"Missing Sales Order number in row {label}.")
+            if row.error:
+                raise ValidationError(f"Invalid or missing 'Qty' / 'Unit Price' in row {label}.")
+            yield row
+
+    @api.model
+    def _aggregate_rows(self, rows, match_price=False):
+        """
+        Merge the normalised rows for the merge (upsert) mode: rows with the same SO number
+        and product code (and the same price when 'match_price') become a single row, with
+        the quantities summed up and the price of the last row. The order and row numbers
+        follow the first occurrence in the file.
+        """
+        aggregated = {}
+        for row in rows:
+            key = (row.order_ref, row.product_code, row.price_unit if match_price else None)
+            first = aggregated.get(key)
+            if first:
+                row = first._replace(quantity=first.quantity + row.quantity, price_unit=row.price_unit)
+            aggregated[key] = row
+        return list(aggregated.values())
+
+    @api.model
+    def _upsert_order_lines(self, sale_orders, order_rows, products, line_defaults=None,
+                            match_price=False, remove_missing=False):
+        """
+        Merge mode: merge 'order_rows', (order, row) pairs coming from _aggregate_rows, into
+        the existing lines of 'sale_orders' instead of always appending new lines.
+
+        The existing SO lines are read once (one search_read) into an index by order, product
+        and UoM (and price when 'match_price'). Matching lines get their quantity and price
+        updated, only when they changed, with one write() of One2many commands per order;
+        rows without a match are created with a single batched create(). When 'remove_missing',
+        the product lines that are not in the file (including duplicate lines of an order)
+        are removed in the same write().
+        Returns (new_lines, updated_lines, removed_count).
+        """
+        self._update_product_index(products, {row.product_code for order, row in order_rows})
+        line_defaults = {} if line_defaults is None else line_defaults
+        precision = {
+            'product_uom_qty': self.env['decimal.precision'].precision_get('Product Unit of Measure'),
+            'price_unit': self.env['decimal.precision'].precision_get('Product Price'),
+        }
+
+        def price_key(price_unit):
+            return float_round(price_unit, precision_digits=precision['price_unit']) if match_price else None
+
+        existing_lines = collections.defaultdict(list)
+        for line in self.env['sale.order.line'].search_read(
+                [('order_id', 'in', sale_orders.ids), ('display_type', '=', False)],
+                ['order_id', 'product_id', 'product_uom', 'product_uom_qty', 'price_unit'],
+                order='sequence, id', load=None):
+            key = (line['order_id'], line['product_id'], line['product_uom'], price_key(line['price_unit']))
+            existing_lines[key].append(line)
+
+        commands = collections.defaultdict(list)
+        updated_ids = []
+        so_lines_vals = []
+        for order, row in order_rows:
+            product = products[row.product_code]
+            if not product:
+                raise ValidationError(f"Product with code '{row.product_code}' not found (row {self._row_label(row)}).")
+            vals = self._prepare_order_line_vals(order, row, product, line_defaults)
+            matches = existing_lines.get((order.id, product.id, vals['product_uom'], price_key(row.price_unit)))
+            if not matches:
+                so_lines_vals.append(vals)
+                continue
+            line = matches.pop(0)
+            if any(float_compare(line[field], vals[field], precision_digits=digits)
+                   for field, digits in precision.items()):
+                commands[order.id].append((1, line['id'], {field: vals[field] for field in precision}))
+                updated_ids.append(line['id'])
+
+        removed = 0
+        if remove_missing and order_rows:
+            for lines in existing_lines.values():
+                for line in lines:
+                    commands[line['order_id']].append((2, line['id']))
+                    removed += 1
+        bulk_orders = self._get_bulk_line_model().env['sale.order']
+        for order_id, order_commands in commands.items():
+            bulk_orders.browse(order_id).write({'order_line': order_commands})
+        so_lines_vals.sort(key=operator.itemgetter('order_id'))
+        new_lines = self._get_bulk_line_model().create(so_lines_vals)
+        return new_lines, self.env['sale.order.line'].browse(updated_ids), removed
+
+    @api.model
+    def _get_bulk_line_model(self):
+        """
+        The sale.order.line model used for bulk inserts: tracking is disabled so the
+        changes of the order totals are not recorded (and computed) as tracking values.
+        """
+        return self.env['sale.order.line'].with_context(tracking_disable=True)
+
+    @api.model
+    def _flush_bulk_lines(self):
+        """
+        Run every pending compute (subtotals, taxes, order totals) once for all the
+        inserted lines, with tracking disabled.
+        """
+        self._get_bulk_line_model().env.flush_all()
+
+    @api.model
+    def _get_line_defaults(self, sale_order, product, line_defaults):
+        """
+        The default SO line values of 'product' in 'sale_order': UoM, description (in the
+        customer's language) and taxes mapped by the order's fiscal position. They are
+        computed once per order and product and kept in 'line_defaults', so the ORM does
+        not compute them again for every line on create().
+        """
+        key = (sale_order.id, product.id)
+        if key not in line_defaults:
+            taxes = product.taxes_id.filtered(lambda tax: tax.company_id == sale_order.company_id)
+            line_defaults[key] = {
+                'product_uom': product.uom_id.id,
+                'name': product.with_context(lang=sale_order.partner_id.lang).get_product_multiline_description_sale(),
+                'tax_id': [(6, 0, sale_order.fiscal_position_id.map_tax(taxes).ids)],
+            }
+        return line_defaults[key]
+
+    @api.model
+    def _prepare_order_line_vals(self, sale_order, row, product, line_defaults):
+        return {
+            **self._get_line_defaults(sale_order, product, line_defaults),
+            'order_id': sale_order.id,
+            'product_id': product.id,
+            'product_uom_qty': row.quantity,
+            'price_unit': row.price_unit,
+        }
 
     def action_import_lines(self):
         """
-        This is the main action of the wizard. It reads the uploaded Excel file,
+        This is the main action of the wizard. It reads the uploaded Excel or CSV file,
         validates the data, and creates new Sales Order Lines.
         """
         self.ensure_one()
 
+        if self.multi_order:
+            return self._import_multi_order()
+        if self.import_in_background and self.import_mode == 'upsert':
+            raise UserError("Merge imports cannot run in the background.")
+
         # Get the active Sales Order record from the context.
         active_so_id = self.env.context.get('active_id')
         if not active_so_id:
@@ -41,45 +556,230 @@ class ImportSoLinesWizard(models.TransientModel):
         if sale_order.state not in ['draft', 'sent']:
             raise UserError("You can only import lines to a Sales Order that is in 'Quotation' or 'Quotation Sent' state.")
 
-        # Decode the file content from base64.
-        try:
-            file_data = base64.b64decode(self.file_upload)
-            workbook = xlrd.open_workbook(file_contents=file_data)
-            sheet = workbook.sheet_by_index(0)
-        except Exception as e:
-            raise UserError(f"Error reading the Excel file. Please make sure it is a valid .xls or .xlsx file.\n\nError: {e}")
+        # Decode the base64 file content into a temporary file, then stream its rows
+        # and process them in batches so memory stays bounded whatever the file size.
+        # Every phase is measured (time, SQL queries, rows) by a PhaseTimer.
+        profile = self.env.context.get(phase_timer.PROFILE_CONTEXT_KEY)
+        job_model = self.env['ancom_sales_orders.so.line.import.job']
+        with phase_timer.PhaseTimer('so_line_import', self.env.cr, profile=profile) as timer:
+            with timer.phase('decode'):
+                source, checksum = self._open_upload(self, 'file_upload')
+            try:
+                # The same file (identical hash) was already imported into this SO: ask for
+                # confirmation instead of appending the same lines a second time.
+                # Merge imports can safely run again.
+                previous_job = job_model._find_import(sale_order, checksum)
+                if previous_job and self.import_mode == 'append' and not self.env.context.get('force_reimport'):
+                    self.previous_job_id = previous_job
+                    return self._reopen()
 
-        so_lines_vals = []
-        # Loop through rows, starting from the second row to skip the header.
-        for row_idx in range(1, sheet.nrows):
-            row = sheet.row_values(row_idx)
-            
-            # Extract data from the row.
-            product_code = row[0]
-            quantity = row[1]
-            unit_price = row[2]
+                # Hand large files over to a background job processed by the scheduler.
+                if self.import_in_background:
+                    job = job_model.create({
+                        'sale_order_id': sale_order.id,
+                        'file_name': self.file_name,
+                        'checksum': checksum,
+                    })
+                    self._link_upload(job, 'file_upload')
+                    job._trigger_cron()
+                    return {'type': 'ir.actions.act_window_close'}
 
-            # --- Data Validation ---
-            if not product_code:
-                raise ValidationError(f"Missing 'Product Code' in row {row_idx + 1}.")
-            
-            # Find the product by its 'default_code' (Internal Reference).
-            product = self.env['product.product'].search([('default_code', '=', str(product_code))], limit=1)
-            if not product:
-                raise ValidationError(f"Product with code '{product_code}' not found (row {row_idx + 1}).")
-
-            # --- Prepare SO Line Values ---
-            line_vals = {
-                'order_id': sale_order.id,
-                'product_id': product.id,
-                'product_uom_qty': float(quantity),
-                'price_unit': float(unit_price),
-            }
-            so_lines_vals.append((0, 0, line_vals))
+                rows = self._iter_normalized_rows(source, self.file_name, checksum)
+                products, line_defaults = {}, {}
+                if self.import_mode == 'upsert':
+                    upsert_result = self._import_upsert(rows, {None: sale_order}, timer)
+                else:
+                    for chunk in timer.iterate('parse', split_every(IMPORT_CHUNK_SIZE, rows)):
+                        with timer.phase('product_lookup'):
+                            self._update_product_index(products, {row.product_code for row in chunk if not row.error})
+                        with timer.phase('create_lines') as stats:
+                            stats['rows'] += len(self._create_order_lines(sale_order, chunk, products, line_defaults))
+            except so_lines_reader.ImportFileError as e:
+                raise UserError(f"Error reading the file. Please make sure it is a valid .xls, .xlsx, .csv or .tsv file.\n\nError: {e}")
+            finally:
+                source.close()
+            # Deferred computes (subtotals, taxes, SO totals, ...) run once, on flush.
+            with timer.phase('recompute'):
+                self._flush_bulk_lines()
 
-        # Create the SO lines by updating the 'order_line' field.
-        if so_lines_vals:
-            sale_order.write({'order_line': so_lines_vals})
+        # Record this import (with the hash of its file) in the import job history as a finished job.
+        rows_imported = sum(timer.phases[name]['rows'] for name in ('create_lines', 'upsert_lines') if name in timer.phases)
+        job = job_model.create({
+            'sale_order_id': sale_order.id,
+            'file_name': self.file_name,
+            'checksum': checksum,
+            'state': 'done',
+            'rows_imported': rows_imported,
+        })
+        self._link_upload(job, 'file_upload')
+        summary = None
+        if self.import_mode == 'upsert':
+            summary = self._get_upsert_summary(*upsert_result)
+        self._report_phases(sale_order, timer, rows_imported, summary)
 
         # Return an action to close the wizard.
         return {'type': 'ir.actions.act_window_close'}
+
+    def action_dry_run(self):
+        """
+        Validate the whole file without creating any line, then show a summary and a
+        complete error report (row numbers, unknown product codes, invalid qty/price),
+        so the real import only has to run once, on clean data.
+        The parsed rows are cached, so the following import does not parse the file again.
+        """
+        self.ensure_one()
+
+        source, checksum = self._open_upload(self, 'file_upload')
+        try:
+            rows = self._iter_normalized_rows(source, self.file_name, checksum, self.multi_order)
+            row_count, errors = self._validate_rows(rows, self.multi_order)
+        except so_lines_reader.ImportFileError as e:
+            raise UserError(f"Error reading the file. Please make sure it is a valid .xls, .xlsx, .csv or .tsv file.\n\nError: {e}")
+        finally:
+            source.close()
+
+        error_rows = len({error[0] for error in errors})
+        if errors:
+            summary = (f"{row_count} rows checked: {row_count - error_rows} valid, {error_rows} with errors. "
+                       "Download the error report for the details of every row.")
+        else:
+            summary = f"{row_count} rows checked: all rows are valid and ready to import."
+        self.write({
+            'dry_run_summary': summary,
+            'error_report': self._build_error_report(errors) if errors else False,
+            'error_report_name': '%s-errors.csv' % os.path.splitext(self.file_name or 'import')[0],
+        })
+        return self._reopen()
+
+    def action_download_template(self):
+        """
+        Triggered by the 'Download Template' button of the wizard.
+        Download an empty .xlsx file with the column titles expected by the import.
+        """
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/ancom_sales_orders/so_lines/template',
+            'target': 'self',
+        }
+
+    def _import_multi_order(self):
+        """
+        Multi-order import: one workbook holding lines for many Sales Orders.
+        The SO numbers and product codes of every batch are resolved with one query
+        each, and the lines of all orders in a batch are created with one create().
+        Like the single-order import, any invalid row cancels the whole import.
+        """
+        if self.import_in_background:
+            raise UserError("Multi-order imports cannot run in the background.")
+
+        profile = self.env.context.get(phase_timer.PROFILE_CONTEXT_KEY)
+        job_model = self.env['ancom_sales_orders.so.line.import.job']
+        orders, products, line_defaults = {}, {}, {}
+        rows_by_order = collections.Counter()
+        with phase_timer.PhaseTimer('so_line_import_multi', self.env.cr, profile=profile) as timer:
+            with timer.phase('decode'):
+                source, checksum = self._open_upload(self, 'file_upload')
+            try:
+                # The same file (identical hash) was already imported: ask for confirmation first.
+                # Merge imports can safely run again.
+                previous_job = job_model.search([('checksum', '=', checksum)], limit=1)
+                if previous_job and self.import_mode == 'append' and not self.env.context.get('force_reimport'):
+                    self.previous_job_id = previous_job
+                    return self._reopen()
+
+                rows = self._iter_normalized_rows(source, self.file_name, checksum, multi_order=True)
+                if self.import_mode == 'upsert':
+                    upsert_result = self._import_upsert(rows, orders, timer, rows_by_order)
+                else:
+                    for chunk in timer.iterate('parse', split_every(IMPORT_CHUNK_SIZE, rows)):
+                        with timer.phase('order_lookup'):
+                            self._update_order_index(orders, {row.order_ref for row in chunk if not row.error})
+                        with timer.phase('product_lookup'):
+                            self._update_product_index(products, {row.product_code for row in chunk if not row.error})
+                        with timer.phase('create_lines') as stats:
+                            lines = self._create_multi_order_lines(chunk, orders, products, line_defaults)
+                            rows_by_order.update(line.order_id.id for line in lines)
+                            stats['rows'] += len(lines)
+            except so_lines_reader.ImportFileError as e:
+                raise UserError(f"Error reading the file. Please make sure it is a valid .xls, .xlsx, .csv or .tsv file.\n\nError: {e}")
+            finally:
+                source.close()
+            # Deferred computes (subtotals, taxes, SO totals, ...) run once, on flush.
+            with timer.phase('recompute'):
+                self._flush_bulk_lines()
+
+        # Record the import in the import job history: one finished job per Sales Order.
+        imported_orders = self.env['sale.order'].browse(list(rows_by_order))
+        jobs = job_model.create([{
+            'sale_order_id': order.id,
+            'file_name': self.file_name,
+            'checksum': checksum,
+            'state': 'done',
+            'rows_imported': rows_by_order[order.id],
+        } for order in imported_orders])
+        self._link_upload(jobs, 'file_upload')
+        timer.log(_logger, sale_orders=len(imported_orders), file=self.file_name)
+        timer.save_profile(imported_orders[:1] or self)
+
+        message = "Imported %s lines into %s Sales Orders." % (sum(rows_by_order.values()), len(imported_orders))
+        if self.import_mode == 'upsert':
+            message += ' ' + self._get_upsert_summary(*upsert_result)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': "Import SO Lines",
+                'message': message,
+                'type': 'success',
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
+    def _import_upsert(self, rows, orders, timer, rows_by_order=None):
+        """
+        Merge-mode import of the normalised rows 'rows'. 'orders' is the {SO number: sale.order}
+        index; single-order imports pass {None: sale_order}. The whole file is read and merged
+        first, since duplicate rows of the file must be summed up before they are matched with
+        the order lines, then every change is written at once.
+        Like the other imports, any invalid row cancels the whole import.
+        The number of file rows imported per order id (not the number of SO lines created
+        or updated) is added to the Counter 'rows_by_order'.
+        Returns the result of _upsert_order_lines.
+        """
+        rows_by_order = collections.Counter() if rows_by_order is None else rows_by_order
+        with timer.phase('parse') as stats:
+            file_rows = list(self._check_rows(rows))
+            rows = self._aggregate_rows(file_rows, self.upsert_match_price)
+            stats['rows'] += len(file_rows)
+        with timer.phase('order_lookup'):
+            self._update_order_index(orders, {row.order_ref for row in rows})
+        checked_orders = set()
+        for row in rows:
+            if row.order_ref not in checked_orders:
+                message = self._get_order_error(row.order_ref, orders[row.order_ref])
+                if message:
+                    raise ValidationError(f"{message} (row {self._row_label(row)})")
+                checked_orders.add(row.order_ref)
+        sale_orders = self.env['sale.order'].union(*(orders[ref] for ref in checked_orders))
+        with timer.phase('upsert_lines') as stats:
+            result = self._upsert_order_lines(sale_orders, [(orders[row.order_ref], row) for row in rows], {}, {},
+                                              self.upsert_match_price, self.remove_missing_lines)
+            rows_by_order.update(orders[row.order_ref].id for row in file_rows)
+            stats['rows'] += len(file_rows)
+        return result
+
+    def _get_upsert_summary(self, new_lines, updated_lines, removed):
+        """Summary of a merge import for the notification and the chatter."""
+        return "%s new lines, %s lines updated, %s lines removed." % (len(new_lines), len(updated_lines), removed)
+
+    def _report_phases(self, sale_order, timer, rows_imported, summary=None):
+        """
+        Log the phase measurements of the import, post their summary in the chatter
+        of the Sales Order and attach the cProfile dump when profiling is enabled.
+        """
+        timer.log(_logger, sale_order=sale_order.id, file=self.file_name)
+        timer.save_profile(sale_order)
+        message = "Imported %s lines from %s." % (rows_imported, self.file_name)
+        if summary:
+            message = '%s %s' % (message, summary)
+        sale_order.message_post(body=Markup('<br/>').join([message] + timer.summary()))
@@ -1,2 +1,8 @@
 from . import models
-from . import wizard
\ No newline at end of file
+from . import wizard
+from . import controllers
+
+
+def uninstall_hook(env):
+    """Menghapus materialized view laporan cakupan SO/PO; tabel ini tidak dikelola oleh ORM."""
+    env.cr.execute("DROP MATERIALIZED VIEW IF EXISTS %s" % env['so.po.coverage.report']._table)
@@ -2,7 +2,7 @@
 # Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
 {
     'name': "Integrasi Penjualan & Pembelian (Anjas Amar Pradana)",
-    'version': '17.0',
+    'version': '17.0.17.2',
     'summary': """
         Modul Tes Teknis untuk PT. SAS Kreasindo Utama.
         Dibuat oleh Anjas Amar Pradana.
@@ -14,9 +14,15 @@
     'category': 'Sales/Purchase',
     'depends': ['sale_management', 'purchase'],
     'data': [
+        'security/ir.model.access.csv',
+        'security/security.xml',
+        'data/ir_cron_data.xml',
         'wizard/import_so_lines_wizard_view.xml',
         'views/sale_order_view.xml',
+        'views/so_line_import_job_views.xml',
+        'views/so_po_coverage_report_views.xml',
     ],
+    'uninstall_hook': 'uninstall_hook',
     'installable': True,
     'application': True,
     'license': 'LGPL-3',
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+import json
+import logging
+import tempfile
+import threading
+
+from werkzeug.exceptions import NotFound
+from werkzeug.wsgi import wrap_file
+
+from odoo import http
+from odoo.http import content_disposition, request
+from odoo.tools import split_every
+
+from ..tools import phase_timer, so_lines_reader, so_lines_writer
+from ..wizard.import_so_lines_wizard import IMPORT_CHUNK_SIZE
+
+_logger = logging.getLogger(__name__)
+
+# Batas atas ukuran batch yang dapat diminta lewat parameter 'chunk_size'.
+MAX_CHUNK_SIZE = 10000
+
+# Content-Type body yang diterima endpoint ingest beserta format pembacanya. Tipe ini dan
+# header wajib INGEST_REQUIRED_HEADER tidak dapat dikirim oleh form atau halaman dari situs
+# lain tanpa preflight CORS, sehingga endpoint tanpa token CSRF ini tidak dapat dipicu
+# lintas situs memakai cookie sesi pengguna.
+INGEST_CONTENT_TYPES = {
+    'application/x-ndjson': 'ndjson',
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+}
+INGEST_REQUIRED_HEADER = 'X-Requested-With'
+
+
+class SOLineIngestController(http.Controller):
+    """
+    Endpoint HTTP untuk integrasi yang mengirim Baris Pesanan Penjualan dalam jumlah besar,
+    tanpa membuat file Excel, tanpa base64, dan tanpa record wizard.
+
+    Body request berisi record {order, default_code, qty, price}, sebagai NDJSON (satu objek
+    JSON per baris, Content-Type application/x-ndjson) atau CSV dengan header (text/csv).
+    Body dibaca secara streaming dan diproses per batch dengan jalur yang sama seperti wizard
+    impor banyak pesanan: nomor SO dan kode produk dicari sekali per batch, lalu baris dibuat
+    dengan satu create(). Setiap batch di-commit, dan respons NDJSON berisi satu konfirmasi
+    per batch yang sudah tersimpan, diikuti satu baris ringkasan.
+
+    Karena endpoint ini tidak memakai token CSRF, request wajib membawa header
+    X-Requested-With dan salah satu Content-Type di INGEST_CONTENT_TYPES; request lain
+    ditolak sebelum body dibaca.
+    """
+
+    @http.route('/custom_tio/so_lines/ingest', type='http', auth='user', methods=['POST'], csrf=False)
+    def ingest_so_lines(self, chunk_size=None, **kwargs):
+        if not request.httprequest.headers.get(INGEST_REQUIRED_HEADER):
+            return self._ndjson_response([{'error': "Header '%s' wajib diisi." % INGEST_REQUIRED_HEADER}], status=403)
+        data_format = INGEST_CONTENT_TYPES.get(request.httprequest.mimetype)
+        if not data_format:
+            return self._ndjson_response([{
+                'error': "Content-Type harus salah satu dari: %s." % ', '.join(INGEST_CONTENT_TYPES),
+            }], status=415)
+        try:
+            chunk_size = min(max(int(chunk_size or IMPORT_CHUNK_SIZE), 1), MAX_CHUNK_SIZE)
+        except ValueError:
+            return self._ndjson_response([{'error': "Parameter 'chunk_size' harus berupa angka."}], status=400)
+
+        wizard = request.env['import.so.lines.wizard']
+        # Jangan commit saat dijalankan dari test.
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        acks = []
+        orders, products, line_defaults = {}, {}, {}
+        status = 200
+        with phase_timer.PhaseTimer('so_line_ingest', request.env.cr) as timer:
+            rows = so_lines_reader.normalize_order_rows(
+                so_lines_reader.iter_record_rows(request.httprequest.stream, data_format))
+            try:
+                chunks = timer.iterate('parse', split_every(chunk_size, rows))
+                for index, chunk in enumerate(chunks, start=1):
+                    errors = []
+                    parsed_rows = list(wizard._parse_rows(chunk, errors))
+                    with timer.phase('create_lines') as stats:
+                        lines = wizard._create_multi_order_lines(parsed_rows, orders, products, errors, line_defaults)
+                        stats['rows'] += len(lines)
+                    with timer.phase('recompute'):
+                        wizard._flush_bulk_lines()
+                    with timer.phase('commit'):
+                        if auto_commit:
+                            request.env.cr.commit()
+                    acks.append({
+                        'chunk': index,
+                        'rows': len(chunk),
+                        'imported': len(lines),
+                        'errors': [{'row': row, 'message': message} for row, message in errors],
+                    })
+            except so_lines_reader.ImportFileError as e:
+                # Batch yang sudah dikonfirmasi tetap tersimpan; sisa body tidak diproses.
+                status = 400
+                acks.append({'error': str(e)})
+        timer.log(_logger, uid=request.env.uid, chunks=len(acks))
+
+        acks.append({
+            'done': status == 200,
+            'imported': sum(ack.get('imported', 0) for ack in acks),
+            'skipped': sum(len(ack.get('errors', ())) for ack in acks),
+        })
+        return self._ndjson_response(acks, status=status)
+
+    def _ndjson_response(self, records, status=200):
+        body = ''.join(json.dumps(record) + '\n' for record in records)
+        return request.make_response(body, headers=[('Content-Type', 'application/x-ndjson')], status=status)
+
+
+class SOLineExportController(http.Controller):
+    """
+    Unduhan template impor dan ekspor Baris Pesanan Penjualan dalam tata letak file impor.
+
+    Workbook ditulis ke file sementara di disk (xlsxwriter mode constant_memory) dan
+    dikirim ke browser langsung dari file tersebut, sehingga pesanan dengan puluhan ribu
+    baris diekspor tanpa menahan isi file di memori worker.
+    """
+
+    @http.route('/custom_tio/so_lines/template', type='http', auth='user')
+    def download_template(self, **kwargs):
+        return self._xlsx_response([], 'template_impor_baris_so.xlsx')
+
+    @http.route('/custom_tio/so_lines/export', type='http', auth='user')
+    def export_so_lines(self, order_ids='', **kwargs):
+        try:
+            ids = [int(order_id) for order_id in order_ids.split(',') if order_id]
+        except ValueError:
+            raise NotFound()
+        sale_orders = request.env['sale.order'].browse(ids).exists()
+        if not sale_orders:
+            raise NotFound()
+        wizard = request.env['import.so.lines.wizard']
+        sheets = ((order.name, wizard._iter_export_rows(order)) for order in sale_orders)
+        file_name = '%s.xlsx' % (sale_orders.name if len(sale_orders) == 1 else 'baris_so')
+        return self._xlsx_response(sheets, file_name)
+
+    def _xlsx_response(self, sheets, file_name):
+        output = tempfile.TemporaryFile()
+        so_lines_writer.write_xlsx(output, sheets)
+        size = output.tell()
+        output.seek(0)
+        return request.make_response(wrap_file(request.httprequest.environ, output), headers=[
+            ('Content-Type', so_lines_writer.XLSX_MIMETYPE),
+            ('Content-Disposition', content_disposition(file_name)),
+            ('Content-Length', size),
+        ])
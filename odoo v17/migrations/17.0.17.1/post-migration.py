@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    Mengisi relasi 'x_sale_order_id' untuk Purchase Order lama yang belum tertaut
+    tetapi field 'origin'-nya sama dengan nomor sebuah Sales Order.
+    """
+    cr.execute("""
+        UPDATE purchase_order po
+           SET x_sale_order_id = so.id
+          FROM sale_order so
+         WHERE po.x_sale_order_id IS NULL
+           AND po.origin = so.name
+    """)
+    _logger.info("Linked %s existing purchase orders to their sales order", cr.rowcount)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    Menandai baris PO lama yang dibuat oleh sinkronisasi SO -> PO ('x_from_sale_line'), lalu
+    menautkan baris draft PO yang dibuat sebelum ada relasi per baris ke baris SO sumbernya.
+    Baris yang baris SO-nya sudah dihapus tidak dapat dikenali lagi dan dianggap baris manual.
+    """
+    cr.execute("""
+        UPDATE purchase_order_line
+           SET x_from_sale_line = TRUE
+         WHERE x_sale_line_id IS NOT NULL
+    """)
+    _logger.info("Flagged %s existing purchase order lines as synced from their sales order", cr.rowcount)
+
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    linked = env['purchase.order']._link_legacy_sale_lines()
+    _logger.info("Linked %s lines of existing draft purchase orders to their sales order lines", linked)
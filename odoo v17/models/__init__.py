@@ -1 +1,3 @@
 from . import sale_order
+from . import so_line_import_job
+from . import so_po_coverage_report
@@ -1,7 +1,19 @@
 # -*- coding: utf-8 -*-
 # Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+import logging
+from collections import Counter
+from datetime import timedelta
+
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
+from odoo.tools import float_compare
+
+from ..tools import phase_timer
+
+_logger = logging.getLogger(__name__)
+
+# Field baris PO yang dibandingkan dan ditulis ulang saat sinkronisasi SO -> PO.
+PO_LINE_SYNC_FIELDS = ('product_id', 'name', 'product_qty', 'product_uom', 'price_unit', 'x_expected_price_unit')
 
 class SaleOrder(models.Model):
     """
@@ -19,7 +31,7 @@ class SaleOrder(models.Model):
                                           help="Vendor yang akan digunakan untuk Pesanan Pembelian.")
 
     # Req 1.2: Field untuk Nomor Kontrak (Char)
-    x_no_kontrak = fields.Char(string='No Kontrak', copy=False,
+    x_no_kontrak = fields.Char(string='No Kontrak', copy=False, index=True,
                                help="Nomor kontrak yang terasosiasi dengan pesanan penjualan ini.")
 
     # Req 1.3: Field untuk Dengan PO (Boolean)
@@ -30,64 +42,355 @@ class SaleOrder(models.Model):
     x_po_ids = fields.One2many('purchase.order', 'x_sale_order_id', string='Pesanan Pembelian',
                                readonly=True, help="Menampilkan semua Pesanan Pembelian yang dibuat dari Pesanan Penjualan ini.")
 
+    # Jumlah Pesanan Pembelian untuk stat button, dihitung tanpa memuat record PO-nya.
+    x_po_count = fields.Integer(string='Jumlah Pesanan Pembelian', compute='_compute_x_po_count')
+
+    # Req 2.3: Jaminan di level database bahwa 'No Kontrak' unik di antara pesanan
+    # yang sudah terkonfirmasi, termasuk saat dua pengguna mengonfirmasi bersamaan.
+    _sql_constraints = [
+        ('x_no_kontrak_confirmed_uniq',
+         "EXCLUDE (x_no_kontrak WITH =) WHERE (state IN ('sale', 'done') AND x_no_kontrak IS NOT NULL)",
+         'No Kontrak sudah pernah diinputkan sebelumnya...!'),
+    ]
+
+    # ===========================================================================
+    # COMPUTE
+    # ===========================================================================
+
+    @api.depends('x_po_ids')
+    def _compute_x_po_count(self):
+        """Menghitung jumlah PO seluruh recordset dengan satu query agregat (GROUP BY)."""
+        groups = self.env['purchase.order'].read_group(
+            [('x_sale_order_id', 'in', self.ids)], ['x_sale_order_id'], ['x_sale_order_id'])
+        counts = {group['x_sale_order_id'][0]: group['x_sale_order_id_count'] for group in groups}
+        for order in self:
+            order.x_po_count = counts.get(order.id, 0)
+
     # ===========================================================================
     # BUSINESS LOGIC (Requirement 2)
     # ===========================================================================
 
+    def action_view_x_pos(self):
+        """Membuka daftar Pesanan Pembelian yang dibuat dari Pesanan Penjualan ini."""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Pesanan Pembelian'),
+            'res_model': 'purchase.order',
+            'view_mode': 'tree,form',
+            'domain': [('x_sale_order_id', '=', self.id)],
+            'context': {'create': False},
+        }
+
+    def action_export_so_lines(self):
+        """
+        Mengunduh baris pesanan terpilih sebagai file .xlsx dengan tata letak file impor
+        (satu sheet per pesanan), untuk diubah lalu diimpor kembali.
+        """
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/custom_tio/so_lines/export?order_ids=%s' % ','.join(str(order_id) for order_id in self.ids),
+            'target': 'self',
+        }
+
     # Req 2.3: Modifikasi logika tombol confirm untuk validasi 'No Kontrak'
-    @api.model
     def action_confirm(self):
         """
         Meng-override aksi confirm untuk menambahkan validasi.
         Memastikan bahwa 'No Kontrak' unik di antara pesanan yang sudah terkonfirmasi.
+        Validasi dilakukan sekaligus untuk seluruh recordset dengan satu query grouped.
         """
-        for order in self:
-            if order.x_no_kontrak:
-                # Cari pesanan lain yang sudah terkonfirmasi dengan nomor kontrak yang sama.
-                domain = [
-                    ('x_no_kontrak', '=', order.x_no_kontrak),
-                    ('id', '!=', order.id),
-                    ('state', 'in', ['sale', 'done'])
-                ]
-                if self.search_count(domain) > 0:
-                    raise ValidationError(_('No Kontrak "%s" sudah pernah diinputkan sebelumnya...!') % order.x_no_kontrak)
+        self._check_no_kontrak_unique()
         return super(SaleOrder, self).action_confirm()
 
-    # Req 2.1: Aksi tombol untuk membuat Pesanan Pembelian (PO)
-    def action_create_po(self):
+    def _check_no_kontrak_unique(self):
+        contracts = [contract for contract in self.mapped('x_no_kontrak') if contract]
+        if not contracts:
+            return
+        # Nomor kontrak yang muncul lebih dari sekali di dalam batch yang dikonfirmasi.
+        duplicates = {contract for contract, count in Counter(contracts).items() if count > 1}
+        # Nomor kontrak yang sudah dipakai pesanan lain yang terkonfirmasi, dalam satu query.
+        domain = [
+            ('x_no_kontrak', 'in', list(set(contracts))),
+            ('id', 'not in', self.ids),
+            ('state', 'in', ['sale', 'done'])
+        ]
+        duplicates.update(group['x_no_kontrak'] for group in self.read_group(domain, ['x_no_kontrak'], ['x_no_kontrak']))
+        if duplicates:
+            raise ValidationError(_('No Kontrak "%s" sudah pernah diinputkan sebelumnya...!') % '", "'.join(sorted(duplicates)))
+
+    def _get_seller_index(self):
         """
-        Metode ini dipicu oleh tombol 'Buat PO'.
-        Membuat sebuah Purchase Order baru berdasarkan data dari Sales Order ini.
+        Indeks harga vendor (product.supplierinfo) untuk semua baris SO di recordset ini,
+        dimuat dengan satu query: {'sellers': {(id_vendor, id_template_produk): [supplierinfo]},
+        'rates': {}}. Daftar harga milik vendor dan perusahaan induknya digabung dengan urutan
+        bawaan supplierinfo (sequence, min_qty menurun, harga). Harga tetap dalam mata uang
+        supplierinfo; konversinya ke mata uang PO dilakukan saat dipilih, dengan kurs yang
+        disimpan di 'rates' sehingga setiap kurs hanya dicari sekali.
+        """
+        vendors = self.x_request_vendor_id
+        sellers = self.env['product.supplierinfo'].search([
+            ('partner_id', 'in', (vendors | vendors.parent_id).ids),
+            ('product_tmpl_id', 'in', self.order_line.product_id.product_tmpl_id.ids),
+            ('company_id', 'in', self.company_id.ids + [False]),
+        ])
+        index = {}
+        for vendor in vendors:
+            partner_ids = (vendor.id, vendor.parent_id.id)
+            for seller in sellers:
+                if seller.partner_id.id in partner_ids:
+                    index.setdefault((vendor.id, seller.product_tmpl_id.id), []).append(seller)
+        return {'sellers': index, 'rates': {}}
+
+    def _get_purchase_currency(self):
+        """
+        Mata uang PO untuk pesanan ini: mata uang pembelian Vendor Permintaan di perusahaan
+        pesanan, atau mata uang perusahaan pesanan jika vendor tidak memilikinya.
         """
         self.ensure_one()
-        if not self.x_request_vendor_id:
-            raise ValidationError(_('Silakan pilih "Vendor Permintaan" sebelum membuat Pesanan Pembelian.'))
+        vendor = self.x_request_vendor_id.with_company(self.company_id)
+        return vendor.property_purchase_currency_id or self.company_id.currency_id
+
+    def _convert_purchase_price(self, price, from_currency, currency, date, rates):
+        """
+        Mengonversi harga ke mata uang PO 'currency' dengan kurs perusahaan pesanan pada 'date'.
+        Kurs disimpan di 'rates' sehingga dicari sekali per pasangan mata uang, bukan per baris.
+        """
+        if not from_currency or from_currency == currency:
+            return price
+        key = (from_currency.id, currency.id, self.company_id.id, date)
+        if key not in rates:
+            rates[key] = self.env['res.currency']._get_conversion_rate(from_currency, currency, self.company_id, date)
+        return price * rates[key]
 
-        # Menyiapkan data untuk Pesanan Pembelian baru.
-        po_vals = {
+    def _select_vendor_price(self, line, seller_index, date, currency):
+        """
+        Memilih harga vendor untuk satu baris SO dari indeks, dengan aturan yang sama seperti
+        product.product._select_seller (periode berlaku, varian, perusahaan, kuantitas minimum,
+        lalu harga termurah), tanpa query per baris. Mengembalikan (supplierinfo, harga dalam
+        mata uang 'currency') atau (None, None) jika vendor tidak memiliki harga untuk produk ini.
+        """
+        precision = self.env['decimal.precision'].precision_get('Product Unit of Measure')
+        matches = []
+        for seller in seller_index['sellers'].get((self.x_request_vendor_id.id, line.product_id.product_tmpl_id.id), ()):
+            if seller.company_id and seller.company_id != self.company_id:
+                continue
+            if (seller.date_start and seller.date_start > date) or (seller.date_end and seller.date_end < date):
+                continue
+            if seller.product_id and seller.product_id != line.product_id:
+                continue
+            quantity = line.product_uom._compute_quantity(line.product_uom_qty, seller.product_uom, raise_if_failure=False)
+            if float_compare(quantity, seller.min_qty, precision_digits=precision) < 0:
+                continue
+            # Seperti _select_seller: hanya harga dari partner yang sama dengan kandidat pertama.
+            if not matches or matches[0][0].partner_id == seller.partner_id:
+                price = self._convert_purchase_price(seller.price, seller.currency_id, currency, date, seller_index['rates'])
+                matches.append((seller, price))
+        if not matches:
+            return None, None
+        return min(matches, key=lambda match: match[1])
+
+    def _prepare_purchase_order_line_vals(self, line, date_planned, seller_index, currency):
+        """
+        Menyiapkan data baris PO untuk satu baris SO, termasuk relasi balik ke baris SO.
+        Jika vendor memiliki harga untuk produk ini, harga beli, kode/nama produk vendor, dan
+        lead time diambil dari harga vendor tersebut; jika tidak, harga baris SO dipakai.
+        Harga selalu dalam mata uang PO 'currency'.
+        """
+        date = fields.Date.to_date(date_planned)
+        vals = {
+            'product_id': line.product_id.id,
+            'product_qty': line.product_uom_qty,
+            'product_uom': line.product_uom.id,
+            'price_unit': self._convert_purchase_price(line.price_unit, self.currency_id, currency, date,
+                                                       seller_index['rates']),
+            'name': line.name,
+            'date_planned': date_planned,
+            'x_sale_line_id': line.id,
+            'x_from_sale_line': True,
+        }
+        seller, price = self._select_vendor_price(line, seller_index, date, currency)
+        if seller:
+            name = seller.product_name or line.name
+            vals.update({
+                'price_unit': seller.product_uom._compute_price(price, line.product_uom),
+                'name': '[%s] %s' % (seller.product_code, name) if seller.product_code else name,
+                'date_planned': date_planned + timedelta(days=seller.delay),
+            })
+        # Harga yang diharapkan disimpan agar laporan cakupan dapat menandai harga PO yang diubah.
+        vals['x_expected_price_unit'] = vals['price_unit']
+        return vals
+
+    def _prepare_purchase_order_vals(self, date_planned, seller_index=None):
+        """Menyiapkan data Pesanan Pembelian untuk Pesanan Penjualan ini di memori."""
+        self.ensure_one()
+        if seller_index is None:
+            seller_index = self._get_seller_index()
+        currency = self._get_purchase_currency()
+        return {
             'partner_id': self.x_request_vendor_id.id,
             'partner_ref': self.name,  # Referensi Vendor diambil dari nomor SO.
+            'origin': self.name,
             'x_sale_order_id': self.id, # Relasi ke SO ini.
+            'company_id': self.company_id.id,
+            # Diisi eksplisit: tanpa onchange, create() memakai mata uang perusahaan.
+            'currency_id': currency.id,
             'order_line': [
-                (0, 0, {
-                    'product_id': line.product_id.id,
-                    'product_qty': line.product_uom_qty,
-                    'product_uom': line.product_uom.id,
-                    'price_unit': line.price_unit,
-                    'name': line.name,
-                    'date_planned': fields.Date.today(),
-                }) for line in self.order_line
+                (0, 0, self._prepare_purchase_order_line_vals(line, date_planned, seller_index, currency))
+                for line in self.order_line
             ]
         }
-        po = self.env['purchase.order'].create(po_vals)
+
+    def _sync_purchase_order(self, purchase_order, date_planned, seller_index=None):
+        """
+        Menyinkronkan draft PO yang sudah ada dengan baris SO ini secara inkremental:
+        hanya baris yang ditambah, dihapus, atau berubah (produk, deskripsi, qty, UoM, harga)
+        yang ditulis, dalam satu write() dengan perintah One2many. Baris PO yang ditambahkan
+        manual tidak diubah maupun dihapus. Mengembalikan jumlah baris PO yang berubah.
+        """
+        self.ensure_one()
+        if seller_index is None:
+            seller_index = self._get_seller_index()
+        precision = {
+            'product_qty': self.env['decimal.precision'].precision_get('Product Unit of Measure'),
+            'price_unit': self.env['decimal.precision'].precision_get('Product Price'),
+            'x_expected_price_unit': self.env['decimal.precision'].precision_get('Product Price'),
+        }
+        commands = []
+        po_lines = {}
+        for po_line in purchase_order.order_line:
+            # Baris PO yang ditambahkan manual tidak disentuh oleh sinkronisasi.
+            if not po_line.x_from_sale_line:
+                continue
+            sale_line = po_line.x_sale_line_id
+            # Baris SO sumbernya sudah dihapus (atau baris PO ganda): hapus baris PO.
+            if not sale_line or sale_line.id in po_lines:
+                commands.append((2, po_line.id))
+            elif sale_line.order_id == self:
+                po_lines[sale_line.id] = po_line
+
+        for line in self.order_line:
+            vals = self._prepare_purchase_order_line_vals(line, date_planned, seller_index, purchase_order.currency_id)
+            po_line = po_lines.get(line.id)
+            if not po_line:
+                commands.append((0, 0, vals))
+                continue
+            for field in PO_LINE_SYNC_FIELDS:
+                value = po_line[field]
+                if isinstance(value, models.BaseModel):
+                    changed = value.id != vals[field]
+                elif field in precision:
+                    changed = float_compare(value, vals[field], precision_digits=precision[field]) != 0
+                else:
+                    changed = value != vals[field]
+                if changed:
+                    # Tulis semua field sinkron sekaligus agar harga tidak dihitung ulang
+                    # oleh compute bawaan PO saat hanya qty/UoM yang berubah.
+                    commands.append((1, po_line.id, {name: vals[name] for name in PO_LINE_SYNC_FIELDS}))
+                    break
+
+        if commands:
+            purchase_order.write({'order_line': commands})
+        return len(commands)
+
+    # Req 2.1: Aksi tombol untuk membuat Pesanan Pembelian (PO)
+    def action_create_po(self):
+        """
+        Metode ini dipicu oleh tombol 'Buat PO' atau oleh server action di list view.
+        Membuat Purchase Order untuk setiap Sales Order terpilih yang mencentang 'Dengan PO',
+        dikelompokkan per 'Vendor Permintaan', dengan satu panggilan create() batch.
+        Jika SO sudah memiliki draft PO untuk vendor yang sama, PO tersebut disinkronkan
+        secara inkremental alih-alih membuat PO duplikat.
+        """
+        orders = self.filtered('x_with_po')
+        if not orders:
+            raise ValidationError(_('Tidak ada Pesanan Penjualan terpilih yang mencentang "Dengan PO".'))
+        missing_vendor = orders.filtered(lambda order: not order.x_request_vendor_id)
+        if missing_vendor:
+            raise ValidationError(_('Silakan pilih "Vendor Permintaan" sebelum membuat Pesanan Pembelian: %s')
+                                  % ', '.join(missing_vendor.mapped('name')))
+
+        profile = self.env.context.get(phase_timer.PROFILE_CONTEXT_KEY)
+        with phase_timer.PhaseTimer('create_po', self.env.cr, profile=profile) as timer:
+            # Draft PO yang sudah ada per (SO, vendor), dicari sekaligus; yang terbaru dipakai.
+            draft_pos = {}
+            with timer.phase('draft_po_lookup'):
+                for po in self.env['purchase.order'].search([
+                    ('x_sale_order_id', 'in', orders.ids),
+                    ('state', 'in', ['draft', 'sent']),
+                ], order='id desc'):
+                    draft_pos.setdefault((po.x_sale_order_id.id, po.partner_id.id), po)
+
+            # Harga vendor untuk semua baris semua SO, dimuat sekaligus.
+            date_planned = fields.Date.today()
+            with timer.phase('seller_lookup'):
+                seller_index = orders._get_seller_index()
+
+            # Kelompokkan per vendor dan siapkan semua data PO baru di memori, lalu buat sekaligus.
+            orders_by_vendor = {}
+            for order in orders:
+                orders_by_vendor.setdefault(order.x_request_vendor_id, []).append(order)
+            po_vals_list = []
+            synced_pos = self.env['purchase.order']
+            changed_lines = 0
+            for vendor, vendor_orders in orders_by_vendor.items():
+                for order in vendor_orders:
+                    draft_po = draft_pos.get((order.id, vendor.id))
+                    if draft_po:
+                        with timer.phase('sync') as stats:
+                            changed = order._sync_purchase_order(draft_po, date_planned, seller_index)
+                            stats['rows'] += changed
+                        changed_lines += changed
+                        synced_pos |= draft_po
+                    else:
+                        with timer.phase('prepare') as stats:
+                            po_vals_list.append(order._prepare_purchase_order_vals(date_planned, seller_index))
+                            stats['rows'] += len(order.order_line)
+            with timer.phase('create') as stats:
+                created_pos = self.env['purchase.order'].create(po_vals_list)
+                stats['rows'] += len(created_pos)
+            # Compute tertunda (subtotal, total PO, dll.) dijalankan saat flush.
+            with timer.phase('recompute'):
+                self.env.flush_all()
+        timer.log(_logger, sale_orders=len(orders), created=len(created_pos), synced=len(synced_pos))
+        timer.save_profile(orders[:1])
+        purchase_orders = created_pos | synced_pos
 
         # Mengembalikan action untuk membuka form view dari PO yang baru dibuat.
+        if len(self) == 1:
+            return {
+                'type': 'ir.actions.act_window',
+                'res_model': 'purchase.order',
+                'res_id': purchase_orders.id,
+                'view_mode': 'form',
+                'target': 'current',
+            }
+
+        # Untuk banyak SO: tampilkan ringkasan per vendor, lalu buka daftar PO yang dibuat.
+        message = _('%(count)s Pesanan Pembelian dibuat dan %(synced)s disinkronkan (%(lines)s baris diperbarui) '
+                    'untuk %(vendors)s vendor: %(summary)s.',
+                    count=len(created_pos), synced=len(synced_pos), lines=changed_lines,
+                    vendors=len(orders_by_vendor),
+                    summary=', '.join('%s (%s)' % (vendor.display_name, len(vendor_orders))
+                                      for vendor, vendor_orders in orders_by_vendor.items()))
+        if len(self) > len(orders):
+            message += ' ' + _('%s Pesanan Penjualan dilewati karena tidak mencentang "Dengan PO".') % (len(self) - len(orders))
         return {
-            'type': 'ir.actions.act_window',
-            'res_model': 'purchase.order',
-            'res_id': po.id,
-            'view_mode': 'form',
-            'target': 'current',
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Buat PO'),
+                'message': message,
+                'type': 'success',
+                'sticky': True,
+                'next': {
+                    'type': 'ir.actions.act_window',
+                    'name': _('Pesanan Pembelian'),
+                    'res_model': 'purchase.order',
+                    'views': [(False, 'tree'), (False, 'form')],
+                    'domain': [('id', 'in', purchase_orders.ids)],
+                },
+            },
         }
 
 
@@ -100,4 +403,68 @@ class PurchaseOrder(models.Model):
 
     # Field untuk menyimpan relasi ke sumber Sales Order
     x_sale_order_id = fields.Many2one('sale.order', string='Pesanan Penjualan Terkait',
-                                      readonly=True, copy=False)
+                                      readonly=True, copy=False, index=True)
+
+    @api.model
+    def _link_legacy_sale_lines(self):
+        """
+        Menautkan baris draft PO yang dibuat sebelum ada relasi per baris (x_sale_line_id) ke
+        baris SO sumbernya, agar sinkronisasi memperbaruinya alih-alih menambahkan salinan baru.
+        Baris dicocokkan per produk dalam Pesanan Penjualan PO, berurutan menurut urutan baris.
+        Hanya PO yang belum memiliki baris tertaut yang diproses; baris yang tidak menemukan
+        pasangan tetap dianggap baris manual. Mengembalikan jumlah baris PO yang ditautkan.
+        """
+        self.env.flush_all()
+        self.env.cr.execute("""
+            WITH po_lines AS (
+                SELECT line.id, po.x_sale_order_id AS sale_order_id, line.product_id,
+                       ROW_NUMBER() OVER (PARTITION BY line.order_id, line.product_id
+                                          ORDER BY line.sequence, line.id) AS rank
+                  FROM purchase_order_line line
+                  JOIN purchase_order po ON po.id = line.order_id
+                 WHERE po.state IN ('draft', 'sent')
+                   AND po.x_sale_order_id IS NOT NULL
+                   AND line.display_type IS NULL
+                   AND line.x_sale_line_id IS NULL
+                   AND NOT EXISTS (
+                       SELECT 1 FROM purchase_order_line synced
+                        WHERE synced.order_id = line.order_id AND synced.x_sale_line_id IS NOT NULL
+                   )
+            ), so_lines AS (
+                SELECT sol.id, sol.order_id, sol.product_id,
+                       ROW_NUMBER() OVER (PARTITION BY sol.order_id, sol.product_id
+                                          ORDER BY sol.sequence, sol.id) AS rank
+                  FROM sale_order_line sol
+                 WHERE sol.display_type IS NULL
+                   AND sol.order_id IN (SELECT sale_order_id FROM po_lines)
+            )
+            UPDATE purchase_order_line line
+               SET x_sale_line_id = so_lines.id,
+                   x_from_sale_line = TRUE
+              FROM po_lines
+              JOIN so_lines ON so_lines.order_id = po_lines.sale_order_id
+                           AND so_lines.product_id = po_lines.product_id
+                           AND so_lines.rank = po_lines.rank
+             WHERE line.id = po_lines.id
+        """)
+        linked = self.env.cr.rowcount
+        self.env['purchase.order.line'].invalidate_model(['x_sale_line_id', 'x_from_sale_line'])
+        return linked
+
+
+class PurchaseOrderLine(models.Model):
+    """
+    Mewarisi purchase.order.line untuk menyimpan relasi per baris ke sale.order.line,
+    dipakai untuk sinkronisasi inkremental SO -> PO.
+    """
+    _inherit = 'purchase.order.line'
+
+    x_sale_line_id = fields.Many2one('sale.order.line', string='Baris Pesanan Penjualan',
+                                     readonly=True, copy=False, index=True, ondelete='set null')
+    # Baris dibuat oleh sinkronisasi SO -> PO. Tetap True setelah baris SO-nya dihapus, sehingga
+    # sinkronisasi berikutnya dapat membedakannya dari baris yang ditambahkan manual.
+    x_from_sale_line = fields.Boolean(string='Dari Pesanan Penjualan', readonly=True, copy=False)
+    # Harga beli yang ditetapkan sinkronisasi (harga vendor, atau harga SO jika tidak ada);
+    # dibandingkan dengan harga PO oleh laporan cakupan SO -> PO.
+    x_expected_price_unit = fields.Float(string='Harga Vendor Diharapkan', digits='Product Price',
+                                         readonly=True, copy=False)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+import logging
+import threading
+
+from markupsafe import Markup
+
+from odoo import models, fields, api, _
+from odoo.tools import split_every
+
+from ..tools import phase_timer, so_lines_reader
+
+_logger = logging.getLogger(__name__)
+
+# Jumlah maksimum error baris yang ditampilkan di chatter Sales Order.
+MAX_REPORTED_ERRORS = 50
+
+
+class SoLineImportJob(models.Model):
+    """
+    Job impor Baris Pesanan Penjualan yang dijalankan di latar belakang oleh cron.
+    File diproses per batch dan setiap batch di-commit, sehingga file besar tidak
+    terkena batas waktu request dan job yang terhenti dapat dilanjutkan dari
+    baris terakhir yang sudah diproses (row_cursor).
+
+    Impor langsung dari wizard juga dicatat di sini sebagai job yang selesai, beserta
+    hash isi filenya (checksum), agar unggahan ulang file yang sama dapat dikenali.
+    """
+    _name = 'so.line.import.job'
+    _description = 'Job Impor Baris Pesanan Penjualan'
+    _order = 'id desc'
+
+    # ===========================================================================
+    # FIELDS
+    # ===========================================================================
+
+    sale_order_id = fields.Many2one('sale.order', string='Pesanan Penjualan', required=True,
+                                    ondelete='cascade', index=True, readonly=True)
+    file_data = fields.Binary(string='File', attachment=True, required=True, readonly=True)
+    file_name = fields.Char(string='Nama File', readonly=True)
+    checksum = fields.Char(string='Hash File', index=True, readonly=True,
+                           help="Hash SHA-1 isi file, untuk mengenali unggahan ulang file yang sama.")
+    state = fields.Selection([
+        ('queued', 'Dalam Antrian'),
+        ('running', 'Berjalan'),
+        ('done', 'Selesai'),
+        ('failed', 'Gagal'),
+    ], string='Status', default='queued', required=True, index=True, readonly=True)
+    chunk_size = fields.Integer(string='Ukuran Batch', default=1000, required=True,
+                                help="Jumlah baris yang diproses dan di-commit dalam satu batch.")
+    row_cursor = fields.Integer(string='Baris Terakhir', default=0, readonly=True,
+                                help="Nomor baris file terakhir yang sudah di-commit. "
+                                     "Job yang terhenti dilanjutkan dari baris berikutnya.")
+    rows_imported = fields.Integer(string='Baris Diimpor', default=0, readonly=True)
+    rows_skipped = fields.Integer(string='Baris Dilewati', default=0, readonly=True)
+    error_log = fields.Text(string='Catatan Error', readonly=True)
+    phase_summary = fields.Text(string='Waktu per Fase', readonly=True,
+                                help="Waktu, jumlah query SQL dan jumlah baris per fase dari proses terakhir job ini.")
+
+    # ===========================================================================
+    # BUSINESS LOGIC
+    # ===========================================================================
+
+    @api.depends('sale_order_id', 'file_name')
+    def _compute_display_name(self):
+        for job in self:
+            job.display_name = '%s - %s' % (job.sale_order_id.name, job.file_name or _('Impor'))
+
+    def action_requeue(self):
+        """Memasukkan kembali job yang gagal ke antrian; proses dilanjutkan dari row_cursor."""
+        self.filtered(lambda job: job.state == 'failed').write({'state': 'queued'})
+        self._trigger_cron()
+
+    @api.model
+    def _find_import(self, sale_order, checksum):
+        """Impor terakhir file dengan hash 'checksum' ke 'sale_order', termasuk yang gagal di tengah jalan."""
+        return self.search([('sale_order_id', '=', sale_order.id), ('checksum', '=', checksum)], limit=1)
+
+    @api.model
+    def _trigger_cron(self):
+        self.env.ref('custom_tio.ir_cron_process_so_line_import_jobs')._trigger()
+
+    @api.model
+    def _cron_process_jobs(self):
+        """
+        Dipanggil oleh cron. Job 'running' ikut diproses: itu adalah job yang
+        workernya terhenti di tengah jalan dan harus dilanjutkan.
+        """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            # Job yang gagal di luar pemrosesan batch ditandai gagal agar tidak menahan antrian.
+            try:
+                job._process()
+            except Exception as e:
+                _logger.exception("SO line import job %s could not be processed", job.id)
+                if auto_commit:
+                    self.env.cr.rollback()
+                job.write({
+                    'state': 'failed',
+                    'error_log': '\n'.join(filter(None, [job.error_log, str(e)])),
+                })
+                if auto_commit:
+                    self.env.cr.commit()
+
+    def _process(self):
+        self.ensure_one()
+        # Jangan commit saat dijalankan dari test.
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        wizard = self.env['import.so.lines.wizard']
+        sale_order = self.sale_order_id
+
+        if self.state == 'queued':
+            sale_order.message_post(body=_('Impor baris dari file %s dimulai di latar belakang.') % self.file_name)
+        self.state = 'running'
+        if auto_commit:
+            self.env.cr.commit()
+
+        profile = self.env.context.get(phase_timer.PROFILE_CONTEXT_KEY)
+        with phase_timer.PhaseTimer('so_line_import_job', self.env.cr, profile=profile) as timer:
+            source = None
+            try:
+                with timer.phase('decode'):
+                    source, checksum = wizard._open_upload(self, 'file_data')
+                    self.checksum = checksum
+                rows = wizard._iter_normalized_rows(source, self.file_name, checksum)
+                # Lanjutkan dari baris setelah batch terakhir yang sudah di-commit.
+                rows = (row for row in rows if row.row_number > self.row_cursor)
+                products, line_defaults = {}, {}
+                for chunk in timer.iterate('parse', split_every(self.chunk_size, rows)):
+                    errors = []
+                    parsed_rows = list(wizard._parse_rows(chunk, errors))
+                    with timer.phase('product_lookup'):
+                        wizard._update_product_index(products, {row.product_code for row in parsed_rows})
+                    with timer.phase('create_lines') as stats:
+                        lines = wizard._create_order_lines(sale_order, parsed_rows, products, errors, line_defaults)
+                        stats['rows'] += len(lines)
+                    with timer.phase('recompute'):
+                        wizard._flush_bulk_lines()
+                    with timer.phase('commit'):
+                        self.write({
+                            'row_cursor': chunk[-1].row_number,
+                            'rows_imported': self.rows_imported + len(lines),
+                            'rows_skipped': self.rows_skipped + len(chunk) - len(lines),
+                            'error_log': self._append_errors(errors),
+                        })
+                        if auto_commit:
+                            self.env.cr.commit()
+            except Exception as e:
+                _logger.exception("SO line import job %s failed", self.id)
+                if auto_commit:
+                    self.env.cr.rollback()
+                self.write({
+                    'state': 'failed',
+                    'error_log': '\n'.join(filter(None, [self.error_log, str(e)])),
+                })
+                summary = _('Impor baris dari file %(file)s gagal setelah baris %(row)s.',
+                            file=self.file_name, row=self.row_cursor)
+            else:
+                self.state = 'done'
+                summary = _('Impor baris dari file %(file)s selesai: %(imported)s baris diimpor, %(skipped)s baris dilewati.',
+                            file=self.file_name, imported=self.rows_imported, skipped=self.rows_skipped)
+            finally:
+                if source:
+                    source.close()
+        self._save_phases(timer)
+        self._post_result(summary)
+        if auto_commit:
+            self.env.cr.commit()
+
+    def _save_phases(self, timer):
+        """Menyimpan ringkasan fase di job, menulisnya ke log, dan melampirkan dump cProfile jika ada."""
+        self.ensure_one()
+        timer.log(_logger, job=self.id, sale_order=self.sale_order_id.id)
+        timer.save_profile(self)
+        self.phase_summary = '\n'.join(timer.summary())
+
+    def _append_errors(self, errors):
+        """
+        Menambahkan error baris [(nomor_baris, pesan)] ke catatan error job.
+        Catatan disimpan per batch agar tetap ada saat job dilanjutkan, dibatasi
+        MAX_REPORTED_ERRORS baris (jumlah lengkapnya ada di 'Baris Dilewati').
+        """
+        self.ensure_one()
+        lines = (self.error_log or '').splitlines()
+        lines += [_('Baris %(row)s: %(error)s', row=row_number, error=message)
+                  for row_number, message in errors][:max(MAX_REPORTED_ERRORS - len(lines), 0)]
+        return '\n'.join(lines) or False
+
+    def _post_result(self, summary):
+        """Mengirim ringkasan hasil job beserta catatan error ke chatter Sales Order."""
+        self.ensure_one()
+        body = Markup('<br/>').join([summary] + (self.error_log or '').splitlines())
+        self.sale_order_id.message_post(body=body)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+import logging
+
+from odoo import models, fields
+
+_logger = logging.getLogger(__name__)
+
+# Kolom materialized view yang diberi indeks untuk filter dan pengelompokan laporan.
+INDEXED_COLUMNS = ('order_id', 'vendor_id', 'x_no_kontrak', 'coverage', 'date_order', 'company_id')
+
+
+class SoPoCoverageReport(models.Model):
+    """
+    Laporan cakupan SO -> PO: satu baris per baris Pesanan Penjualan yang mencentang
+    'Dengan PO', dengan kuantitas dan harga baris PO yang terhubung (x_sale_line_id,
+    PO yang dibatalkan tidak dihitung). Dipakai untuk menemukan SO tanpa PO, kuantitas
+    yang baru sebagian dipesan, dan harga PO yang menyimpang dari harga vendor, per pesanan,
+    vendor, dan kontrak.
+
+    Semua harga dan subtotal dikonversi ke mata uang perusahaan dengan kurs pesanan
+    masing-masing (currency_rate), sehingga pesanan dengan mata uang berbeda dapat dijumlahkan.
+
+    Data disimpan dalam materialized view berindeks yang diperbarui berkala oleh cron,
+    sehingga pivot/graph atas ratusan ribu pesanan tidak perlu menggabungkan tabel baris
+    SO dan PO setiap kali laporan dibuka.
+    """
+    _name = 'so.po.coverage.report'
+    _description = 'Laporan Cakupan SO ke PO'
+    _auto = False
+    _rec_name = 'order_id'
+    _order = 'date_order desc, order_id desc, id'
+
+    # ===========================================================================
+    # FIELDS
+    # ===========================================================================
+
+    sale_line_id = fields.Many2one('sale.order.line', string='Baris Pesanan Penjualan', readonly=True)
+    order_id = fields.Many2one('sale.order', string='Pesanan Penjualan', readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Pelanggan', readonly=True)
+    vendor_id = fields.Many2one('res.partner', string='Vendor Permintaan', readonly=True)
+    x_no_kontrak = fields.Char(string='No Kontrak', readonly=True)
+    company_id = fields.Many2one('res.company', string='Perusahaan', readonly=True)
+    date_order = fields.Datetime(string='Tanggal Pesanan', readonly=True)
+    state = fields.Selection(selection=lambda self: self.env['sale.order']._fields['state'].selection,
+                             string='Status SO', readonly=True)
+    product_id = fields.Many2one('product.product', string='Produk', readonly=True)
+
+    so_qty = fields.Float(string='Qty SO', readonly=True)
+    po_qty = fields.Float(string='Qty PO', readonly=True)
+    qty_gap = fields.Float(string='Qty Belum Dipesan', readonly=True,
+                           help="Qty SO dikurangi Qty PO; negatif jika PO melebihi SO.")
+    so_price_unit = fields.Float(string='Harga SO', readonly=True, group_operator='avg',
+                                 help="Harga jual baris SO dalam mata uang perusahaan.")
+    po_price_unit = fields.Float(string='Harga PO', readonly=True, group_operator='avg',
+                                 help="Harga beli rata-rata tertimbang baris PO yang terhubung, dalam mata uang perusahaan.")
+    price_gap = fields.Float(string='Selisih Harga Vendor', readonly=True, group_operator='avg',
+                             help="Harga PO dikurangi harga vendor yang diharapkan saat baris PO dibuat atau "
+                                  "disinkronkan, dalam mata uang perusahaan.")
+    so_amount = fields.Float(string='Subtotal SO', readonly=True, help="Dalam mata uang perusahaan.")
+    po_amount = fields.Float(string='Subtotal PO', readonly=True, help="Dalam mata uang perusahaan.")
+    po_line_count = fields.Integer(string='Jumlah Baris PO', readonly=True)
+    coverage = fields.Selection([
+        ('none', 'Tanpa PO'),
+        ('partial', 'Sebagian'),
+        ('full', 'Penuh'),
+        ('over', 'Melebihi SO'),
+    ], string='Cakupan PO', readonly=True)
+    has_price_gap = fields.Boolean(string='Ada Selisih Harga Vendor', readonly=True,
+                                   help="Harga salah satu baris PO berbeda dari harga vendor yang diharapkan.")
+
+    # ===========================================================================
+    # SQL VIEW
+    # ===========================================================================
+
+    def _query(self):
+        return """
+            SELECT
+                sol.id AS id,
+                sol.id AS sale_line_id,
+                so.id AS order_id,
+                so.partner_id AS partner_id,
+                so.x_request_vendor_id AS vendor_id,
+                so.x_no_kontrak AS x_no_kontrak,
+                so.company_id AS company_id,
+                so.date_order AS date_order,
+                so.state AS state,
+                sol.product_id AS product_id,
+                sol.product_uom_qty AS so_qty,
+                COALESCE(pol.po_qty, 0) AS po_qty,
+                sol.product_uom_qty - COALESCE(pol.po_qty, 0) AS qty_gap,
+                sol.price_unit / COALESCE(NULLIF(so.currency_rate, 0), 1) AS so_price_unit,
+                pol.po_price_unit AS po_price_unit,
+                pol.price_gap AS price_gap,
+                sol.price_subtotal / COALESCE(NULLIF(so.currency_rate, 0), 1) AS so_amount,
+                COALESCE(pol.po_amount, 0) AS po_amount,
+                COALESCE(pol.po_line_count, 0) AS po_line_count,
+                CASE
+                    WHEN pol.sale_line_id IS NULL THEN 'none'
+                    WHEN pol.po_qty < sol.product_uom_qty THEN 'partial'
+                    WHEN pol.po_qty > sol.product_uom_qty THEN 'over'
+                    ELSE 'full'
+                END AS coverage,
+                COALESCE(pol.has_price_gap, FALSE) AS has_price_gap
+            FROM sale_order_line sol
+            JOIN sale_order so ON so.id = sol.order_id
+            LEFT JOIN (
+                SELECT
+                    line.x_sale_line_id AS sale_line_id,
+                    SUM(line.product_qty) AS po_qty,
+                    SUM(line.price_unit / COALESCE(NULLIF(po.currency_rate, 0), 1) * line.product_qty)
+                        / NULLIF(SUM(line.product_qty), 0) AS po_price_unit,
+                    SUM((line.price_unit - line.x_expected_price_unit) / COALESCE(NULLIF(po.currency_rate, 0), 1)
+                        * line.product_qty)
+                        / NULLIF(SUM(line.product_qty) FILTER (WHERE line.x_expected_price_unit IS NOT NULL), 0)
+                        AS price_gap,
+                    BOOL_OR(ROUND(line.price_unit - line.x_expected_price_unit, cur.decimal_places) <> 0) AS has_price_gap,
+                    SUM(line.price_subtotal / COALESCE(NULLIF(po.currency_rate, 0), 1)) AS po_amount,
+                    COUNT(*) AS po_line_count
+                FROM purchase_order_line line
+                JOIN purchase_order po ON po.id = line.order_id
+                JOIN res_currency cur ON cur.id = po.currency_id
+                WHERE line.x_sale_line_id IS NOT NULL AND po.state != 'cancel'
+                GROUP BY line.x_sale_line_id
+            ) pol ON pol.sale_line_id = sol.id
+            WHERE so.x_with_po AND sol.display_type IS NULL
+        """
+
+    def init(self):
+        self.env.cr.execute("DROP MATERIALIZED VIEW IF EXISTS %s" % self._table)
+        self.env.cr.execute("CREATE MATERIALIZED VIEW %s AS (%s)" % (self._table, self._query()))
+        # Indeks unik dibutuhkan untuk REFRESH ... CONCURRENTLY.
+        self.env.cr.execute("CREATE UNIQUE INDEX %s_id_idx ON %s (id)" % (self._table, self._table))
+        for column in INDEXED_COLUMNS:
+            self.env.cr.execute("CREATE INDEX %s_%s_idx ON %s (%s)" % (self._table, column, self._table, column))
+
+    # ===========================================================================
+    # CRON
+    # ===========================================================================
+
+    def _cron_refresh(self):
+        """
+        Memperbarui isi laporan. CONCURRENTLY membuat laporan tetap dapat dibaca
+        selama pembaruan berlangsung.
+        """
+        self.env.cr.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY %s" % self._table)
+        self.env.invalidate_all()
+        _logger.info("SO/PO coverage report refreshed")
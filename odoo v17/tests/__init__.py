@@ -0,0 +1,3 @@
+from . import test_benchmark
+from . import test_import_so_lines
+from . import test_sync_purchase_order
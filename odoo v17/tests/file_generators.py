@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+"""
+Generator ber-seed untuk file impor Baris SO (Kode Produk, Kuantitas, Harga Satuan),
+satu penulis per format yang didukung. Dipakai oleh tes benchmark modul ini dan oleh
+benchmarks/bench_import_formats.py; seperti tools/so_lines_reader.py, modul ini tidak
+bergantung pada Odoo.
+
+Penulis yang pustakanya (openpyxl, xlwt) tidak terpasang memunculkan ImportError.
+Format .xls dibatasi XLS_MAX_ROWS baris data.
+"""
+import csv
+import random
+
+HEADER = ('Kode Produk', 'Kuantitas', 'Harga Satuan')
+XLS_MAX_ROWS = 65535
+
+
+def generate_rows(count, seed=42, product_count=5000):
+    """'count' baris (kode produk PRD-00000 .. PRD-<product_count-1>, kuantitas, harga)."""
+    rng = random.Random(seed)
+    for dummy in range(count):
+        yield (
+            'PRD-%05d' % rng.randrange(product_count),
+            rng.randint(1, 500),
+            round(rng.uniform(1000, 5000000), 2),
+        )
+
+
+def write_csv(path, rows, delimiter):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def write_xlsx(path, rows):
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_xls(path, rows):
+    import xlwt
+    workbook = xlwt.Workbook()
+    sheet = workbook.add_sheet('Sheet1')
+    for col, value in enumerate(HEADER):
+        sheet.write(0, col, value)
+    for row_idx, row in enumerate(rows, start=1):
+        for col, value in enumerate(row):
+            sheet.write(row_idx, col, value)
+    workbook.save(path)
+
+
+WRITERS = {
+    'csv': lambda path, rows: write_csv(path, rows, ','),
+    'tsv': lambda path, rows: write_csv(path, rows, '\t'),
+    'xlsx': write_xlsx,
+    'xls': write_xls,
+}
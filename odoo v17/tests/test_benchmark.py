@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+"""
+Benchmark end-to-end jalur panas modul, dijalankan oleh test runner Odoo.
+
+Generator ber-seed membuat produk, vendor, Sales Order dengan N baris dan file
+impor berukuran sesuai parameter; setiap skenario diukur waktunya dan jumlah
+query SQL-nya. Setiap run dikembalikan ke savepoint, dan transaksi tes sendiri
+di-rollback di akhir, sehingga database tidak berubah.
+
+Benchmark tidak ikut dalam tes standar; pilih lewat tag-nya:
+
+    odoo-bin -c odoo.conf -d bench -u custom_tio --stop-after-init \\
+        --test-tags /custom_tio:benchmark
+
+Parameter dibaca dari variabel lingkungan SO_BENCHMARK_* (lihat PARAMETERS),
+mis. SO_BENCHMARK_ROWS=50000 SO_BENCHMARK_FORMATS=csv,xlsx. File impor ditulis oleh
+generator ber-seed di tests/file_generators.py.
+
+Skenario (satu tes per skenario):
+    import        wizard impor, tanpa cache dan dengan baris file yang sudah ada di cache
+    import_scaling
+                  wizard impor dengan file CSV untuk setiap jumlah baris 'scale',
+                  melaporkan waktu dan query per baris
+    confirm       action_confirm atas recordset banyak Sales Order
+    create_po     action_create_po atas recordset banyak Sales Order, lalu run ulang
+                  yang menyinkronkan PO draft setelah sebagian baris berubah
+    po_relations  jumlah PO dan One2many PO atas recordset banyak Sales Order
+
+Hasil ditulis ke SO_BENCHMARK_JSON (default: custom_tio-benchmark.json di direktori
+sementara) berisi versi Odoo, modul, revisi git, parameter dan satu entri per
+skenario, sehingga hasil dapat dibandingkan antar rilis.
+"""
+import base64
+import contextlib
+import json
+import logging
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+from odoo import release
+from odoo.tests.common import TransactionCase, tagged
+
+from ..tools import parsed_rows_cache
+from . import file_generators
+
+_logger = logging.getLogger(__name__)
+
+ADDON = 'custom_tio'
+
+# Parameter benchmark dan nilai default-nya; masing-masing dapat diganti lewat
+# variabel lingkungan SO_BENCHMARK_<NAMA>.
+PARAMETERS = {
+    'rows': 10000,  # Baris data per file impor.
+    'formats': 'xlsx,csv',  # Format file impor (csv, tsv, xlsx, xls).
+    'scale': '100,1000,10000,50000',  # Jumlah baris skenario import_scaling.
+    'orders': 200,  # Sales Order per recordset.
+    'lines': 20,  # Baris per Sales Order yang dibuat.
+    'products': 2000,  # Jumlah produk yang dibuat.
+    'repeat': 3,  # Run per skenario; run tercepat yang dipakai.
+    'seed': 42,  # Seed generator data.
+}
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_parameters():
+    return {
+        name: type(default)(os.environ.get('SO_BENCHMARK_%s' % name.upper(), default))
+        for name, default in PARAMETERS.items()
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=ADDON_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result(scenario, runs, records, **params):
+    """Ringkasan run sebuah skenario; run tercepat yang dipakai."""
+    seconds, queries = min(runs)
+    return dict(
+        scenario=scenario,
+        records=records,
+        seconds=round(seconds, 3),
+        queries=queries,
+        records_per_second=round(records / seconds) if seconds else None,
+        runs=[round(run[0], 3) for run in runs],
+        **params
+    )
+
+
+class _Rollback(Exception):
+    pass
+
+
+@tagged('-standard', 'benchmark', 'post_install', '-at_install')
+class TestBenchmark(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.params = get_parameters()
+        cls.results = []
+        seed = cls.params['seed']
+        cls.customer = cls.env['res.partner'].create({'name': 'Benchmark Customer', 'is_company': True})
+        cls.vendor = cls.env['res.partner'].create({
+            'name': 'Benchmark Vendor', 'is_company': True, 'supplier_rank': 1})
+        cls.products = cls._create_products(cls.params['products'], seed)
+        cls._create_vendor_prices(cls.products, cls.vendor, seed)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._write_results()
+        super().tearDownClass()
+
+    # ---------------------------------------------------------------------------
+    # Generators
+    # ---------------------------------------------------------------------------
+
+    @classmethod
+    def _create_products(cls, count, seed):
+        """Produk PRD-00000 .. PRD-<count-1>, sesuai kode dari generate_rows()."""
+        rng = random.Random(seed)
+        return cls.env['product.product'].create([{
+            'name': 'Benchmark Product %05d' % i,
+            'default_code': 'PRD-%05d' % i,
+            'type': 'consu',
+            'list_price': round(rng.uniform(1000, 5000000), 2),
+        } for i in range(count)])
+
+    @classmethod
+    def _create_vendor_prices(cls, products, vendor, seed):
+        """Harga vendor untuk setiap produk kedua, agar pembuatan PO menangani baris dengan dan tanpa harga vendor."""
+        rng = random.Random(seed)
+        return cls.env['product.supplierinfo'].create([{
+            'partner_id': vendor.id,
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_code': 'V-%s' % product.default_code,
+            'price': round(product.list_price * rng.uniform(0.5, 0.9), 2),
+            'min_qty': rng.choice([0, 0, 10, 100]),
+            'delay': rng.randint(1, 30),
+        } for product in products[::2]])
+
+    def _create_orders(self, count, line_count):
+        seed = self.params['seed']
+        rng = random.Random(seed)
+        return self.env['sale.order'].create([{
+            'partner_id': self.customer.id,
+            'x_request_vendor_id': self.vendor.id,
+            'x_with_po': True,
+            'x_no_kontrak': 'BENCH-%d-%06d' % (seed, i),
+            'order_line': [(0, 0, {
+                'product_id': product.id,
+                'product_uom_qty': rng.randint(1, 500),
+                'price_unit': product.list_price,
+            }) for product in rng.sample(list(self.products), min(line_count, len(self.products)))],
+        } for i in range(count)])
+
+    def _write_import_file(self, directory, file_format, row_count):
+        """Menulis file impor hasil generator; mengembalikan (data, nama file, jumlah baris)."""
+        if file_format == 'xls':
+            row_count = min(row_count, file_generators.XLS_MAX_ROWS)
+        path = os.path.join(directory, 'lines.%s' % file_format)
+        file_generators.WRITERS[file_format](
+            path, file_generators.generate_rows(row_count, self.params['seed'], self.params['products']))
+        with open(path, 'rb') as f:
+            return base64.b64encode(f.read()), os.path.basename(path), row_count
+
+    # ---------------------------------------------------------------------------
+    # Measurement
+    # ---------------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def _rolled_back(self):
+        """Menjalankan blok di dalam savepoint yang selalu di-rollback."""
+        try:
+            with self.env.cr.savepoint():
+                yield
+                raise _Rollback()
+        except _Rollback:
+            pass
+        self.env.invalidate_all()
+
+    def _measure(self, func):
+        """Mengembalikan (detik, query) dari func(), termasuk flush terakhir ke database."""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        func()
+        self.env.flush_all()
+        return time.perf_counter() - start, self.env.cr.sql_log_count - queries
+
+    def _run_import(self, file_data, file_name, row_count):
+        order = self._create_orders(1, 0)
+        wizard = self.env['import.so.lines.wizard'].with_context(active_id=order.id).create({
+            'file_data': file_data,
+            'file_name': file_name,
+        })
+        run = self._measure(wizard.action_import_so_lines)
+        self.assertEqual(len(order.order_line), row_count, file_name)
+        return run
+
+    @classmethod
+    def _write_results(cls):
+        if not cls.results:
+            return
+        _logger.info('%-15s %-6s %8s %9s %9s %10s', 'scenario', 'format', 'records', 'seconds', 'queries', 'records/s')
+        for row in cls.results:
+            if 'skipped' in row:
+                _logger.info('%-15s %-6s skipped: %s', row['scenario'], row['format'], row['skipped'])
+                continue
+            _logger.info('%-15s %-6s %8d %9.3f %9d %10s', row['scenario'], row.get('format', ''), row['records'],
+                         row['seconds'], row['queries'], row['records_per_second'])
+
+        path = os.environ.get('SO_BENCHMARK_JSON') or os.path.join(tempfile.gettempdir(), '%s-benchmark.json' % ADDON)
+        with open(path, 'w') as f:
+            json.dump({
+                'odoo_version': release.version,
+                'addon': ADDON,
+                'git_revision': git_revision(),
+                'parameters': cls.params,
+                'results': cls.results,
+            }, f, indent=2)
+        _logger.info("Hasil benchmark ditulis ke %s", path)
+
+    # ---------------------------------------------------------------------------
+    # Scenarios
+    # ---------------------------------------------------------------------------
+
+    def test_import(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for file_format in self.params['formats'].split(','):
+                try:
+                    file_data, file_name, row_count = self._write_import_file(directory, file_format, self.params['rows'])
+                except ImportError as e:
+                    self.results.append({'scenario': 'import', 'format': file_format, 'skipped': str(e)})
+                    continue
+
+                runs, cached_runs = [], []
+                for dummy in range(self.params['repeat']):
+                    parsed_rows_cache.parsed_rows.clear()
+                    with self._rolled_back():
+                        runs.append(self._run_import(file_data, file_name, row_count))
+                        # File yang sama ke pesanan lain: baris kini diambil dari cache baris.
+                        cached_runs.append(self._run_import(file_data, file_name, row_count))
+                self.results.append(result('import', runs, row_count, format=file_format))
+                self.results.append(result('import_cached', cached_runs, row_count, format=file_format))
+
+    def test_import_scaling(self):
+        """Impor yang sama dengan jumlah baris yang bertambah: biaya per baris harus tetap datar."""
+        with tempfile.TemporaryDirectory() as directory:
+            for line_count in map(int, self.params['scale'].split(',')):
+                file_data, file_name, row_count = self._write_import_file(directory, 'csv', line_count)
+                runs = []
+                for dummy in range(self.params['repeat']):
+                    parsed_rows_cache.parsed_rows.clear()
+                    with self._rolled_back():
+                        runs.append(self._run_import(file_data, file_name, row_count))
+                entry = result('import_scaling', runs, row_count, format='csv')
+                entry['ms_per_line'] = round(entry['seconds'] * 1000 / row_count, 3)
+                entry['queries_per_line'] = round(entry['queries'] / row_count, 3)
+                self.results.append(entry)
+
+    def test_confirm(self):
+        runs = []
+        for dummy in range(self.params['repeat']):
+            with self._rolled_back():
+                orders = self._create_orders(self.params['orders'], self.params['lines'])
+                runs.append(self._measure(orders.action_confirm))
+        self.results.append(result('confirm', runs, self.params['orders'], lines_per_order=self.params['lines']))
+
+    def test_create_po(self):
+        create_runs, sync_runs = [], []
+        rng = random.Random(self.params['seed'])
+        for dummy in range(self.params['repeat']):
+            with self._rolled_back():
+                orders = self._create_orders(self.params['orders'], self.params['lines'])
+                create_runs.append(self._measure(orders.action_create_po))
+                # Ubah sepersepuluh baris, lalu ukur sinkronisasi inkremental PO draft.
+                lines = orders.order_line
+                for line in rng.sample(list(lines), len(lines) // 10):
+                    line.product_uom_qty += 1
+                sync_runs.append(self._measure(orders.action_create_po))
+        self.results.append(result('create_po', create_runs, self.params['orders'], lines_per_order=self.params['lines']))
+        self.results.append(result('create_po_sync', sync_runs, self.params['orders'], lines_per_order=self.params['lines']))
+
+    def test_po_relations(self):
+        runs = []
+        for dummy in range(self.params['repeat']):
+            with self._rolled_back():
+                orders = self._create_orders(self.params['orders'], self.params['lines'])
+                orders.action_create_po()
+                runs.append(self._measure(lambda: (
+                    orders.mapped('x_po_count'),
+                    orders.mapped('x_po_ids').mapped('name'),
+                )))
+        self.results.append(result('po_relations', runs, self.params['orders']))
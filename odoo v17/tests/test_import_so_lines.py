@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+import base64
+from unittest.mock import patch
+
+from odoo.tests.common import TransactionCase, tagged
+
+from ..tools import parsed_rows_cache
+from ..wizard import import_so_lines_wizard
+
+# Ukuran batch selama tes diperkecil agar impor besar melewati beberapa batas batch.
+CHUNK_SIZE = 100
+SMALL_ROW_COUNT = 20
+LARGE_ROW_COUNT = 500
+
+# Batas query tambahan per baris. Pencarian produk, pembuatan baris, dan recompute dilakukan
+# per batch, tetapi compute bawaan baris SO (mis. distribusi analitik dan aturan pricelist)
+# masih mencari data untuk setiap record saat create(). Impor baris per baris memerlukan
+# jauh lebih banyak query per baris dari batas ini.
+MAX_QUERIES_PER_ROW = 3
+
+
+@tagged('post_install', '-at_install')
+class TestImportSoLines(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env['res.partner'].create({'name': 'Pelanggan Impor'})
+        cls.product = cls.env['product.product'].create({
+            'name': 'Produk Impor',
+            'default_code': 'IMP-001',
+            'type': 'consu',
+            'list_price': 1000.0,
+        })
+
+    def _import_rows(self, row_count, price_unit):
+        """
+        Mengimpor 'row_count' baris ke SO baru dan mengembalikan jumlah query SQL-nya.
+        Harga berbeda per impor agar isi (dan hash) setiap file berbeda, dan cache baris
+        dikosongkan sehingga setiap impor benar-benar mem-parse file-nya.
+        """
+        sale_order = self.env['sale.order'].create({'partner_id': self.partner.id})
+        content = 'Kode Produk,Kuantitas,Harga Satuan\n' + 'IMP-001,2,%s\n' % price_unit * row_count
+        wizard = self.env['import.so.lines.wizard'].with_context(active_id=sale_order.id).create({
+            'file_data': base64.b64encode(content.encode()),
+            'file_name': 'baris-%s.csv' % row_count,
+        })
+        parsed_rows_cache.parsed_rows.clear()
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.cr.sql_log_count
+        with patch.object(import_so_lines_wizard, 'IMPORT_CHUNK_SIZE', CHUNK_SIZE):
+            wizard.action_import_so_lines()
+        self.env.flush_all()
+        queries = self.cr.sql_log_count - queries
+        self.assertEqual(len(sale_order.order_line), row_count)
+        return queries
+
+    def test_import_query_count_per_row_is_bounded(self):
+        """Query tambahan untuk 25x lebih banyak baris tetap di bawah MAX_QUERIES_PER_ROW per baris."""
+        # Impor pertama mengisi cache ORM (field, akses, urutan) agar tidak ikut terhitung.
+        self._import_rows(SMALL_ROW_COUNT, 1100)
+        small_queries = self._import_rows(SMALL_ROW_COUNT, 1200)
+        large_queries = self._import_rows(LARGE_ROW_COUNT, 1300)
+        per_row = (large_queries - small_queries) / (LARGE_ROW_COUNT - SMALL_ROW_COUNT)
+        self.assertLessEqual(
+            per_row, MAX_QUERIES_PER_ROW,
+            "Impor %s baris menjalankan %s query, impor %s baris %s query (%.2f query per baris)" % (
+                SMALL_ROW_COUNT, small_queries, LARGE_ROW_COUNT, large_queries, per_row))
+
+    def test_upsert_counts_file_rows(self):
+        """Mode gabung mencatat jumlah baris file yang diimpor, bukan jumlah baris SO yang dibuat atau diperbarui."""
+        product = self.env['product.product'].create({
+            'name': 'Produk Impor 2', 'default_code': 'IMP-002', 'type': 'consu'})
+        sale_order = self.env['sale.order'].create({
+            'partner_id': self.partner.id,
+            'order_line': [(0, 0, {'product_id': self.product.id, 'product_uom_qty': 2, 'price_unit': 1000})],
+        })
+        # Dua baris digabung ke baris IMP-001 yang tidak berubah, baris ketiga membuat baris IMP-002.
+        rows = [('IMP-001', 1, 1000), ('IMP-001', 1, 1000), ('IMP-002', 1, 500)]
+        content = 'Kode Produk,Kuantitas,Harga Satuan,Nomor SO\n' + ''.join(
+            '%s,%s,%s,%s\n' % (code, qty, price, sale_order.name) for code, qty, price in rows)
+        wizard = self.env['import.so.lines.wizard'].create({
+            'file_data': base64.b64encode(content.encode()),
+            'file_name': 'gabung.csv',
+            'multi_order': True,
+            'import_mode': 'upsert',
+        })
+        wizard.action_import_so_lines()
+        self.assertEqual(sale_order.order_line.product_id, self.product | product)
+        job = self.env['so.line.import.job'].search([('sale_order_id', '=', sale_order.id)])
+        self.assertEqual(job.rows_imported, 3)
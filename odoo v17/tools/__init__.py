@@ -0,0 +1,4 @@
+from . import so_lines_reader
+from . import phase_timer
+from . import parsed_rows_cache
+from . import so_lines_writer
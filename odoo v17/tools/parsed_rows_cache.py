@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+"""
+Cache baris impor yang sudah dinormalisasi, dengan kunci hash isi file.
+
+Pengguna sering mengulang wizard impor setelah timeout, atau mengunggah sheet
+pemasok yang sama ke beberapa SO. Dengan cache ini, unggahan ulang file yang
+sama tidak perlu di-parse lagi: baris ImportRow hasil normalize_rows() diambil
+langsung dari memori.
+
+Cache ini per proses (setiap worker Odoo memiliki cache sendiri) dan dibatasi:
+- jumlah entri (LRU: entri yang paling lama tidak dipakai dibuang lebih dulu),
+- jumlah baris per entri dan ukuran file: file besar tidak di-cache sama sekali,
+  dan pengumpulan baris berhenti begitu batasnya terlewati,
+- jumlah total baris di semua entri,
+- umur entri (TTL), agar memori worker tidak tertahan terlalu lama.
+
+Cache ini hanya ditujukan untuk file kecil yang sering diunggah ulang; file besar
+sebaiknya diimpor di latar belakang dan tidak menahan memori worker.
+"""
+import collections
+import threading
+import time
+
+# Batas bawaan cache; jumlah baris menentukan pemakaian memori (± 200 byte per baris).
+MAX_ENTRIES = 32
+MAX_ROWS = 100000
+MAX_ENTRY_ROWS = 20000
+# File yang lebih besar dari ini (byte) tidak di-cache; diperiksa sebelum baris dikumpulkan.
+MAX_FILE_SIZE = 2 * 1024 * 1024
+TTL_SECONDS = 3600
+
+
+class ParsedRowsCache(object):
+    """Cache LRU + TTL yang aman dipakai beberapa thread, berisi tuple ImportRow per kunci."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_rows=MAX_ROWS, max_entry_rows=MAX_ENTRY_ROWS,
+                 max_file_size=MAX_FILE_SIZE, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.max_entry_rows = max_entry_rows
+        self.max_file_size = max_file_size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()  # kunci -> (waktu_kedaluwarsa, baris)
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Baris untuk 'key', atau None jika tidak ada atau sudah kedaluwarsa."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, rows):
+        """Menyimpan tuple baris untuk 'key'; diabaikan jika lebih besar dari max_entry_rows."""
+        rows = tuple(rows)
+        if len(rows) > self.max_entry_rows:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, rows)
+            self._rows += len(rows)
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                self._remove(next(iter(self._entries)))
+
+    def collect(self, key, rows, file_size=None):
+        """
+        Meneruskan baris dari 'rows' sambil mengumpulkannya, lalu menyimpannya di cache
+        setelah iterasi selesai. File yang lebih besar dari max_file_size byte tidak
+        dikumpulkan sama sekali: 'rows' dikembalikan apa adanya.
+        """
+        if file_size is not None and file_size > self.max_file_size:
+            return rows
+        return self._collect(key, rows)
+
+    def _collect(self, key, rows):
+        """
+        Baris tidak disimpan jika iterasi terhenti di tengah (mis. karena error). Begitu
+        jumlahnya melebihi max_entry_rows, baris yang sudah terkumpul langsung dilepas.
+        """
+        collected = []
+        for row in rows:
+            if collected is not None:
+                collected.append(row)
+                if len(collected) > self.max_entry_rows:
+                    collected = None
+            yield row
+        if collected is not None:
+            self.put(key, collected)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def _remove(self, key):
+        self._rows -= len(self._entries.pop(key)[1])
+
+
+# Cache bersama untuk wizard dan job impor di proses ini.
+parsed_rows = ParsedRowsCache()
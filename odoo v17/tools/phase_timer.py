@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+"""
+Instrumentasi ringan untuk jalur panas (impor baris SO dan pembuatan PO).
+
+PhaseTimer mencatat waktu, jumlah query SQL (cursor.sql_log_count) dan jumlah
+baris untuk setiap fase sebuah operasi, lalu menuliskannya sebagai baris log
+terstruktur (key=value) dan ringkasan singkat untuk chatter/record job.
+Biayanya hanya beberapa panggilan perf_counter() per fase.
+
+Profil cProfile lengkap hanya diambil jika context berisi PROFILE_CONTEXT_KEY,
+dan disimpan sebagai lampiran .prof (format pstats) untuk analisis mendalam:
+
+    python -m pstats so_line_import-20250101-120000.prof
+"""
+import base64
+import cProfile
+import contextlib
+import marshal
+import time
+
+# Kunci context untuk mengaktifkan dump cProfile, mis. with_context(phase_timer_profile=True).
+PROFILE_CONTEXT_KEY = 'phase_timer_profile'
+
+
+class PhaseTimer(object):
+    """
+    Pengukur per fase untuk satu operasi. Dipakai sebagai context manager
+    untuk keseluruhan operasi, dan timer.phase(nama) untuk setiap fase::
+
+        with PhaseTimer('so_line_import', env.cr) as timer:
+            with timer.phase('decode'):
+                ...
+            for chunk in timer.iterate('parse', chunks):
+                with timer.phase('create_lines') as stats:
+                    stats['rows'] += len(lines)
+
+    Fase dengan nama yang sama diakumulasi (mis. satu fase per batch).
+    """
+
+    def __init__(self, operation, cr, profile=False):
+        self.operation = operation
+        self.cr = cr
+        self.phases = {}
+        self.seconds = 0.0
+        self.queries = 0
+        self.profiler = cProfile.Profile() if profile else None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._start_queries = self.cr.sql_log_count
+        if self.profiler:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profiler:
+            self.profiler.disable()
+        self.seconds = time.perf_counter() - self._start
+        self.queries = self.cr.sql_log_count - self._start_queries
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Mengukur satu fase; dict statistik fase dikembalikan agar pemanggil dapat menambah 'rows'."""
+        stats = self.phases.setdefault(name, {'seconds': 0.0, 'queries': 0, 'rows': 0, 'calls': 0})
+        start = time.perf_counter()
+        queries = self.cr.sql_log_count
+        try:
+            yield stats
+        finally:
+            stats['seconds'] += time.perf_counter() - start
+            stats['queries'] += self.cr.sql_log_count - queries
+            stats['calls'] += 1
+
+    def iterate(self, name, chunks):
+        """
+        Meneruskan batch dari iterable 'chunks' sambil mengukur pengambilan setiap batch
+        sebagai fase 'name'. Berguna untuk generator yang bekerja secara lazy (pembacaan file),
+        sehingga waktunya tidak tercampur dengan pemrosesan batch oleh pemanggil.
+        """
+        iterator = iter(chunks)
+        while True:
+            with self.phase(name) as stats:
+                chunk = next(iterator, None)
+                if chunk is not None:
+                    stats['rows'] += len(chunk)
+            if chunk is None:
+                return
+            yield chunk
+
+    def log(self, logger, **extra):
+        """Menulis satu baris log terstruktur per fase dan satu baris total."""
+        context = ''.join(' %s=%r' % item for item in extra.items())
+        for name, stats in self.phases.items():
+            logger.info("phase_timer operation=%s phase=%s seconds=%.3f queries=%d rows=%d calls=%d%s",
+                        self.operation, name, stats['seconds'], stats['queries'], stats['rows'],
+                        stats['calls'], context)
+        logger.info("phase_timer operation=%s phase=total seconds=%.3f queries=%d%s",
+                    self.operation, self.seconds, self.queries, context)
+
+    def summary(self):
+        """Ringkasan per fase sebagai daftar baris teks, untuk chatter atau record job."""
+        lines = ['%s: %.3f s / %d query / %d baris' % (name, stats['seconds'], stats['queries'], stats['rows'])
+                 for name, stats in self.phases.items()]
+        lines.append('total: %.3f s / %d query' % (self.seconds, self.queries))
+        return lines
+
+    def save_profile(self, record):
+        """
+        Menyimpan hasil cProfile sebagai lampiran pada 'record' dan mengembalikan lampirannya.
+        Tidak melakukan apa pun jika profil tidak diaktifkan.
+        """
+        if not self.profiler:
+            return record.env['ir.attachment']
+        self.profiler.create_stats()
+        return record.env['ir.attachment'].create({
+            'name': '%s-%s.prof' % (self.operation, time.strftime('%Y%m%d-%H%M%S')),
+            'datas': base64.b64encode(marshal.dumps(self.profiler.stats)),
+            'mimetype': 'application/octet-stream',
+            'res_model': record._name,
+            'res_id': record.id,
+        })
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+"""
+Pembaca file impor Baris Pesanan Penjualan secara streaming.
+
+Baris dibaca satu per satu (generator) sehingga pemakaian memori worker tetap
+terbatas berapa pun ukuran filenya:
+- .xlsx dibaca dengan openpyxl mode read-only (iterparse atas XML sheet).
+- .xls dibaca dengan xlrd mode on_demand (hanya sheet yang dipakai yang dimuat).
+- .csv/.tsv dibaca dengan modul csv bawaan Python (parser C), jalur tercepat
+  untuk file datar hasil ekspor sistem lain.
+
+Semua format melewati tahap normalisasi yang sama (normalize_rows) sehingga
+konversi sel menjadi (kode, kuantitas, harga) identik untuk setiap format.
+
+Untuk impor banyak pesanan, iter_workbook_rows membaca semua sheet dan
+normalize_order_rows menambahkan referensi SO setiap baris: kolom ke-4
+(ORDER_REF_COLUMN) atau, jika kosong, nama sheet.
+
+Integrasi yang mengirim baris lewat HTTP memakai iter_record_rows, yang membaca
+record NDJSON/CSV langsung dari stream request dan menghasilkan baris dengan
+bentuk yang sama seperti iter_workbook_rows.
+
+Modul ini sengaja tidak bergantung pada Odoo agar bisa dipakai ulang dari
+wizard, job, maupun skrip benchmark.
+"""
+import base64
+import codecs
+import collections
+import csv
+import io
+import json
+import os
+import tempfile
+
+# Coba impor library pembaca Excel; keduanya opsional.
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+
+# Ukuran potongan base64 yang di-decode sekaligus (harus kelipatan 4).
+B64_CHUNK_SIZE = 1024 * 1024
+# File hasil decode di atas ukuran ini dipindahkan ke disk, bukan ditahan di memori.
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+XLSX_SIGNATURE = b'PK\x03\x04'
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0'
+# Jumlah byte awal file teks yang dipakai untuk menebak format dan pemisah kolom.
+SNIFF_SIZE = 64 * 1024
+CSV_DELIMITERS = ',;\t'
+# Kolom (berbasis 0) berisi nomor SO pada impor banyak pesanan.
+ORDER_REF_COLUMN = 3
+
+# Nama field record pada NDJSON/CSV dari integrasi, sesuai urutan kolom file impor.
+RECORD_FIELDS = ('default_code', 'qty', 'price', 'order')
+
+# Kode error baris hasil normalisasi; pesannya disusun (dan diterjemahkan) oleh pemanggil.
+ERROR_MISSING_CODE = 'missing_code'
+ERROR_INVALID_NUMBER = 'invalid_number'
+ERROR_MISSING_ORDER = 'missing_order'
+
+# Satu baris impor yang sudah dinormalisasi. 'error' berisi kode error jika baris tidak valid.
+# 'sheet' dan 'order_ref' hanya diisi pada impor banyak pesanan.
+ImportRow = collections.namedtuple(
+    'ImportRow', ['row_number', 'product_code', 'quantity', 'price_unit', 'error', 'sheet', 'order_ref'],
+    defaults=(None, None))
+
+
+class ImportFileError(Exception):
+    """File impor tidak didukung, rusak, atau library pembacanya tidak tersedia."""
+
+
+def b64decode_to_file(data, hasher=None):
+    """
+    Men-decode data base64 (isi field Binary) secara bertahap ke file sementara.
+    Menghindari salinan penuh kedua dari isi file di memori.
+    Jika objek hashlib diberikan sebagai 'hasher', isi hasil decode ikut di-hash
+    sehingga hash isi file didapat tanpa membaca ulang file.
+    """
+    tmp = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for start in range(0, len(data), B64_CHUNK_SIZE):
+        chunk = base64.b64decode(data[start:start + B64_CHUNK_SIZE])
+        if hasher is not None:
+            hasher.update(chunk)
+        tmp.write(chunk)
+    tmp.seek(0)
+    return tmp
+
+
+def _read_text_sample(fileobj):
+    """Membaca awal file sebagai teks UTF-8; None jika isinya bukan teks."""
+    sample = fileobj.read(SNIFF_SIZE)
+    fileobj.seek(0)
+    try:
+        # Decoder incremental tidak gagal pada karakter multi-byte yang terpotong di ujung sampel.
+        return codecs.getincrementaldecoder('utf-8-sig')().decode(sample)
+    except UnicodeDecodeError:
+        return None
+
+
+def detect_format(fileobj, file_name=None):
+    """
+    Menentukan format file dari signature isinya, lalu dari ekstensi nama file,
+    lalu dengan menebak isinya: file teks dianggap CSV.
+    """
+    head = fileobj.read(len(XLSX_SIGNATURE))
+    fileobj.seek(0)
+    if head.startswith(XLSX_SIGNATURE):
+        return 'xlsx'
+    if head.startswith(XLS_SIGNATURE):
+        return 'xls'
+    extension = os.path.splitext(file_name or '')[1].lower().lstrip('.')
+    if extension in ('xlsx', 'xls', 'csv', 'tsv'):
+        return extension
+    if extension == 'txt' or _read_text_sample(fileobj) is not None:
+        return 'csv'
+    raise ImportFileError("Format file tidak dikenali. Gunakan file .xls, .xlsx, .csv, atau .tsv.")
+
+
+def _iter_xlsx_rows(fileobj, sheet_index):
+    if not openpyxl:
+        raise ImportFileError('Library Python "openpyxl" tidak terinstal. Silakan instal untuk membaca file .xlsx.')
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[sheet_index]
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _open_xls_book(fileobj):
+    """
+    Membuka workbook .xls. File di disk (mis. di filestore) dibuka lewat namanya
+    sehingga xlrd memetakannya ke memori (mmap) alih-alih menyalin isinya; objek
+    file lain dibaca utuh, yang aman karena format .xls dibatasi 65.536 baris.
+    """
+    name = getattr(fileobj, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return xlrd.open_workbook(name, on_demand=True)
+    return xlrd.open_workbook(file_contents=fileobj.read(), on_demand=True)
+
+
+def _iter_xls_rows(fileobj, sheet_index):
+    if not xlrd:
+        raise ImportFileError('Library Python "xlrd" tidak terinstal. Silakan instal untuk membaca file .xls.')
+    # on_demand memastikan hanya sheet yang diminta yang di-parse.
+    book = _open_xls_book(fileobj)
+    try:
+        sheet = book.sheet_by_index(sheet_index)
+        for row_idx in range(sheet.nrows):
+            yield sheet.row_values(row_idx)
+    finally:
+        book.release_resources()
+
+
+def _iter_xlsx_sheets(fileobj):
+    if not openpyxl:
+        raise ImportFileError('Library Python "openpyxl" tidak terinstal. Silakan instal untuk membaca file .xlsx.')
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield sheet.title, sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_xls_sheets(fileobj):
+    if not xlrd:
+        raise ImportFileError('Library Python "xlrd" tidak terinstal. Silakan instal untuk membaca file .xls.')
+    book = _open_xls_book(fileobj)
+    try:
+        for sheet_index in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_index)
+            yield sheet.name, (sheet.row_values(row_idx) for row_idx in range(sheet.nrows))
+            # Sheet yang sudah dibaca dilepas agar hanya satu sheet yang ada di memori.
+            book.unload_sheet(sheet_index)
+    finally:
+        book.release_resources()
+
+
+def _iter_csv_rows(fileobj, delimiter=None):
+    if delimiter is None:
+        # Tebak pemisah kolom (koma, titik koma, atau tab) dari sampel awal file.
+        try:
+            delimiter = csv.Sniffer().sniff(_read_text_sample(fileobj) or '', CSV_DELIMITERS).delimiter
+        except csv.Error:
+            delimiter = ','
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text, delimiter=delimiter)
+    finally:
+        # Lepaskan wrapper tanpa menutup file aslinya.
+        text.detach()
+
+
+def _numbered_rows(reader, skip_header):
+    """(nomor_baris, nilai_sel) per baris; nomor mulai dari 1, baris kosong dilewati."""
+    for row_number, values in enumerate(reader, start=1):
+        if skip_header and row_number == 1:
+            continue
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield row_number, values
+
+
+def iter_rows(fileobj, file_name=None, sheet_index=0, skip_header=True):
+    """
+    Generator yang menghasilkan (nomor_baris, nilai_sel) untuk setiap baris file.
+    Nomor baris dimulai dari 1 seperti di Excel; baris yang seluruhnya kosong dilewati.
+    Kesalahan format dari library pembaca dibungkus menjadi ImportFileError.
+    """
+    file_format = detect_format(fileobj, file_name)
+    if file_format == 'xlsx':
+        reader = _iter_xlsx_rows(fileobj, sheet_index)
+    elif file_format == 'xls':
+        reader = _iter_xls_rows(fileobj, sheet_index)
+    else:
+        reader = _iter_csv_rows(fileobj, '\t' if file_format == 'tsv' else None)
+    try:
+        yield from _numbered_rows(reader, skip_header)
+    except ImportFileError:
+        raise
+    except Exception as e:
+        raise ImportFileError("File rusak atau tidak dapat dibaca: %s" % e) from e
+
+
+def iter_workbook_rows(fileobj, file_name=None, skip_header=True):
+    """
+    Seperti iter_rows, tetapi membaca semua sheet secara berurutan dan menghasilkan
+    (nama_sheet, nomor_baris, nilai_sel). File CSV/TSV dianggap satu sheet tanpa nama.
+    Baris header dilewati di setiap sheet.
+    """
+    file_format = detect_format(fileobj, file_name)
+    if file_format == 'xlsx':
+        sheets = _iter_xlsx_sheets(fileobj)
+    elif file_format == 'xls':
+        sheets = _iter_xls_sheets(fileobj)
+    else:
+        sheets = [(None, _iter_csv_rows(fileobj, '\t' if file_format == 'tsv' else None))]
+    try:
+        for sheet_name, reader in sheets:
+            for row_number, values in _numbered_rows(reader, skip_header):
+                yield sheet_name, row_number, values
+    except ImportFileError:
+        raise
+    except Exception as e:
+        raise ImportFileError("File rusak atau tidak dapat dibaca: %s" % e) from e
+
+
+def iter_record_rows(stream, data_format='ndjson'):
+    """
+    Membaca record {order, default_code, qty, price} dari stream biner secara bertahap
+    dan menghasilkan (None, nomor_baris, nilai_sel) dengan kolom sesuai RECORD_FIELDS,
+    siap dinormalisasi oleh normalize_order_rows.
+    - ndjson: satu objek JSON per baris; baris kosong dilewati.
+    - csv: baris pertama adalah header berisi nama field RECORD_FIELDS.
+    """
+    text = codecs.getreader('utf-8-sig')(stream)
+    if data_format == 'csv':
+        reader = csv.reader(text)
+        header = [name.strip() for name in next(reader, [])]
+        missing = [name for name in RECORD_FIELDS if name not in header]
+        if missing:
+            raise ImportFileError("Kolom header CSV tidak ditemukan: %s" % ', '.join(missing))
+        positions = [header.index(name) for name in RECORD_FIELDS]
+        for row_number, values in _numbered_rows(reader, skip_header=False):
+            yield None, row_number + 1, [values[i] if i < len(values) else None for i in positions]
+        return
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ImportFileError("Baris %s bukan JSON yang valid: %s" % (row_number, e)) from e
+        if not isinstance(record, dict):
+            raise ImportFileError("Baris %s harus berupa objek JSON." % row_number)
+        yield None, row_number, [record.get(name) for name in RECORD_FIELDS]
+
+def _to_code(value):
+    """Kode produk sebagai teks; angka bulat dari Excel (1001.0) menjadi '1001'."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() if value is not None else ''
+
+
+def _to_number(value):
+    """Angka dari sel numerik atau teks; ValueError/TypeError jika tidak valid."""
+    if isinstance(value, str):
+        value = value.strip()
+    return float(value)
+
+
+def _normalize_row(row_number, values, sheet=None, order_ref=None):
+    product_code = _to_code(values[0]) if values else ''
+    if not product_code:
+        return ImportRow(row_number, product_code, 0.0, 0.0, ERROR_MISSING_CODE, sheet, order_ref)
+    try:
+        quantity = _to_number(values[1])
+        price_unit = _to_number(values[2])
+    except (ValueError, TypeError, IndexError):
+        return ImportRow(row_number, product_code, 0.0, 0.0, ERROR_INVALID_NUMBER, sheet, order_ref)
+    return ImportRow(row_number, product_code, quantity, price_unit, None, sheet, order_ref)
+
+
+def normalize_rows(rows):
+    """
+    Tahap normalisasi bersama untuk semua format: mengubah (nomor_baris, nilai_sel)
+    menjadi ImportRow dengan kode teks serta kuantitas dan harga float.
+    Baris tidak valid tetap dihasilkan dengan kode error di 'error' agar pemanggil
+    yang memutuskan apakah baris dilewati atau impor dihentikan.
+    """
+    for row_number, values in rows:
+        yield _normalize_row(row_number, values)
+
+
+def normalize_order_rows(rows):
+    """
+    Normalisasi untuk impor banyak pesanan: mengubah (nama_sheet, nomor_baris, nilai_sel)
+    dari iter_workbook_rows menjadi ImportRow yang juga berisi sheet dan nomor SO.
+    Nomor SO diambil dari kolom ORDER_REF_COLUMN, atau dari nama sheet jika kolom itu kosong.
+    """
+    for sheet, row_number, values in rows:
+        order_ref = _to_code(values[ORDER_REF_COLUMN]) if len(values) > ORDER_REF_COLUMN else ''
+        order_ref = order_ref or (sheet or '').strip()
+        row = _normalize_row(row_number, values, sheet, order_ref)
+        if not row.error and not order_ref:
+            row = row._replace(error=ERROR_MISSING_ORDER)
+        yield row
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
+"""
+Penulis file Baris Pesanan Penjualan (.xlsx) dengan tata letak yang sama seperti
+file impor: Kode Produk, Kuantitas, Harga Satuan, dan Nomor SO di kolom ke-4
+(so_lines_reader.ORDER_REF_COLUMN).
+
+Workbook ditulis dengan xlsxwriter mode constant_memory: setiap baris langsung
+dituliskan ke file sementara sheet dan tidak disimpan di memori, sehingga ekspor
+puluhan ribu baris tetap memakai memori yang tetap. Konsekuensinya baris harus
+ditulis berurutan, satu sheet setelah sheet lainnya.
+
+File hasil ekspor dapat diimpor kembali apa adanya, baik lewat wizard satu
+pesanan (kolom ke-4 diabaikan) maupun impor banyak pesanan.
+
+Seperti so_lines_reader, modul ini sengaja tidak bergantung pada Odoo.
+"""
+import re
+
+import xlsxwriter
+
+from .so_lines_reader import ORDER_REF_COLUMN
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Judul kolom baris pertama; baris ini dilewati oleh pembaca (skip_header).
+HEADER = ('Kode Produk', 'Kuantitas', 'Harga Satuan', 'Nomor SO')
+
+# Batas panjang nama sheet Excel dan karakter yang tidak boleh dipakai di dalamnya.
+SHEET_NAME_MAX_LENGTH = 31
+SHEET_NAME_INVALID = re.compile(r'[\[\]:*?/\\]')
+
+
+def _sheet_name(name, used):
+    """Nama sheet yang valid dan unik di dalam workbook."""
+    base = SHEET_NAME_INVALID.sub('_', name or '').strip("'")[:SHEET_NAME_MAX_LENGTH] or 'Sheet'
+    candidate, counter = base, 1
+    while candidate.lower() in used:
+        counter += 1
+        suffix = ' (%s)' % counter
+        candidate = base[:SHEET_NAME_MAX_LENGTH - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+def write_xlsx(fileobj, sheets, header=HEADER):
+    """
+    Menulis workbook .xlsx ke 'fileobj' dan mengembalikan jumlah baris data yang ditulis.
+
+    'sheets' berisi pasangan (nama_sheet, baris) dengan 'baris' berupa iterable
+    (kode_produk, kuantitas, harga_satuan, nomor_so); keduanya boleh berupa generator
+    karena setiap baris hanya dibaca sekali. Kode produk selalu ditulis sebagai teks
+    agar kode seperti '00123' tidak berubah menjadi angka.
+    """
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True})
+    bold = workbook.add_format({'bold': True})
+    used_names = set()
+    row_count = 0
+    try:
+        for name, rows in sheets:
+            sheet = workbook.add_worksheet(_sheet_name(name, used_names))
+            sheet.write_row(0, 0, header, bold)
+            sheet.set_column(0, 0, 20)
+            sheet.set_column(1, 2, 14)
+            sheet.set_column(ORDER_REF_COLUMN, ORDER_REF_COLUMN, 16)
+            for row_idx, (product_code, quantity, price_unit, order_ref) in enumerate(rows, start=1):
+                sheet.write_string(row_idx, 0, product_code)
+                sheet.write_number(row_idx, 1, quantity)
+                sheet.write_number(row_idx, 2, price_unit)
+                sheet.write_string(row_idx, ORDER_REF_COLUMN, order_ref or '')
+                row_count += 1
+        if not used_names:
+            # Workbook tanpa sheet tidak dapat dibuka Excel: tulis template kosong.
+            workbook.add_worksheet().write_row(0, 0, header, bold)
+    finally:
+        workbook.close()
+    return row_count
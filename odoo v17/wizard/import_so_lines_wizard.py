@@ -1,19 +1,33 @@
 # -*- coding: utf-8 -*-
 # Copyright 2025 - Anjas Amar Pradana, PT. Sas Kreasindo Utama Applicant
 import base64
+import collections
+import csv
+import hashlib
+import io
+import logging
+import operator
+import os
+
+from markupsafe import Markup
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import float_compare, float_round, split_every
+
+from ..tools import parsed_rows_cache, phase_timer, so_lines_reader
+
+_logger = logging.getLogger(__name__)
 
-# Coba impor library xlrd, yang dibutuhkan untuk membaca file .xls
-try:
-    import xlrd
-except ImportError:
-    xlrd = None
+# Jumlah baris yang diproses (cari produk + buat baris SO) dalam satu batch.
+IMPORT_CHUNK_SIZE = 1000
+# Jumlah baris SO yang dibaca dengan satu read() saat ekspor.
+EXPORT_CHUNK_SIZE = 5000
 
 class ImportSOLinesWizard(models.TransientModel):
     """
     Wizard ini memungkinkan pengguna untuk mengimpor Baris Pesanan Penjualan (SO Lines)
-    dari sebuah file Excel. Ini memenuhi Requirement 3 dari tes teknis.
+    dari sebuah file Excel atau CSV/TSV. Ini memenuhi Requirement 3 dari tes teknis.
     """
     _name = 'import.so.lines.wizard'
     _description = 'Wizard untuk Impor Baris Pesanan Penjualan'
@@ -22,9 +36,464 @@ class ImportSOLinesWizard(models.TransientModel):
     # FIELDS
     # ===========================================================================
 
-    file_data = fields.Binary(string='Unggah File Anda', required=True,
-                              help="File Excel yang akan diimpor (.xls atau .xlsx).")
+    # Disimpan sebagai lampiran (filestore), bukan di tabel wizard: file dibaca langsung
+    # dari filestore saat impor, tanpa decode base64 dan tanpa salinan penuh di memori.
+    file_data = fields.Binary(string='Unggah File Anda', required=True, attachment=True,
+                              help="File Excel atau CSV yang akan diimpor (.xls, .xlsx, .csv, atau .tsv).")
     file_name = fields.Char(string='Nama File', help="Nama dari file yang diunggah.")
+    import_in_background = fields.Boolean(
+        string='Impor di Latar Belakang',
+        help="Simpan file sebagai job impor yang diproses bertahap oleh cron. "
+             "Disarankan untuk file berukuran besar.")
+    multi_order = fields.Boolean(
+        string='Banyak Pesanan',
+        help="Setiap baris menyebutkan Pesanan Penjualan tujuannya: kolom ke-4 berisi nomor SO, "
+             "atau jika kosong, nama sheet dipakai sebagai nomor SO. Semua sheet dibaca.")
+    import_mode = fields.Selection([
+        ('append', 'Tambah Baris Baru'),
+        ('upsert', 'Gabungkan ke Baris yang Ada'),
+    ], string='Mode Impor', default='append', required=True,
+        help="Gabungkan: baris file dengan produk yang sama dijumlahkan, lalu baris SO yang sudah ada "
+             "untuk produk tersebut diperbarui kuantitas dan harganya alih-alih ditambah baris baru.")
+    upsert_match_price = fields.Boolean(
+        string='Bedakan Harga',
+        help="Produk yang sama dengan harga berbeda tetap menjadi baris terpisah. Jika tidak dicentang, "
+             "harga baris yang ada diganti dengan harga dari file.")
+    remove_missing_lines = fields.Boolean(
+        string='Hapus Baris yang Tidak Ada di File',
+        help="Baris produk di pesanan yang tidak ada di file dihapus. Hanya dijalankan jika semua baris file valid.")
+    previous_job_id = fields.Many2one(
+        'so.line.import.job', string='Impor Sebelumnya', readonly=True,
+        help="Impor sebelumnya dari file yang sama (hash isi identik) ke Pesanan Penjualan ini.")
+
+    dry_run_summary = fields.Text(string='Hasil Validasi', readonly=True)
+    error_report = fields.Binary(string='Laporan Error', readonly=True, attachment=False)
+    error_report_name = fields.Char(string='Nama Laporan Error', readonly=True)
+
+    @api.onchange('file_data')
+    def _onchange_file_data(self):
+        # File baru belum diperiksa terhadap impor sebelumnya maupun divalidasi.
+        self.previous_job_id = False
+        self.dry_run_summary = False
+        self.error_report = False
+
+    # ===========================================================================
+    # HELPERS
+    # ===========================================================================
+
+    @api.model
+    def _get_products_by_code(self, codes):
+        """
+        Mencari produk untuk sekumpulan kode produk (default_code) dalam satu query
+        dan mengembalikan indeks dict {kode: product.product}.
+        UoM dan nama produk dimuat sekaligus untuk seluruh recordset lewat prefetch ORM.
+        """
+        if not codes:
+            return {}
+        products = self.env['product.product'].search([('default_code', 'in', list(codes))])
+        index = {}
+        for product in products:
+            # Sama seperti search(limit=1): jika ada kode ganda, ambil yang pertama.
+            index.setdefault(product.default_code, product)
+        return index
+
+    @api.model
+    def _update_product_index(self, index, codes):
+        """
+        Melengkapi indeks {kode: produk} dengan kode yang belum pernah dicari.
+        Kode yang tidak ditemukan dicatat sebagai False agar tidak dicari ulang.
+        """
+        missing_codes = set(codes) - index.keys()
+        if missing_codes:
+            index.update(dict.fromkeys(missing_codes, False))
+            index.update(self._get_products_by_code(missing_codes))
+        return index
+
+    @api.model
+    def _update_order_index(self, index, refs):
+        """
+        Melengkapi indeks {nomor_SO: (pesanan, pesan_error)} dengan nomor SO yang belum
+        pernah dicari, dalam satu query. Status pesanan diperiksa di sini, sekali per
+        pesanan, bukan per baris: hanya Penawaran yang dapat ditambah barisnya.
+        """
+        missing_refs = set(refs) - index.keys()
+        if not missing_refs:
+            return index
+        found = {order.name: order for order in self.env['sale.order'].search([('name', 'in', list(missing_refs))])}
+        for ref in missing_refs:
+            order = found.get(ref, self.env['sale.order'])
+            if not order:
+                index[ref] = (order, _('Pesanan Penjualan %s tidak ditemukan.') % ref)
+            elif order.state not in ('draft', 'sent'):
+                index[ref] = (order, _('Pesanan Penjualan %s bukan Penawaran; barisnya tidak dapat ditambah.') % ref)
+            else:
+                index[ref] = (order, None)
+        return index
+
+    @api.model
+    def _get_row_error_message(self, error):
+        """Pesan error yang dapat diterjemahkan untuk kode error dari so_lines_reader."""
+        if error == so_lines_reader.ERROR_MISSING_CODE:
+            return _('Kode produk kosong.')
+        if error == so_lines_reader.ERROR_MISSING_ORDER:
+            return _('Nomor Pesanan Penjualan kosong.')
+        return _('Kuantitas/harga tidak valid atau tidak lengkap.')
+
+    @api.model
+    def _row_label(self, row):
+        """Posisi baris untuk pesan error: nomor baris, atau 'Sheet!baris' pada impor banyak pesanan."""
+        return row.row_number if row.sheet is None else '%s!%s' % (row.sheet, row.row_number)
+
+    @api.model
+    def _decode_file(self, data):
+        """
+        Men-decode isi field Binary ke file sementara dan menghitung hash SHA-1 isinya
+        (sama dengan ir.attachment.checksum). Mengembalikan (file, checksum).
+        """
+        hasher = hashlib.sha1()
+        source = so_lines_reader.b64decode_to_file(data, hasher)
+        return source, hasher.hexdigest()
+
+    @api.model
+    def _get_upload_attachment(self, record, field_name):
+        """Lampiran yang menyimpan isi field Binary (attachment=True) 'field_name' dari 'record'."""
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', record._name),
+            ('res_id', '=', record.id),
+            ('res_field', '=', field_name),
+        ], limit=1)
+
+    @api.model
+    def _open_upload(self, record, field_name):
+        """
+        Membuka isi field Binary 'field_name' dari 'record' sebagai file biner dan
+        mengembalikan (file, checksum). File di filestore dibuka langsung dari disk;
+        hash SHA-1-nya sudah tersimpan di lampiran (ir.attachment.checksum), jadi
+        tidak ada decode base64 maupun salinan isi file di memori.
+        """
+        attachment = self._get_upload_attachment(record, field_name)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb'), attachment.checksum
+        if attachment:
+            # Lampiran disimpan di database (ir_attachment.location = db).
+            return io.BytesIO(attachment.raw), attachment.checksum
+        return self._decode_file(record[field_name])
+
+    def _link_upload(self, records, field_name):
+        """
+        Memasang file yang diunggah ke wizard pada field Binary 'field_name' dari 'records'
+        (mis. job impor) tanpa menyalin isinya: lampiran baru menunjuk ke file filestore
+        yang sama, seperti lampiran dengan isi identik yang sudah di-deduplikasi Odoo.
+        """
+        attachment = self._get_upload_attachment(self, 'file_data')
+        if not attachment:
+            records.write({field_name: self.file_data})
+            return
+        if attachment.store_fname:
+            content_vals = {
+                'store_fname': attachment.store_fname,
+                'file_size': attachment.file_size,
+                'checksum': attachment.checksum,
+                'mimetype': attachment.mimetype,
+            }
+        else:
+            content_vals = {'raw': attachment.raw}
+        self.env['ir.attachment'].sudo().create([dict(
+            content_vals,
+            name=field_name,
+            res_model=records._name,
+            res_id=record.id,
+            res_field=field_name,
+        ) for record in records])
+
+    @api.model
+    def _iter_normalized_rows(self, source, file_name, checksum, multi_order=False):
+        """
+        Baris ImportRow dari file: diambil dari cache jika file dengan hash yang sama
+        sudah pernah di-parse di proses ini, atau dibaca dari file lalu disimpan di cache.
+        Pada impor banyak pesanan, semua sheet dibaca dan setiap baris membawa nomor SO.
+        """
+        # Ekstensi ikut menjadi kunci karena menentukan format file teks (csv atau tsv).
+        key = (checksum, os.path.splitext(file_name or '')[1].lower(), multi_order)
+        rows = parsed_rows_cache.parsed_rows.get(key)
+        if rows is not None:
+            return iter(rows)
+        # Ukuran file diperiksa sebelum baris dikumpulkan: file besar tidak masuk cache.
+        file_size = source.seek(0, io.SEEK_END)
+        source.seek(0)
+        if multi_order:
+            rows = so_lines_reader.normalize_order_rows(so_lines_reader.iter_workbook_rows(source, file_name))
+        else:
+            rows = so_lines_reader.normalize_rows(so_lines_reader.iter_rows(source, file_name))
+        return parsed_rows_cache.parsed_rows.collect(key, rows, file_size)
+
+    @api.model
+    def _parse_rows(self, rows, errors=None):
+        """
+        Menyaring baris ImportRow hasil normalisasi (nomor_baris, kode, kuantitas, harga).
+        Baris dengan kode kosong atau qty/harga non-numerik dilewati dan, jika diberikan,
+        dicatat di 'errors'.
+        """
+        for row in rows:
+            if row.error:
+                if errors is not None:
+                    errors.append((self._row_label(row), self._get_row_error_message(row.error)))
+                continue
+            yield row
+
+    @api.model
+    def _validate_rows(self, rows, multi_order=False):
+        """
+        Memvalidasi seluruh baris ImportRow tanpa menulis apa pun. Semua kode produk (dan
+        pada impor banyak pesanan, semua nomor SO) diperiksa dalam satu query di akhir.
+        Mengembalikan (jumlah_baris, error) dengan error berupa daftar (baris, kode, pesan)
+        sesuai urutan baris di file.
+        """
+        row_count = 0
+        errors = []  # (posisi, baris, kode, pesan)
+        rows_by_code = collections.defaultdict(list)
+        rows_by_order = collections.defaultdict(list)
+        for position, row in enumerate(rows):
+            row_count += 1
+            label = self._row_label(row)
+            if row.error:
+                errors.append((position, label, row.product_code, self._get_row_error_message(row.error)))
+                continue
+            rows_by_code[row.product_code].append((position, label))
+            if multi_order:
+                rows_by_order[row.order_ref].append((position, label, row.product_code))
+        products = self._get_products_by_code(rows_by_code)
+        for code in rows_by_code.keys() - products.keys():
+            message = _('Produk dengan kode %s tidak ditemukan.') % code
+            errors.extend((position, label, code, message) for position, label in rows_by_code[code])
+        for ref, (order, order_error) in self._update_order_index({}, rows_by_order).items():
+            if order_error:
+                errors.extend((position, label, code, order_error) for position, label, code in rows_by_order[ref])
+        errors.sort(key=operator.itemgetter(0))
+        return row_count, [error[1:] for error in errors]
+
+    @api.model
+    def _build_error_report(self, errors):
+        """Laporan error sebagai file CSV (base64) yang dapat dibuka langsung di Excel."""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow([_('Baris'), _('Kode Produk'), _('Error')])
+        writer.writerows(errors)
+        return base64.b64encode(output.getvalue().encode('utf-8-sig'))
+
+    @api.model
+    def _iter_export_rows(self, sale_order):
+        """
+        Generator baris ekspor (kode_produk, kuantitas, harga_satuan, nomor_so) untuk satu
+        Pesanan Penjualan, sesuai tata letak file impor sehingga file dapat diimpor kembali.
+        Baris dibaca per EXPORT_CHUNK_SIZE dengan read() (satu query per batch, bukan akses
+        field per record) dan cache batch dilepas setelah ditulis, sehingga memori tetap
+        terbatas berapa pun jumlah baris pesanan. Baris bagian/catatan dan baris dengan
+        produk tanpa Kode Produk dilewati karena tidak dapat diimpor kembali.
+        """
+        line_ids = self.env['sale.order.line'].search(
+            [('order_id', '=', sale_order.id), ('display_type', '=', False)], order='sequence, id').ids
+        codes = {}
+        skipped = 0
+        for chunk_ids in split_every(EXPORT_CHUNK_SIZE, line_ids):
+            lines = self.env['sale.order.line'].browse(chunk_ids)
+            records = lines.read(['product_id', 'product_uom_qty', 'price_unit'], load=None)
+            # Kode produk dibaca sekali per produk untuk seluruh ekspor.
+            missing = {record['product_id'] for record in records if record['product_id']} - codes.keys()
+            if missing:
+                products = self.env['product.product'].browse(missing)
+                codes.update((product['id'], product['default_code']) for product in products.read(['default_code']))
+            for record in records:
+                product_code = codes.get(record['product_id'])
+                if not product_code:
+                    skipped += 1
+                    continue
+                yield product_code, record['product_uom_qty'], record['price_unit'], sale_order.name
+            lines.invalidate_recordset()
+        if skipped:
+            _logger.warning("Export of %s: %s lines without product code skipped", sale_order.name, skipped)
+
+    def _reopen(self):
+        """Membuka kembali wizard ini (mis. untuk menampilkan peringatan atau hasil validasi)."""
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+            'context': self.env.context,
+        }
+
+    @api.model
+    def _create_order_lines(self, sale_order, parsed_rows, products, errors=None, line_defaults=None):
+        """
+        Membuat Baris Pesanan Penjualan untuk satu batch baris hasil parsing
+        dalam satu panggilan create() batch.
+        """
+        self._update_product_index(products, {row.product_code for row in parsed_rows})
+        line_defaults = {} if line_defaults is None else line_defaults
+        vals_list = []
+        for row in parsed_rows:
+            product = products[row.product_code]
+            if not product:
+                # Jika produk tidak ditemukan, lewati baris ini.
+                if errors is not None:
+                    errors.append((self._row_label(row), _('Produk dengan kode %s tidak ditemukan.') % row.product_code))
+                continue
+            vals_list.append(self._prepare_order_line_vals(sale_order, row, product, line_defaults))
+        return self._get_bulk_line_model().create(vals_list)
+
+    @api.model
+    def _create_multi_order_lines(self, parsed_rows, orders, products, errors=None, line_defaults=None):
+        """
+        Membuat Baris Pesanan Penjualan untuk satu batch baris yang masing-masing membawa
+        nomor SO tujuannya. Pesanan dan produk diambil dari indeks (dilengkapi dalam satu
+        query per jenis), lalu baris semua pesanan dibuat dalam satu create() batch,
+        dikelompokkan per pesanan dengan urutan baris file tetap terjaga.
+        """
+        self._update_order_index(orders, {row.order_ref for row in parsed_rows})
+        self._update_product_index(products, {row.product_code for row in parsed_rows})
+        line_defaults = {} if line_defaults is None else line_defaults
+        vals_list = []
+        for row in parsed_rows:
+            order, order_error = orders[row.order_ref]
+            product = products[row.product_code]
+            if order_error or not product:
+                if errors is not None:
+                    errors.append((self._row_label(row),
+                                   order_error or _('Produk dengan kode %s tidak ditemukan.') % row.product_code))
+                continue
+            vals_list.append(self._prepare_order_line_vals(order, row, product, line_defaults))
+        vals_list.sort(key=operator.itemgetter('order_id'))
+        return self._get_bulk_line_model().create(vals_list)
+
+    @api.model
+    def _aggregate_rows(self, rows, match_price=False):
+        """
+        Menggabungkan baris ImportRow untuk mode gabung: baris dengan nomor SO dan kode produk
+        yang sama (dan harga yang sama jika 'match_price') menjadi satu baris, dengan kuantitas
+        dijumlahkan dan harga dari baris terakhir. Urutan dan nomor baris mengikuti kemunculan
+        pertama di file.
+        """
+        aggregated = {}
+        for row in rows:
+            key = (row.order_ref, row.product_code, row.price_unit if match_price else None)
+            first = aggregated.get(key)
+            if first:
+                row = first._replace(quantity=first.quantity + row.quantity, price_unit=row.price_unit)
+            aggregated[key] = row
+        return list(aggregated.values())
+
+    @api.model
+    def _upsert_order_lines(self, sale_orders, order_rows, products, errors=None, line_defaults=None,
+                            match_price=False, remove_missing=False):
+        """
+        Mode gabung: menggabungkan 'order_rows', pasangan (pesanan, baris) hasil _aggregate_rows,
+        ke baris yang sudah ada di 'sale_orders' alih-alih selalu menambah baris baru.
+
+        Baris SO yang ada dibaca sekali (satu search_read) ke indeks per pesanan, produk, dan UoM
+        (dan harga jika 'match_price'). Baris yang cocok diperbarui kuantitas dan harganya, hanya
+        jika berubah, dengan satu write() perintah One2many per pesanan; baris yang tidak cocok
+        dibuat dengan satu create() batch. Jika 'remove_missing' dan tidak ada baris bermasalah,
+        baris produk yang tidak ada di file (termasuk baris ganda di pesanan) ikut dihapus dalam
+        write() yang sama.
+        Mengembalikan (baris_baru, baris_diperbarui, jumlah_dihapus).
+        """
+        self._update_product_index(products, {row.product_code for order, row in order_rows})
+        errors = [] if errors is None else errors
+        line_defaults = {} if line_defaults is None else line_defaults
+        precision = {
+            'product_uom_qty': self.env['decimal.precision'].precision_get('Product Unit of Measure'),
+            'price_unit': self.env['decimal.precision'].precision_get('Product Price'),
+        }
+
+        def price_key(price_unit):
+            return float_round(price_unit, precision_digits=precision['price_unit']) if match_price else None
+
+        existing_lines = collections.defaultdict(list)
+        for line in self.env['sale.order.line'].search_read(
+                [('order_id', 'in', sale_orders.ids), ('display_type', '=', False)],
+                ['order_id', 'product_id', 'product_uom', 'product_uom_qty', 'price_unit'],
+                order='sequence, id', load=None):
+            key = (line['order_id'], line['product_id'], line['product_uom'], price_key(line['price_unit']))
+            existing_lines[key].append(line)
+
+        commands = collections.defaultdict(list)
+        updated_ids = []
+        vals_list = []
+        for order, row in order_rows:
+            product = products[row.product_code]
+            if not product:
+                errors.append((self._row_label(row), _('Produk dengan kode %s tidak ditemukan.') % row.product_code))
+                continue
+            vals = self._prepare_order_line_vals(order, row, product, line_defaults)
+            matches = existing_lines.get((order.id, product.id, vals['product_uom'], price_key(row.price_unit)))
+            if not matches:
+                vals_list.append(vals)
+                continue
+            line = matches.pop(0)
+            if any(float_compare(line[field], vals[field], precision_digits=digits)
+                   for field, digits in precision.items()):
+                commands[order.id].append((1, line['id'], {field: vals[field] for field in precision}))
+                updated_ids.append(line['id'])
+
+        removed = 0
+        if remove_missing and order_rows and not errors:
+            for lines in existing_lines.values():
+                for line in lines:
+                    commands[line['order_id']].append((2, line['id']))
+                    removed += 1
+        bulk_orders = self._get_bulk_line_model().env['sale.order']
+        for order_id, order_commands in commands.items():
+            bulk_orders.browse(order_id).write({'order_line': order_commands})
+        vals_list.sort(key=operator.itemgetter('order_id'))
+        new_lines = self._get_bulk_line_model().create(vals_list)
+        return new_lines, self.env['sale.order.line'].browse(updated_ids), removed
+
+    @api.model
+    def _get_bulk_line_model(self):
+        """
+        Model sale.order.line untuk penyisipan massal: tracking dinonaktifkan agar
+        perubahan total pesanan tidak dicatat (dan dihitung) sebagai nilai tracking.
+        """
+        return self.env['sale.order.line'].with_context(tracking_disable=True)
+
+    @api.model
+    def _flush_bulk_lines(self):
+        """
+        Menjalankan seluruh compute yang tertunda (subtotal, pajak, total pesanan) sekali
+        untuk semua baris yang disisipkan, dengan tracking dinonaktifkan.
+        """
+        self._get_bulk_line_model().env.flush_all()
+
+    @api.model
+    def _get_line_defaults(self, sale_order, product, line_defaults):
+        """
+        Nilai bawaan baris SO untuk 'product' di 'sale_order': UoM, deskripsi, dan pajak
+        setelah pemetaan posisi fiskal pesanan. Dihitung sekali per pesanan dan produk lalu
+        disimpan di 'line_defaults', sehingga ORM tidak menghitungnya lagi untuk setiap
+        baris saat create().
+        """
+        key = (sale_order.id, product.id)
+        if key not in line_defaults:
+            # Pajak perusahaan pesanan (termasuk pajak perusahaan induk), seperti _compute_tax_id.
+            taxes = product.taxes_id._filter_taxes_by_company(sale_order.company_id)
+            line_defaults[key] = {
+                'product_uom': product.uom_id.id, # Atur UoM default dari produk
+                'name': product.name, # Atur deskripsi default dari produk
+                'tax_id': [(6, 0, sale_order.fiscal_position_id.map_tax(taxes).ids)],
+            }
+        return line_defaults[key]
+
+    @api.model
+    def _prepare_order_line_vals(self, sale_order, row, product, line_defaults):
+        return {
+            **self._get_line_defaults(sale_order, product, line_defaults),
+            'order_id': sale_order.id,
+            'product_id': product.id,
+            'product_uom_qty': row.quantity,
+            'price_unit': row.price_unit,
+        }
 
     # ===========================================================================
     # BUSINESS LOGIC (Requirement 3)
@@ -38,57 +507,253 @@ class ImportSOLinesWizard(models.TransientModel):
         self.ensure_one()
 
         # Validasi
-        if not self.file_data:
+        if not self.with_context(bin_size=True).file_data:
             raise UserError(_('Silakan unggah file untuk melanjutkan.'))
-        if not xlrd:
-            raise UserError(_('Library Python "xlrd" tidak terinstal. Silakan instal untuk menggunakan fitur ini.'))
+        if self.multi_order:
+            return self._import_multi_order()
+        if self.import_in_background and self.import_mode == 'upsert':
+            raise UserError(_('Mode gabung tidak dapat dijalankan di latar belakang.'))
 
         # Ambil record Sales Order yang aktif dari context.
         sale_order = self.env['sale.order'].browse(self.env.context.get('active_id'))
 
-        try:
-            # Decode data file base64 dan buka sebagai workbook Excel.
-            book = xlrd.open_workbook(file_contents=base64.b64decode(self.file_data))
-            sheet = book.sheet_by_index(0)
-        except xlrd.XLRDError as e:
-            raise UserError(_('Format file tidak didukung atau file rusak. Silakan gunakan file Excel yang valid. Error: %s') % e)
-        except Exception as e:
-            raise UserError(_('Terjadi kesalahan tak terduga saat membaca file: %s') % e)
-
-        # Iterasi setiap baris dari sheet Excel, lewati baris header (index 0).
-        for row_idx in range(1, sheet.nrows):
-            row = sheet.row_values(row_idx)
-
-            # Ekstrak data dari kolom: Kode Produk, Kuantitas, Harga Satuan
-            product_code = row[0]
+        # Decode data file base64 ke file sementara, lalu baca barisnya secara streaming
+        # dan proses per batch agar memori tetap terbatas berapa pun ukuran filenya.
+        # Setiap fase diukur (waktu, query SQL, baris) oleh PhaseTimer.
+        profile = self.env.context.get(phase_timer.PROFILE_CONTEXT_KEY)
+        errors = []
+        with phase_timer.PhaseTimer('so_line_import', self.env.cr, profile=profile) as timer:
+            with timer.phase('decode'):
+                source, checksum = self._open_upload(self, 'file_data')
             try:
-                quantity = float(row[1])
-                unit_price = float(row[2])
-            except (ValueError, IndexError):
-                # Jika baris memiliki qty/harga non-numerik atau tidak lengkap, lewati.
-                # Implementasi lebih lanjut bisa mencatat error ini.
-                continue
+                # File yang sama (hash identik) sudah pernah diimpor ke SO ini: minta konfirmasi
+                # alih-alih menambahkan baris yang sama sekali lagi. Mode gabung aman diulang.
+                previous_job = self.env['so.line.import.job']._find_import(sale_order, checksum)
+                if previous_job and self.import_mode == 'append' and not self.env.context.get('force_reimport'):
+                    self.previous_job_id = previous_job
+                    return self._reopen()
 
-            # Lewati baris jika kode produk kosong.
-            if not product_code:
-                continue
+                if self.import_in_background:
+                    job = self.env['so.line.import.job'].create({
+                        'sale_order_id': sale_order.id,
+                        'file_name': self.file_name,
+                        'checksum': checksum,
+                    })
+                    self._link_upload(job, 'file_data')
+                    job._trigger_cron()
+                    return {'type': 'ir.actions.act_window_close'}
 
-            # Cari produk di database menggunakan referensi internalnya (Kode Produk).
-            product = self.env['product.product'].search([('default_code', '=', product_code)], limit=1)
-            if not product:
-                # Jika produk tidak ditemukan, lewati baris ini.
-                # Versi lebih lanjut bisa memunculkan error atau membuat produk baru.
-                continue
+                rows = self._iter_normalized_rows(source, self.file_name, checksum)
+                products, line_defaults = {}, {}
+                if self.import_mode == 'upsert':
+                    upsert_result = self._import_upsert(rows, {None: (sale_order, None)}, errors, timer)
+                else:
+                    for chunk in timer.iterate('parse', split_every(IMPORT_CHUNK_SIZE, self._parse_rows(rows, errors))):
+                        with timer.phase('product_lookup'):
+                            self._update_product_index(products, {row.product_code for row in chunk})
+                        with timer.phase('create_lines') as stats:
+                            lines = self._create_order_lines(sale_order, chunk, products, errors, line_defaults)
+                            stats['rows'] += len(lines)
+            except so_lines_reader.ImportFileError as e:
+                raise UserError(_('Format file tidak didukung atau file rusak. Silakan gunakan file Excel atau CSV yang valid. Error: %s') % e)
+            finally:
+                source.close()
+            # Compute tertunda (subtotal, pajak, total SO, dll.) dijalankan sekali saat flush.
+            with timer.phase('recompute'):
+                self._flush_bulk_lines()
 
-            # Buat Baris Pesanan Penjualan baru dengan data dari baris Excel.
-            self.env['sale.order.line'].create({
-                'order_id': sale_order.id,
-                'product_id': product.id,
-                'product_uom_qty': quantity,
-                'price_unit': unit_price,
-                'product_uom': product.uom_id.id, # Atur UoM default dari produk
-                'name': product.name, # Atur deskripsi default dari produk
-            })
+        # Catat impor ini (beserta hash filenya) di riwayat job impor sebagai job yang selesai.
+        rows_imported = sum(timer.phases[name]['rows'] for name in ('create_lines', 'upsert_lines') if name in timer.phases)
+        job = self.env['so.line.import.job'].create({
+            'sale_order_id': sale_order.id,
+            'file_name': self.file_name,
+            'checksum': checksum,
+            'state': 'done',
+            'rows_imported': rows_imported,
+            'rows_skipped': len(errors),
+        })
+        job.error_log = job._append_errors(errors)
+        self._link_upload(job, 'file_data')
+        summary = None
+        if self.import_mode == 'upsert':
+            summary = self._get_upsert_summary(*upsert_result)
+        self._report_phases(sale_order, timer, rows_imported, summary)
 
         # Tutup wizard dan segarkan tampilan.
         return {'type': 'ir.actions.act_window_close'}
+
+    def action_dry_run(self):
+        """
+        Metode ini dipicu oleh tombol 'Validasi' di wizard.
+        Memeriksa seluruh file tanpa membuat baris apa pun, lalu menampilkan ringkasan dan
+        laporan error lengkap (nomor baris, kode produk tidak dikenal, qty/harga tidak valid)
+        sehingga impor sebenarnya cukup dijalankan sekali pada data yang sudah bersih.
+        Baris hasil parsing disimpan di cache, sehingga impor berikutnya tidak mem-parse ulang.
+        """
+        self.ensure_one()
+        if not self.with_context(bin_size=True).file_data:
+            raise UserError(_('Silakan unggah file untuk melanjutkan.'))
+
+        source, checksum = self._open_upload(self, 'file_data')
+        try:
+            rows = self._iter_normalized_rows(source, self.file_name, checksum, self.multi_order)
+            row_count, errors = self._validate_rows(rows, self.multi_order)
+        except so_lines_reader.ImportFileError as e:
+            raise UserError(_('Format file tidak didukung atau file rusak. Silakan gunakan file Excel atau CSV yang valid. Error: %s') % e)
+        finally:
+            source.close()
+
+        error_rows = len({error[0] for error in errors})
+        if errors:
+            summary = _('%(rows)s baris diperiksa: %(valid)s valid, %(invalid)s bermasalah. '
+                        'Unduh laporan error untuk detail setiap baris.',
+                        rows=row_count, valid=row_count - error_rows, invalid=error_rows)
+        else:
+            summary = _('%s baris diperiksa: semua baris valid dan siap diimpor.') % row_count
+        self.write({
+            'dry_run_summary': summary,
+            'error_report': self._build_error_report(errors) if errors else False,
+            'error_report_name': '%s-error.csv' % os.path.splitext(self.file_name or 'impor')[0],
+        })
+        return self._reopen()
+
+    def action_download_template(self):
+        """
+        Metode ini dipicu oleh tombol 'Unduh Template' di wizard.
+        Mengunduh file .xlsx kosong dengan judul kolom yang diharapkan oleh impor.
+        """
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/custom_tio/so_lines/template',
+            'target': 'self',
+        }
+
+    def _import_multi_order(self):
+        """
+        Impor banyak pesanan: satu file berisi baris untuk banyak Pesanan Penjualan.
+        Semua nomor SO dan kode produk di setiap batch dicari dalam satu query per jenis,
+        status pesanan diperiksa sekali per pesanan, dan baris semua pesanan dalam satu
+        batch dibuat dengan satu create(). Baris yang bermasalah dilewati.
+        """
+        if self.import_in_background:
+            raise UserError(_('Impor banyak pesanan tidak dapat dijalankan di latar belakang.'))
+        job_model = self.env['so.line.import.job']
+        profile = self.env.context.get(phase_timer.PROFILE_CONTEXT_KEY)
+        errors = []
+        orders, products, line_defaults = {}, {}, {}
+        rows_by_order = collections.Counter()
+        with phase_timer.PhaseTimer('so_line_import_multi', self.env.cr, profile=profile) as timer:
+            with timer.phase('decode'):
+                source, checksum = self._open_upload(self, 'file_data')
+            try:
+                # File yang sama sudah pernah diimpor: minta konfirmasi sebelum mengimpor ulang.
+                # Mode gabung aman diulang.
+                previous_job = job_model.search([('checksum', '=', checksum)], limit=1)
+                if previous_job and self.import_mode == 'append' and not self.env.context.get('force_reimport'):
+                    self.previous_job_id = previous_job
+                    return self._reopen()
+
+                rows = self._iter_normalized_rows(source, self.file_name, checksum, multi_order=True)
+                if self.import_mode == 'upsert':
+                    upsert_result = self._import_upsert(rows, orders, errors, timer, rows_by_order)
+                else:
+                    for chunk in timer.iterate('parse', split_every(IMPORT_CHUNK_SIZE, self._parse_rows(rows, errors))):
+                        with timer.phase('order_lookup'):
+                            self._update_order_index(orders, {row.order_ref for row in chunk})
+                        with timer.phase('product_lookup'):
+                            self._update_product_index(products, {row.product_code for row in chunk})
+                        with timer.phase('create_lines') as stats:
+                            lines = self._create_multi_order_lines(chunk, orders, products, errors, line_defaults)
+                            rows_by_order.update(line.order_id.id for line in lines)
+                            stats['rows'] += len(lines)
+            except so_lines_reader.ImportFileError as e:
+                raise UserError(_('Format file tidak didukung atau file rusak. Silakan gunakan file Excel atau CSV yang valid. Error: %s') % e)
+            finally:
+                source.close()
+            with timer.phase('recompute'):
+                self._flush_bulk_lines()
+
+        # Catat impor di riwayat job impor: satu job selesai per pesanan yang menerima baris.
+        imported_orders = self.env['sale.order'].browse(list(rows_by_order))
+        jobs = job_model.create([{
+            'sale_order_id': order.id,
+            'file_name': self.file_name,
+            'checksum': checksum,
+            'state': 'done',
+            'rows_imported': rows_by_order[order.id],
+        } for order in imported_orders])
+        self._link_upload(jobs, 'file_data')
+        timer.log(_logger, sale_orders=len(imported_orders), file=self.file_name)
+        timer.save_profile(imported_orders[:1] or self)
+
+        message = _('%(rows)s baris diimpor ke %(orders)s Pesanan Penjualan, %(skipped)s baris dilewati.',
+                    rows=sum(rows_by_order.values()), orders=len(imported_orders), skipped=len(errors))
+        if self.import_mode == 'upsert':
+            message += ' ' + self._get_upsert_summary(*upsert_result)
+        if errors:
+            message += ' ' + _('Gunakan tombol Validasi untuk laporan error lengkap.')
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Impor Baris Pesanan Penjualan'),
+                'message': message,
+                'type': 'warning' if errors else 'success',
+                'sticky': bool(errors),
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
+    def _import_upsert(self, rows, orders, errors, timer, rows_by_order=None):
+        """
+        Impor mode gabung untuk baris ImportRow 'rows'. 'orders' adalah indeks
+        {nomor_SO: (pesanan, pesan_error)}; pada impor satu pesanan berisi {None: (pesanan, None)}.
+        Seluruh file dibaca dan digabung lebih dulu, karena baris ganda di file harus dijumlahkan
+        sebelum dicocokkan dengan baris pesanan, lalu semua perubahan ditulis sekaligus.
+        Jumlah baris file yang diimpor (bukan baris SO yang dibuat atau diperbarui) ditambahkan
+        ke Counter 'rows_by_order' per id pesanan.
+        Mengembalikan hasil _upsert_order_lines.
+        """
+        rows_by_order = collections.Counter() if rows_by_order is None else rows_by_order
+        with timer.phase('parse') as stats:
+            file_rows = list(self._parse_rows(rows, errors))
+            rows = self._aggregate_rows(file_rows, self.upsert_match_price)
+            stats['rows'] += len(file_rows)
+        with timer.phase('order_lookup'):
+            self._update_order_index(orders, {row.order_ref for row in rows})
+        order_rows = []
+        for row in rows:
+            order, order_error = orders[row.order_ref]
+            if order_error:
+                errors.append((self._row_label(row), order_error))
+            else:
+                order_rows.append((order, row))
+        sale_orders = self.env['sale.order'].union(*(order for order, order_error in orders.values() if not order_error))
+        products = {}
+        with timer.phase('upsert_lines') as stats:
+            result = self._upsert_order_lines(sale_orders, order_rows, products, errors, {},
+                                              self.upsert_match_price, self.remove_missing_lines)
+            # Baris file yang pesanan atau produknya bermasalah dilewati dan tidak dihitung.
+            imported = collections.Counter(
+                orders[row.order_ref][0].id for row in file_rows
+                if not orders[row.order_ref][1] and products[row.product_code])
+            rows_by_order.update(imported)
+            stats['rows'] += sum(imported.values())
+        return result
+
+    def _get_upsert_summary(self, new_lines, updated_lines, removed):
+        """Ringkasan hasil mode gabung untuk notifikasi dan chatter."""
+        return _('%(created)s baris baru, %(updated)s baris diperbarui, %(removed)s baris dihapus.',
+                 created=len(new_lines), updated=len(updated_lines), removed=removed)
+
+    def _report_phases(self, sale_order, timer, rows_imported, summary=None):
+        """
+        Menulis hasil pengukuran fase impor ke log, mengirim ringkasannya ke chatter
+        Sales Order, dan menyimpan dump cProfile sebagai lampiran jika diaktifkan.
+        """
+        timer.log(_logger, sale_order=sale_order.id, file=self.file_name)
+        timer.save_profile(sale_order)
+        message = _('Impor baris dari file %(file)s: %(rows)s baris diimpor.', file=self.file_name, rows=rows_imported)
+        if summary:
+            message = '%s %s' % (message, summary)
+        sale_order.message_post(body=Markup('<br/>').join([message] + timer.summary()))